@@ -1,4 +1,4 @@
-import csv
+import json
 import pandas as pd
 import tempfile
 from io import BytesIO
@@ -8,8 +8,8 @@ import os
 import streamlit as st
 from dotenv import load_dotenv
 
-from src.chains import process_invoice_chain
-from src.ocr import parse_pdf_azure
+from src.export import InvoiceTableWriter
+from src.pipeline import InvoiceJob, InvoiceJobQueue
 
 
 load_dotenv()
@@ -68,33 +68,154 @@ def require_login() -> None:
     st.stop()
 
 
-def flatten_invoice_output(invoice_content: dict) -> list[dict]:
-    """Flatten nested invoice output for CSV export."""
+FORM_FIELDS: list[tuple[str, tuple[str, ...]]] = [
+    ("Invoice ID", ("invoice_id",)),
+    ("Invoice Total", ("invoice_total",)),
+    ("Seller Name", ("seller_name",)),
+    ("Invoice Language", ("metadata", "language")),
+    ("Invoice Date", ("invoice_date",)),
+    ("Invoice Currency", ("invoice_total_currency",)),
+]
+
+
+def _get_field(invoice_data: dict, path: tuple[str, ...]):
+    value = invoice_data
+    for key in path:
+        if not isinstance(value, dict):
+            return ""
+        value = value.get(key)
+    return "" if value is None else value
+
+
+def build_item_row(item: dict) -> dict:
+    """Format a line item for the line item table."""
+    return {
+        "Cost Center": item.get("cost_center", ""),
+        "Description": item.get("description", ""),
+        "Qty": f"{item.get('quantity', 0):,.0f}" if item.get("quantity", 0) else None,
+        "Unit $": f"{item.get('unit_price', 0):,.2f}" if item.get("unit_price", 0) else None,
+        "Subtotal $": f"{item.get('subtotal_price', 0):,.2f}" if item.get("subtotal_price", 0) else None,
+        "VAT $": f"{item.get('vat_amount', 0):,.2f}" if item.get("vat_amount", 0) else None,
+        "Total $": f"{item.get('total_price', 0):,.2f}" if item.get("total_price", 0) else None,
+    }
+
+
+def render_confidence(placeholder, invoice_data: dict) -> None:
+    confidence_level = (invoice_data.get("metadata") or {}).get("confidence_score")
+    if confidence_level is None:
+        placeholder.info("Extracting invoice data...", icon="⏳")
+    elif confidence_level < 0.6:
+        placeholder.error(f"Invoice Processed with Low Confidence ({confidence_level})", icon="🔴")
+    elif confidence_level < 0.9:
+        placeholder.info(f"Invoice Processed with Medium Confidence ({confidence_level})", icon="🟡")
+    else:
+        placeholder.success(f"Invoice Processed with High Confidence ({confidence_level})", icon="🟢")
+
+
+def render_form_field(placeholders: dict, invoice_data: dict, label: str, path: tuple[str, ...], render_id: str) -> None:
+    # Each update replaces the widget in its placeholder, so keys must be unique per update
+    placeholders[label].text_input(label, value=str(_get_field(invoice_data, path)), disabled=False, key=f"{label}-{render_id}")
+
+
+def render_items(placeholder, items: list) -> None:
+    item_rows = [build_item_row(item) for item in items if isinstance(item, dict)]
+    if item_rows:
+        with placeholder.container():
+            st.markdown("**Line Items**")
+            st.dataframe(pd.DataFrame(item_rows), hide_index=True)
+    else:
+        placeholder.info("No line item details available.")
+
+
+@st.cache_resource
+def get_job_queue() -> InvoiceJobQueue:
+    """The background worker pool shared by every session; it survives reruns, so jobs keep running between them."""
+    return InvoiceJobQueue()
+
+
+def session_jobs(job_queue: InvoiceJobQueue, job_ids: list[str]) -> dict[str, InvoiceJob]:
+    """The jobs this session submitted among `job_ids` that the shared queue still holds."""
+    submitted = st.session_state.setdefault("job_ids", set())
+    return {job_id: job for job_id in job_ids if job_id in submitted and (job := job_queue.get(job_id)) is not None}
+
+
+def job_status_row(job: InvoiceJob) -> dict:
+    """Format a job for the progress table."""
+    return {
+        "File": job.filename,
+        "Status": job.status,
+        "Invoice ID": (job.result or {}).get("content", {}).get("invoice_id") or job.partial.get("invoice_id"),
+        "Line Items": job.items_extracted,
+        "Seconds": round(job.seconds, 1) if job.seconds is not None else None,
+        "Error": job.error,
+    }
+
+
+def render_form_view(invoice_data: dict, items: list, render_id: str) -> None:
+    render_confidence(st.empty(), invoice_data)
+    form_col1, form_col2 = st.columns(2)
+    field_placeholders = {}
+    for i, (label, _) in enumerate(FORM_FIELDS):
+        with form_col1 if i < 3 else form_col2:
+            field_placeholders[label] = st.empty()
+    for label, path in FORM_FIELDS:
+        render_form_field(field_placeholders, invoice_data, label, path, render_id)
+    render_items(st.empty(), items)
+
+
+def render_job_status(job_ids: list[str], was_pending: bool) -> None:
+    jobs = list(session_jobs(get_job_queue(), job_ids).values())
+    st.dataframe(pd.DataFrame([job_status_row(job) for job in jobs]), hide_index=True)
+    if was_pending and all(job.finished for job in jobs):
+        # Rerun the whole app so the finished results render and polling stops
+        st.rerun()
+
+    # Fill in the form of running jobs with the fields and line items streamed so far
+    for job in jobs:
+        if job.status == "extracting":
+            partial, items = dict(job.partial), list(job.partial_items)
+            st.markdown(f"#### **{job.filename}** (extracting)")
+            with st.expander("Form View", expanded=True):
+                render_form_view(partial, items, f"{job.job_id[:16]}-partial-{len(partial)}-{len(items)}")
+
+
+def cost_summary(job: InvoiceJob) -> dict:
+    usage_metadata = dict(job.result.get("usage_metadata") or {})
+    pdf_pages = len(job.pdf_output["doc_pages"])
+    usage_metadata["ocr_cost_usd"] = 0.0 if job.pdf_output.get("cache_hit") else round(pdf_pages * 190 / 20000, 6)
+    usage_metadata["total_cost_usd"] = usage_metadata["ocr_cost_usd"] + usage_metadata.get("llm_cost_usd", 0.0)
+    return usage_metadata
 
-    def _flatten_dict(data: dict, parent_key: str = "", sep: str = "_") -> dict:
-        flat: dict[str, object] = {}
-        for key, value in data.items():
-            new_key = f"{parent_key}{sep}{key}" if parent_key else key
-            if isinstance(value, dict):
-                flat.update(_flatten_dict(value, new_key, sep=sep))
-            else:
-                flat[new_key] = value
-        return flat
 
-    base_keys = {k: v for k, v in invoice_content.items() if k != "items"}
-    base_flat = _flatten_dict(base_keys)
-    items = invoice_content.get("items") or []
+def render_job_result(job: InvoiceJob) -> None:
+    invoice_data = job.result.get("content") or {}
+
+    with st.expander("Text View"):
+        st.markdown(job.pdf_output["doc_content"], unsafe_allow_html=True)
+
+    with st.expander("Form View", expanded=True):
+        render_form_view(invoice_data, invoice_data.get("items") or [], job.job_id[:16])
 
-    if not items:
-        return [base_flat] if base_flat else []
+    with st.expander("Structured View"):
+        st.json(invoice_data)
 
-    flattened_rows: list[dict] = []
-    for item in items:
-        item_flat = _flatten_dict(item or {}, parent_key="item")
-        row = base_flat | item_flat
-        flattened_rows.append(row)
+    with st.expander("Cost Summary"):
+        st.json(cost_summary(job))
 
-    return flattened_rows
+
+def combined_csv(jobs: list[InvoiceJob]) -> bytes:
+    """All finished invoices as one CSV, one row per line item with the source file name first."""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        csv_path = Path(temp_dir) / "invoices.csv"
+        with InvoiceTableWriter(csv_path, extra_columns=("source",)) as writer:
+            for job in jobs:
+                writer.write(job.result["content"], source=job.filename)
+        return csv_path.read_bytes()
+
+
+def combined_jsonl(jobs: list[InvoiceJob]) -> bytes:
+    records = [{"source": job.filename, **job.result} for job in jobs]
+    return "".join(json.dumps(record, ensure_ascii=False, default=str) + "\n" for record in records).encode("utf-8")
 
 
 def render_pdf_viewer(pdf_bytes: bytes, *, height: int = 600) -> None:
@@ -112,129 +233,50 @@ require_login()
 
 st.markdown(
     """
-    1. Upload an invoice PDF
-    2. Key data points from the invoice will be extracted and displayed in a structured format
-    3. The extracted data can be downloaded as a CSV file
+    1. Upload one or more invoice PDFs
+    2. Invoices are processed in the background; key data points are displayed in a structured format as each one finishes
+    3. The extracted data for all invoices can be downloaded as a single CSV or JSONL file
     """
 )
 
 
-uploaded_file = st.file_uploader("Upload invoice PDF", type=["pdf"])
+uploaded_files = st.file_uploader("Upload invoice PDFs", type=["pdf"], accept_multiple_files=True)
 
-if uploaded_file:
-    pdf_bytes = uploaded_file.getvalue()
+if uploaded_files:
+    job_queue = get_job_queue()
+    # Keyed on the PDF hash, so re-uploads and reruns map onto existing jobs
+    uploads = {InvoiceJobQueue.make_job_id(uploaded_file.getvalue()): uploaded_file for uploaded_file in uploaded_files}
 
     st.markdown("#### **Invoice PDF Preview**")
-    render_pdf_viewer(pdf_bytes)
-
-    process_clicked = st.button("Extract Invoice Data", type="primary")
-
-    if process_clicked:
-        temp_path = None
-
-        try:
-            with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as temp_file:
-                temp_file.write(pdf_bytes)
-                temp_path = Path(temp_file.name)
-
-            with st.spinner("Convert PDF to markdown text..."):
-                pdf_output = parse_pdf_azure(pdf_path=str(temp_path))
-                pdf_pages = len(pdf_output["doc_pages"])
-
-            if not pdf_output:
-                st.error("Unable to parse the uploaded PDF. Please try another file.")
-            else:
-                markdown_content = pdf_output["doc_content"]
-
-                with st.expander("Text View"):
-                    st.markdown(markdown_content, unsafe_allow_html=True)
-
-                with st.spinner("Extracting structured invoice data..."):
-                    invoice_result = process_invoice_chain(invoice_details=markdown_content)
-
-                invoice_data = invoice_result.get("content") or {}
-
-                with st.expander("Form View", expanded=True):
-                    confidence_level = invoice_data.get("metadata", {}).get("confidence_score", "")
-                    if confidence_level < 0.6:
-                        st.error(f"Invoice Processed with Low Confidence ({confidence_level})", icon="🔴")
-                    elif confidence_level < 0.9:
-                        st.info(f"Invoice Processed with Medium Confidence ({confidence_level})", icon="🟡")
-                    else:
-                        st.success(f"Invoice Processed with High Confidence ({confidence_level})", icon="🟢")
-
-                    form_col1, form_col2 = st.columns(2)
-                    with form_col1:
-                        st.text_input(
-                            "Invoice ID",
-                            value=str(invoice_data.get("invoice_id", "")),
-                            disabled=False,
-                        )
-                        st.text_input(
-                            "Invoice Total",
-                            value=str(invoice_data.get("invoice_total", "")),
-                            disabled=False,
-                        )
-                        st.text_input(
-                            "Seller Name",
-                            value=str(invoice_data.get("seller_name", "")),
-                            disabled=False,
-                        )
-                    with form_col2:
-                        st.text_input(
-                            "Invoice Language",
-                            value=str(invoice_data.get("metadata", {}).get("language", "")),
-                            disabled=False,
-                        )
-                        st.text_input(
-                            "Invoice Date",
-                            value=str(invoice_data.get("invoice_date", "")),
-                            disabled=False,
-                        )
-                        st.text_input(
-                            "Invoice Currency",
-                            value=str(invoice_data.get("invoice_total_currency", "")),
-                            disabled=False,
-                        )
-
-                    items = invoice_data.get("items") or []
-                    if items:
-                        item_rows = []
-                        for item in items:
-                            if not isinstance(item, dict):
-                                continue
-                            item_rows.append(
-                                {
-                                    "Cost Center": item.get("cost_center", ""),
-                                    "Description": item.get("description", ""),
-                                    "Qty": f"{item.get('quantity', 0):,.0f}" if item.get("quantity", 0) else None,
-                                    "Unit $": f"{item.get('unit_price', 0):,.2f}" if item.get("unit_price", 0) else None,
-                                    "Subtotal $": f"{item.get('subtotal_price', 0):,.2f}" if item.get("subtotal_price", 0) else None,
-                                    "VAT $": f"{item.get('vat_amount', 0):,.2f}" if item.get("vat_amount", 0) else None,
-                                    "Total $": f"{item.get('total_price', 0):,.2f}" if item.get("total_price", 0) else None,
-                                }
-                            )
-                        if item_rows:
-                            st.markdown("**Line Items**")
-                            df_item_rows = pd.DataFrame(item_rows)
-                            st.dataframe(df_item_rows, hide_index=True)
-                        else:
-                            st.info("No line item details available.")
-                    else:
-                        st.info("No line item details available.")
-
-                with st.expander("Structured View"):
-                    st.json(invoice_data)
-
-                usage_metadata = invoice_result.get("usage_metadata")
-                if usage_metadata:
-                    with st.expander("Cost Summary"):
-                        usage_metadata["ocr_cost_usd"] = round(pdf_pages * 190 / 20000, 6)
-                        usage_metadata["total_cost_usd"] = usage_metadata["ocr_cost_usd"] + usage_metadata["llm_cost_usd"]
-                        st.json(usage_metadata)
-
-        except Exception as exc:  # pragma: no cover - Streamlit handles runtime errors
-            st.error(f"An error occurred while processing the invoice: {exc}")
-        finally:
-            if temp_path and temp_path.exists():
-                temp_path.unlink(missing_ok=True)
+    preview_id = st.selectbox("Preview", list(uploads), format_func=lambda job_id: uploads[job_id].name)
+    render_pdf_viewer(uploads[preview_id].getvalue())
+
+    # The queue is shared across sessions, so each session only shows the jobs it submitted
+    jobs = session_jobs(job_queue, list(uploads))
+    new_ids = [job_id for job_id in uploads if job_id not in jobs or jobs[job_id].status == "error"]
+    if st.button(f"Extract Invoice Data ({len(new_ids)} new)", type="primary", disabled=not new_ids):
+        for job_id in new_ids:
+            job_queue.submit(uploads[job_id].getvalue(), uploads[job_id].name)
+            st.session_state.job_ids.add(job_id)
+        jobs = session_jobs(job_queue, list(uploads))
+
+    job_ids = list(jobs)
+    if job_ids:
+        st.markdown("#### **Processing**")
+        pending = any(not job.finished for job in jobs.values())
+        # Only the progress table re-runs while jobs are in flight; the rest of the page is left alone
+        st.fragment(render_job_status, run_every=1.0 if pending else None)(job_ids, pending)
+
+        done_jobs = [job for job in jobs.values() if job.status == "done"]
+        for job in done_jobs:
+            st.markdown(f"#### **{job.filename}**")
+            render_job_result(job)
+
+        if done_jobs:
+            download_col1, download_col2 = st.columns(2)
+            download_col1.download_button(
+                f"Download CSV ({len(done_jobs)} invoices)", combined_csv(done_jobs), file_name="invoices.csv", mime="text/csv"
+            )
+            download_col2.download_button(
+                "Download JSONL", combined_jsonl(done_jobs), file_name="invoices.jsonl", mime="application/jsonl"
+            )
@@ -0,0 +1,97 @@
+"""
+Measure async OCR throughput and throttling against the local fake Document Intelligence server.
+
+Submits `--documents` in-memory PDFs concurrently through `AsyncOcrScheduler`, once with the token
+bucket sized to the fake server's limit and once without it (`--compare-unlimited`), and reports
+documents per second, 429 responses and retries.
+
+Usage:
+    python -m benchmarks.async_ocr [--documents 200] [--tps 15] [--poll-tps 50] [--processing-seconds 2] [--output async_ocr.json]
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+import time
+from pathlib import Path
+
+from benchmarks.fake_di_server import FakeDocumentIntelligence, start_server
+from src.ocr import AsyncOcrScheduler
+
+
+async def run(
+    documents: int,
+    server_tps: float,
+    scheduler_tps: float,
+    processing_seconds: float,
+    polling_interval: float,
+    server_poll_tps: float = 50,
+    scheduler_poll_tps: float = 50,
+) -> dict:
+    fake = FakeDocumentIntelligence(tps=server_tps, poll_tps=server_poll_tps, processing_seconds=processing_seconds)
+    runner, endpoint = await start_server(fake)
+    try:
+        async with AsyncOcrScheduler(
+            endpoint=endpoint, key="fake-key", tps=scheduler_tps, poll_tps=scheduler_poll_tps, polling_interval=polling_interval
+        ) as scheduler:
+            started = time.perf_counter()
+            results = await asyncio.gather(
+                *(scheduler.analyze("prebuilt-layout", pdf_bytes=b"%%PDF-1.7 document %d" % i) for i in range(documents)),
+                return_exceptions=True,
+            )
+            elapsed = time.perf_counter() - started
+            client_stats = scheduler.stats()
+    finally:
+        await runner.cleanup()
+
+    failures = [result for result in results if isinstance(result, Exception)]
+    return {
+        "documents": documents,
+        "scheduler_tps": scheduler_tps,
+        "server_tps": server_tps,
+        "succeeded": documents - len(failures),
+        "failed": len(failures),
+        "elapsed_seconds": round(elapsed, 3),
+        "documents_per_second": round(documents / elapsed, 2),
+        "server_throttled": fake.stats["throttled"],
+        "server_max_rps": fake.stats["max_rps"],
+        "client_retries": client_stats["retries"],
+        "client_requests": client_stats["requests"],
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--documents", type=int, default=200)
+    parser.add_argument("--tps", type=float, default=15, help="Submissions per second allowed by the fake server")
+    parser.add_argument("--poll-tps", type=float, default=50, help="Result polls per second allowed by the fake server")
+    parser.add_argument("--processing-seconds", type=float, default=2.0)
+    parser.add_argument("--polling-interval", type=float, default=1.0)
+    parser.add_argument("--compare-unlimited", action="store_true", help="Also run without the client-side token bucket")
+    parser.add_argument("--output", default=None, help="Write results as JSON to this path")
+    args = parser.parse_args(argv)
+
+    scenarios = [args.tps, 0] if args.compare_unlimited else [args.tps]
+    results = []
+    for scheduler_tps in scenarios:
+        # The unlimited run drops both of the scheduler's buckets
+        scheduler_poll_tps = args.poll_tps if scheduler_tps else 0
+        result = asyncio.run(
+            run(args.documents, args.tps, scheduler_tps, args.processing_seconds, args.polling_interval, args.poll_tps, scheduler_poll_tps)
+        )
+        results.append(result)
+        label = f"bucket {scheduler_tps:g} tps" if scheduler_tps else "no bucket"
+        print(
+            f"{label:<16} {result['succeeded']}/{result['documents']} ok in {result['elapsed_seconds']}s "
+            f"({result['documents_per_second']} docs/s)  429s {result['server_throttled']}  "
+            f"retries {result['client_retries']}  max rps {result['server_max_rps']}"
+        )
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2), encoding="utf-8")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,134 @@
+"""
+Compare the columnar exporter with per-row flattening for large exports of extracted invoices.
+
+Methods:
+    flatten_csv        `flatten_invoice_output` per invoice streamed through `csv.DictWriter`
+    flatten_dataframe  all flattened rows collected into a pandas DataFrame and written with `to_csv`
+    columnar_csv       `InvoiceTableWriter` to CSV
+    columnar_parquet   `InvoiceTableWriter` to Parquet (requires pyarrow)
+
+Invoices are generated lazily, so peak memory reflects what each method itself holds. For each
+method and scale it reports wall time, invoices per second and peak traced memory.
+
+Usage:
+    python -m benchmarks.columnar_export [--invoices 1000,10000] [--items 10] [--methods ...] [--output export.json]
+"""
+
+import argparse
+import csv
+import json
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+from benchmarks.json_decoder import HEADER
+from src.export import COLUMN_NAMES, InvoiceTableWriter
+from src.parsers import parse_process_invoice_result
+from src.utils import flatten_invoice_output
+
+
+def generate_invoices(n_invoices: int, n_items: int):
+    template = parse_process_invoice_result(HEADER, as_dict=True)
+    for i in range(n_invoices):
+        items = [
+            {
+                "cost_center": None,
+                "description": f"Line {i}-{j}",
+                "quantity": 1.0 + j % 5,
+                "unit_price": 12.5,
+                "subtotal_price": 12.5 * (1 + j % 5),
+                "total_price": 15.0 * (1 + j % 5),
+                "vat_rate": 0.2,
+                "vat_amount": 2.5 * (1 + j % 5),
+                "currency": "EUR",
+            }
+            for j in range(n_items)
+        ]
+        yield template | {"invoice_id": f"INV-{i}", "items": items}
+
+
+def flatten_csv(invoices, path: Path) -> None:
+    with open(path, "w", encoding="utf-8", newline="") as file:
+        writer = csv.DictWriter(file, fieldnames=COLUMN_NAMES)
+        writer.writeheader()
+        for invoice in invoices:
+            writer.writerows(flatten_invoice_output(invoice))
+
+
+def flatten_dataframe(invoices, path: Path) -> None:
+    import pandas as pd
+
+    rows = [row for invoice in invoices for row in flatten_invoice_output(invoice)]
+    pd.DataFrame(rows).to_csv(path, index=False)
+
+
+def columnar(format: str):
+    def export(invoices, path: Path) -> None:
+        with InvoiceTableWriter(path, format=format) as writer:
+            writer.write_many(invoices)
+
+    return export
+
+
+METHODS = {
+    "flatten_csv": (flatten_csv, "csv"),
+    "flatten_dataframe": (flatten_dataframe, "csv"),
+    "columnar_csv": (columnar("csv"), "csv"),
+    "columnar_parquet": (columnar("parquet"), "parquet"),
+}
+
+
+def run(method: str, n_invoices: int, n_items: int, output_dir: Path, track_memory: bool) -> dict:
+    export, suffix = METHODS[method]
+    path = output_dir / f"{method}.{suffix}"
+    if track_memory:
+        tracemalloc.start()
+    try:
+        started = time.perf_counter()
+        export(generate_invoices(n_invoices, n_items), path)
+        elapsed = time.perf_counter() - started
+        peak = tracemalloc.get_traced_memory()[1] if track_memory else None
+    finally:
+        if track_memory:
+            tracemalloc.stop()
+    return {
+        "method": method,
+        "invoices": n_invoices,
+        "rows": n_invoices * n_items,
+        "seconds": round(elapsed, 4),
+        "invoices_per_second": round(n_invoices / elapsed, 1),
+        "peak_memory_mb": round(peak / 1024 / 1024, 2) if peak is not None else None,
+        "file_mb": round(path.stat().st_size / 1024 / 1024, 2),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--invoices", default="1000,10000", help="Comma-separated invoice counts")
+    parser.add_argument("--items", type=int, default=10, help="Line items per invoice")
+    parser.add_argument("--methods", default=",".join(METHODS))
+    parser.add_argument("--no-memory", action="store_true", help="Skip tracemalloc (faster, timings less perturbed)")
+    parser.add_argument("--output", default=None, help="Write results as JSON to this path")
+    args = parser.parse_args(argv)
+
+    results = []
+    with tempfile.TemporaryDirectory() as output_dir:
+        for n_invoices in (int(value) for value in args.invoices.split(",")):
+            for method in args.methods.split(","):
+                result = run(method, n_invoices, args.items, Path(output_dir), not args.no_memory)
+                results.append(result)
+                memory = f"{result['peak_memory_mb']:>8.2f} MB peak" if result["peak_memory_mb"] is not None else ""
+                print(
+                    f"{method:<18} {n_invoices:>6} invoices {result['seconds']:>8.3f}s "
+                    f"{result['invoices_per_second']:>10.1f} /s {memory} {result['file_mb']:>8.2f} MB file"
+                )
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2), encoding="utf-8")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,214 @@
+"""
+Peak RSS per in-flight document of the OCR input path, against the local fake Document Intelligence server.
+
+Methods:
+    upload_tempfile    uploaded bytes written to a temporary file, then read back twice (cache key
+                       and request), as `app.py` and `parse_pdf_azure` did before
+    upload_inmemory    `parse_pdf_azure(pdf_bytes=BytesIO(...))`, sent as a `base64Source` body built in one pass
+    url_tempfile       `requests.get(url).content` written to a temporary file, then read back twice
+    url_streamed       `parse_pdf_azure(pdf_url=...)`, streamed in chunks through the pooled session
+
+Each method runs `--documents` concurrently in a fresh subprocess while a thread samples the
+current RSS; the figure per document is the peak above the RSS before the run. Uploaded documents
+are created before that baseline, as the app already holds them. The fake server (and the files it
+serves) runs in the parent process.
+
+Usage:
+    python -m benchmarks.document_io [--documents 8] [--mb 8] [--methods ...] [--output document_io.json]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from pathlib import Path
+
+from aiohttp import web
+
+from benchmarks.fake_di_server import FakeDocumentIntelligence, start_server
+
+METHODS = ("upload_tempfile", "upload_inmemory", "url_tempfile", "url_streamed")
+
+
+def make_document(index: int, size: int) -> bytes:
+    header = b"%%PDF-1.7\n%% document %d\n" % index
+    return header + bytes(size - len(header))
+
+
+def legacy_parse_pdf_azure(pdf_url: str = None, pdf_path: str = None) -> dict:
+    """The OCR input path of `parse_pdf_azure` before in-memory documents, kept for comparison."""
+    import requests
+    from azure.ai.documentintelligence.models import AnalyzeDocumentRequest
+
+    from src.ocr.azure_doc_parser import _get_document_intelligence_client, split_doc_pages
+    from src.ocr.ocr_cache import OcrCache, get_ocr_cache
+
+    temp_file = False
+    if pdf_url and not pdf_path:
+        response = requests.get(pdf_url)
+        response.raise_for_status()
+        with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as file:
+            file.write(response.content)
+        pdf_path, temp_file = file.name, True
+    try:
+        cache = get_ocr_cache()
+        cache_key = OcrCache.make_key(Path(pdf_path).read_bytes(), "prebuilt-layout", "markdown")
+        poller = _get_document_intelligence_client().begin_analyze_document(
+            "prebuilt-layout", AnalyzeDocumentRequest(bytes_source=Path(pdf_path).read_bytes()), output_content_format="markdown"
+        )
+        doc_content = poller.result().content
+        doc_pages = split_doc_pages(doc_content, source_url=pdf_url)
+        cache.set(cache_key, doc_content, doc_pages)
+        return {"doc_pages": doc_pages, "doc_content": doc_content}
+    finally:
+        if temp_file:
+            Path(pdf_path).unlink(missing_ok=True)
+
+
+def legacy_upload(pdf_bytes: bytes) -> dict:
+    with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as file:
+        file.write(pdf_bytes)
+    try:
+        return legacy_parse_pdf_azure(pdf_path=file.name)
+    finally:
+        Path(file.name).unlink(missing_ok=True)
+
+
+def _rss_mb() -> float:
+    """Current resident set size; falls back to the high-water mark where /proc is unavailable."""
+    try:
+        resident_pages = int(Path("/proc/self/statm").read_text().split()[1])
+        return resident_pages * os.sysconf("SC_PAGE_SIZE") / 1024 / 1024
+    except (OSError, ValueError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class RssSampler:
+    """Track the peak of the current RSS from a background thread (ru_maxrss would include import-time peaks)."""
+
+    def __init__(self, interval: float = 0.002):
+        self.interval = interval
+        self.peak = _rss_mb()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+
+    def _sample(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, _rss_mb())
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, _rss_mb())
+
+
+def worker(method: str, base_url: str, documents: int, size: int) -> dict:
+    """Run one method in this process and return its RSS figures (called in a subprocess)."""
+    from src.ocr import parse_pdf_azure
+
+    uploads = [make_document(i, size) for i in range(documents)] if method.startswith("upload") else None
+    urls = [f"{base_url}/files/{size}/{i}" for i in range(documents)]
+    calls = {
+        "upload_tempfile": lambda i: legacy_upload(uploads[i]),
+        "upload_inmemory": lambda i: parse_pdf_azure(pdf_bytes=BytesIO(uploads[i]), filename=f"invoice-{i}.pdf"),
+        "url_tempfile": lambda i: legacy_parse_pdf_azure(pdf_url=urls[i]),
+        "url_streamed": lambda i: parse_pdf_azure(pdf_url=urls[i]),
+    }
+
+    # Warm up imports, the client and its connection pool on a tiny document outside the measurement
+    parse_pdf_azure(pdf_bytes=make_document(-1, 1024), use_cache=False)
+    parse_pdf_azure(pdf_url=f"{base_url}/files/1024/-1", use_cache=False)
+
+    baseline = _rss_mb()
+    with RssSampler() as sampler, ThreadPoolExecutor(max_workers=documents) as executor:
+        results = list(executor.map(calls[method], range(documents)))
+    peak = sampler.peak
+    assert all(result and result["doc_content"] for result in results)
+    return {
+        "method": method,
+        "documents": documents,
+        "document_mb": round(size / 1024 / 1024, 2),
+        "baseline_rss_mb": round(baseline, 1),
+        "peak_rss_mb": round(peak, 1),
+        "rss_mb_per_document": round((peak - baseline) / documents, 2),
+    }
+
+
+async def serve_file(request: web.Request) -> web.Response:
+    size, index = int(request.match_info["size"]), int(request.match_info["index"])
+    return web.Response(body=make_document(index, size), content_type="application/pdf")
+
+
+def start_background_server() -> str:
+    """Serve the fake analyze API and generated PDFs from a thread and return the base URL."""
+    ready = threading.Event()
+    endpoint = []
+
+    async def serve():
+        fake = FakeDocumentIntelligence(tps=0, poll_tps=0, processing_seconds=0)
+        app = fake.create_app()
+        app.router.add_get("/files/{size}/{index}", serve_file)
+        fake.create_app = lambda: app
+        _, url = await start_server(fake)
+        endpoint.append(url)
+        ready.set()
+        await asyncio.Event().wait()
+
+    threading.Thread(target=lambda: asyncio.run(serve()), daemon=True).start()
+    ready.wait()
+    return endpoint[0]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--documents", type=int, default=8, help="Documents in flight at once")
+    parser.add_argument("--mb", type=float, default=8, help="Size of each document in MB")
+    parser.add_argument("--methods", default=",".join(METHODS))
+    parser.add_argument("--output", default=None, help="Write results as JSON to this path")
+    parser.add_argument("--worker", default=None, help=argparse.SUPPRESS)
+    parser.add_argument("--base-url", default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+    size = int(args.mb * 1024 * 1024)
+
+    if args.worker:
+        print(json.dumps(worker(args.worker, args.base_url, args.documents, size)))
+        return 0
+
+    base_url = start_background_server()
+    results = []
+    for method in args.methods.split(","):
+        with tempfile.TemporaryDirectory() as cache_dir:
+            env = os.environ | {
+                "AZURE_DOCUMENT_INTELLIGENCE_ENDPOINT": base_url,
+                "AZURE_DOCUMENT_INTELLIGENCE_KEY": "fake-key",
+                "OCR_CACHE_DIR": cache_dir,
+                "INVOICE_TELEMETRY": "off",
+            }
+            command = [sys.executable, "-m", "benchmarks.document_io", "--worker", method, "--base-url", base_url]
+            command += ["--documents", str(args.documents), "--mb", str(args.mb)]
+            completed = subprocess.run(command, env=env, capture_output=True, text=True, check=True)
+        result = json.loads(completed.stdout.strip().splitlines()[-1])
+        results.append(result)
+        print(
+            f"{method:<16} {result['documents']:>3} x {result['document_mb']:>6.2f} MB "
+            f"{result['peak_rss_mb']:>8.1f} MB peak RSS {result['rss_mb_per_document']:>8.2f} MB/document"
+        )
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2), encoding="utf-8")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
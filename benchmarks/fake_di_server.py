@@ -0,0 +1,138 @@
+"""
+Local fake of the Azure Document Intelligence analyze API, for exercising the async OCR scheduler offline.
+
+It accepts `POST /documentintelligence/documentModels/{model}:analyze`, answers `202` with an
+`Operation-Location`, and serves `GET .../analyzeResults/{id}` as `running` until `processing_seconds`
+have passed. Submissions beyond `tps` per second and polls beyond `poll_tps` per second get `429`
+with a `Retry-After` header, like the real service, which limits the two separately.
+
+Usage:
+    python -m benchmarks.fake_di_server [--port 8765] [--tps 15] [--poll-tps 50] [--processing-seconds 2]
+"""
+
+import argparse
+import asyncio
+import time
+import uuid
+from collections import deque
+
+from aiohttp import web
+
+from src.pipeline.stubs import STUB_MARKDOWN
+
+API_VERSION = "2024-11-30"
+
+
+class FakeDocumentIntelligence:
+    def __init__(self, tps: float = 15, processing_seconds: float = 2.0, content: str = STUB_MARKDOWN, poll_tps: float = 50):
+        self.tps = tps
+        self.poll_tps = poll_tps
+        self.processing_seconds = processing_seconds
+        self.content = content
+        self.operations: dict[str, tuple[str, float]] = {}
+        self._recent: deque[float] = deque()
+        self._recent_polls: deque[float] = deque()
+        self.stats = {"requests": 0, "submissions": 0, "polls": 0, "throttled": 0, "max_rps": 0, "max_poll_rps": 0}
+
+    def _throttled(self, recent: deque[float], tps: float, max_rps_key: str) -> bool:
+        now = time.monotonic()
+        while recent and now - recent[0] >= 1.0:
+            recent.popleft()
+        self.stats["requests"] += 1
+        if tps and len(recent) >= tps:
+            self.stats["throttled"] += 1
+            return True
+        recent.append(now)
+        self.stats[max_rps_key] = max(self.stats[max_rps_key], len(recent))
+        return False
+
+    def _too_many_requests(self) -> web.Response:
+        return web.json_response(
+            {"error": {"code": "429", "message": "Requests to the analyze API have exceeded the rate limit."}},
+            status=429,
+            headers={"Retry-After": "1"},
+        )
+
+    async def analyze(self, request: web.Request) -> web.Response:
+        if self._throttled(self._recent, self.tps, "max_rps"):
+            return self._too_many_requests()
+        await request.read()
+        model_id = request.match_info["model_id"]
+        result_id = str(uuid.uuid4())
+        self.operations[result_id] = (model_id, time.monotonic())
+        self.stats["submissions"] += 1
+        operation_location = (
+            f"{request.scheme}://{request.host}/documentintelligence/documentModels/{model_id}"
+            f"/analyzeResults/{result_id}?api-version={API_VERSION}"
+        )
+        return web.Response(status=202, headers={"Operation-Location": operation_location})
+
+    async def analyze_result(self, request: web.Request) -> web.Response:
+        if self._throttled(self._recent_polls, self.poll_tps, "max_poll_rps"):
+            return self._too_many_requests()
+        self.stats["polls"] += 1
+        result_id = request.match_info["result_id"]
+        if result_id not in self.operations:
+            return web.json_response({"error": {"code": "NotFound", "message": "Operation not found."}}, status=404)
+
+        model_id, submitted = self.operations[result_id]
+        if time.monotonic() - submitted < self.processing_seconds:
+            return web.json_response({"status": "running", "createdDateTime": "2025-01-01T00:00:00Z"})
+
+        analyze_result = {"apiVersion": API_VERSION, "modelId": model_id, "content": self.content, "pages": []}
+        if model_id == "prebuilt-invoice":
+            analyze_result["documents"] = [
+                {
+                    "docType": "invoice",
+                    "confidence": 0.95,
+                    "fields": {
+                        "InvoiceId": {"type": "string", "valueString": "FAKE-0001", "confidence": 0.95},
+                        "VendorName": {"type": "string", "valueString": "Fake Supplier", "confidence": 0.95},
+                    },
+                }
+            ]
+        return web.json_response({"status": "succeeded", "analyzeResult": analyze_result})
+
+    def create_app(self) -> web.Application:
+        app = web.Application(client_max_size=100 * 1024**2)
+        app.router.add_post("/documentintelligence/documentModels/{model_id}:analyze", self.analyze)
+        app.router.add_get("/documentintelligence/documentModels/{model_id}/analyzeResults/{result_id}", self.analyze_result)
+        return app
+
+
+async def start_server(fake: FakeDocumentIntelligence, host: str = "127.0.0.1", port: int = 0) -> tuple[web.AppRunner, str]:
+    """Start `fake` in the running event loop and return the runner and its endpoint URL."""
+    runner = web.AppRunner(fake.create_app(), access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, host, port)
+    await site.start()
+    bound_port = site._server.sockets[0].getsockname()[1]
+    return runner, f"http://{host}:{bound_port}"
+
+
+async def _serve(args) -> None:
+    fake = FakeDocumentIntelligence(tps=args.tps, poll_tps=args.poll_tps, processing_seconds=args.processing_seconds)
+    runner, endpoint = await start_server(fake, port=args.port)
+    print(f"Fake Document Intelligence listening on {endpoint}")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await runner.cleanup()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--tps", type=float, default=15, help="Submissions per second before answering 429")
+    parser.add_argument("--poll-tps", type=float, default=50, help="Result polls per second before answering 429")
+    parser.add_argument("--processing-seconds", type=float, default=2.0, help="Time an analysis stays running")
+    args = parser.parse_args(argv)
+    try:
+        asyncio.run(_serve(args))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    main()
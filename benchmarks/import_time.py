@@ -0,0 +1,98 @@
+"""
+Report cold-start import time per entry point using `python -X importtime`.
+
+Each entry point is imported in a fresh interpreter. The script fails if an entry point exceeds
+`--max-ms` or eagerly imports a provider/OCR SDK that should only load on first use.
+
+Usage:
+    python -m benchmarks.import_time [--repeat 3] [--max-ms 1500] [--output import_time.json]
+"""
+
+import argparse
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+
+# `app.py` runs the Streamlit script on import, so measure the modules it imports instead
+ENTRY_POINTS = {
+    "main": "import main",
+    "app": "import streamlit, pandas, src.chains, src.ocr",
+    "src.chains": "import src.chains",
+    "src.ocr": "import src.ocr",
+    "src.models": "import src.models",
+}
+
+LAZY_MODULES = (
+    "langchain_openai",
+    "langchain_anthropic",
+    "langchain_google_genai",
+    "langchain_community",
+    "azure.ai.documentintelligence",
+)
+
+
+def measure(statement: str) -> dict:
+    """Import `statement` in a fresh interpreter and return total time and the heaviest modules."""
+    probe = f"{statement}; import sys, json; print(json.dumps([m for m in {LAZY_MODULES!r} if m in sys.modules]))"
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", probe],
+        cwd=ROOT_DIR,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+    total_us = 0
+    package_us: dict[str, int] = {}
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, _, name = line.split(":", 1)[1].split("|")
+        total_us += int(self_us)
+        # Attribute each module's own time to its top-level package
+        package = name.strip().split(".")[0]
+        package_us[package] = package_us.get(package, 0) + int(self_us)
+
+    heaviest = sorted(package_us.items(), key=lambda item: item[1], reverse=True)[:5]
+    return {
+        "total_ms": round(total_us / 1000, 1),
+        "heaviest": [{"package": package, "ms": round(us / 1000, 1)} for package, us in heaviest],
+        "eager_modules": json.loads(completed.stdout.strip().splitlines()[-1]),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per entry point; the fastest is reported")
+    parser.add_argument("--max-ms", type=float, default=None, help="Fail if any entry point exceeds this budget")
+    parser.add_argument("--output", default=None, help="Write results as JSON to this path")
+    args = parser.parse_args(argv)
+
+    results = {}
+    failures = []
+    for entry_point, statement in ENTRY_POINTS.items():
+        runs = [measure(statement) for _ in range(args.repeat)]
+        best = min(runs, key=lambda run: run["total_ms"])
+        results[entry_point] = best
+
+        heaviest = ", ".join(f"{item['package']} {item['ms']}ms" for item in best["heaviest"][:3])
+        print(f"{entry_point:<12} {best['total_ms']:>9.1f} ms   [{heaviest}]")
+
+        if best["eager_modules"]:
+            failures.append(f"{entry_point} eagerly imports {', '.join(best['eager_modules'])}")
+        if args.max_ms is not None and best["total_ms"] > args.max_ms:
+            failures.append(f"{entry_point} took {best['total_ms']}ms (budget {args.max_ms}ms)")
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2), encoding="utf-8")
+
+    for failure in failures:
+        print(f"FAIL: {failure}", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,154 @@
+"""
+Load test the HTTP ingestion service (`serve.py`) with stub OCR and LLM backends.
+
+The service runs as a subprocess (`serve.py --stub`). Closed-loop clients submit unique documents
+for `--duration` seconds, in one of two modes:
+    sync    `POST /invoices?sync=true`, latency is the response time
+    async   `POST /invoices`, then poll `/invoices/{id}/result` until it is ready
+
+A client answered with 429 waits for `Retry-After` and submits again; latency runs from the
+first attempt. For each mode it reports sustained completed requests per second, p50/p95/p99
+latency and the number of 429 responses.
+
+Usage:
+    python -m benchmarks.ingestion_service [--modes sync,async] [--concurrency 32] [--duration 20]
+        [--workers 8] [--queue-size 16] [--ocr-latency 0.2] [--llm-latency 0.5] [--output service.json]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import aiohttp
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def percentile(values: list[float], q: float) -> float | None:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def start_service(args, port: int) -> subprocess.Popen:
+    command = [sys.executable, "serve.py", "--stub", "--host", "127.0.0.1", "--port", str(port)]
+    command += ["--workers", str(args.workers), "--queue-size", str(args.queue_size), "--stub-ocr-latency", str(args.ocr_latency)]
+    env = os.environ | {"STUB_LLM_LATENCY": str(args.llm_latency), "INVOICE_TELEMETRY": "off"}
+    return subprocess.Popen(command, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+async def wait_until_ready(session: aiohttp.ClientSession, base_url: str, timeout: float = 60.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            async with session.get(f"{base_url}/health") as response:
+                if response.status == 200:
+                    return
+        except aiohttp.ClientError:
+            pass
+        await asyncio.sleep(0.2)
+    raise RuntimeError("Service did not start")
+
+
+async def submit(session, base_url: str, document: bytes, filename: str, sync: bool, counters: dict) -> tuple[int, dict]:
+    params = {"filename": filename} | ({"sync": "true"} if sync else {})
+    while True:
+        async with session.post(f"{base_url}/invoices", data=document, params=params) as response:
+            body = await response.json()
+            if response.status != 429:
+                return response.status, body
+            counters["throttled"] += 1
+            await asyncio.sleep(float(response.headers.get("Retry-After", "1")))
+
+
+async def client(session, base_url: str, client_id: int, mode: str, deadline: float, poll_interval: float, latencies, counters):
+    i = 0
+    while time.monotonic() < deadline:
+        i += 1
+        filename = f"load-{mode}-{client_id}-{i}.pdf"
+        started = time.perf_counter()
+        status, body = await submit(session, base_url, b"%PDF-1.7 " + filename.encode(), filename, mode == "sync", counters)
+        while status == 202:
+            await asyncio.sleep(poll_interval)
+            async with session.get(f"{base_url}{body['result_url']}") as response:
+                status, body = response.status, await response.json()
+        if status == 200:
+            latencies.append(time.perf_counter() - started)
+        else:
+            counters["errors"] += 1
+
+
+async def run(args, base_url: str, mode: str) -> dict:
+    latencies: list[float] = []
+    counters = {"throttled": 0, "errors": 0}
+    connector = aiohttp.TCPConnector(limit=args.concurrency * 2)
+    async with aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=300)) as session:
+        await wait_until_ready(session, base_url)
+        started = time.perf_counter()
+        deadline = time.monotonic() + args.duration
+        await asyncio.gather(
+            *(client(session, base_url, i, mode, deadline, args.poll_interval, latencies, counters) for i in range(args.concurrency))
+        )
+        elapsed = time.perf_counter() - started
+    return {
+        "mode": mode,
+        "concurrency": args.concurrency,
+        "workers": args.workers,
+        "queue_size": args.queue_size,
+        "completed": len(latencies),
+        "requests_per_second": round(len(latencies) / elapsed, 2),
+        "p50_seconds": round(percentile(latencies, 0.50), 3) if latencies else None,
+        "p95_seconds": round(percentile(latencies, 0.95), 3) if latencies else None,
+        "p99_seconds": round(percentile(latencies, 0.99), 3) if latencies else None,
+        "throttled_429": counters["throttled"],
+        "errors": counters["errors"],
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--modes", default="sync,async")
+    parser.add_argument("--concurrency", type=int, default=32, help="Concurrent clients")
+    parser.add_argument("--duration", type=float, default=20.0, help="Seconds of load per mode")
+    parser.add_argument("--workers", type=int, default=8, help="Service workers")
+    parser.add_argument("--queue-size", type=int, default=16, help="Service queue size")
+    parser.add_argument("--ocr-latency", type=float, default=0.2, help="Stub OCR latency in seconds")
+    parser.add_argument("--llm-latency", type=float, default=0.5, help="Stub LLM latency in seconds")
+    parser.add_argument("--poll-interval", type=float, default=0.1, help="Result polling interval in async mode")
+    parser.add_argument("--output", default=None, help="Write results as JSON to this path")
+    args = parser.parse_args(argv)
+
+    results = []
+    for mode in args.modes.split(","):
+        port = _free_port()
+        service = start_service(args, port)
+        try:
+            result = asyncio.run(run(args, f"http://127.0.0.1:{port}", mode))
+        finally:
+            service.terminate()
+            service.wait()
+        results.append(result)
+        print(
+            f"{mode:<6} {result['completed']:>6} completed {result['requests_per_second']:>8.2f} req/s "
+            f"p50 {result['p50_seconds']}s p95 {result['p95_seconds']}s p99 {result['p99_seconds']}s "
+            f"429s {result['throttled_429']} errors {result['errors']}"
+        )
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2), encoding="utf-8")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,117 @@
+"""
+Compare the tolerant JSON decoder with the previous `return_json_result` on model outputs with 1-2000 line items.
+
+Each output is a fenced invoice object in one of these styles:
+    clean       valid JSON
+    literals    Python `None`/`True` and trailing commas
+    comments    `#` comments after values, as in the prompt's example
+    truncated   cut off part-way through the last line item
+
+For each decoder it reports milliseconds per call and whether the output was decoded.
+
+Usage:
+    python -m benchmarks.json_decoder [--items 1,10,100,1000,2000] [--repeat 5] [--output decoder.json]
+"""
+
+import argparse
+import ast
+import json
+import sys
+import time
+from pathlib import Path
+
+from src.chains.process_invoice_chain import return_json_result
+
+HEADER = {
+    "invoice_id": "INV-2024-0042",
+    "invoice_date": "2024-03-01",
+    "invoice_total": 1234.5,
+    "invoice_total_currency": "EUR",
+    "seller_name": "Acme Freight SARL",
+    "seller_address": {"street": "12 Rue de Fes", "city": "Casablanca", "state": None, "postcode": "20000", "country": "MA"},
+    "metadata": {"language": ["fr"], "confidence_score": 0.92},
+}
+
+
+def legacy_return_json_result(result):
+    """`return_json_result` before the tolerant decoder, kept for comparison."""
+    if isinstance(result, dict):
+        return result
+    cleaned = result.replace("```json", "").replace("```", "").strip()
+    try:
+        return json.loads(cleaned)
+    except json.JSONDecodeError:
+        python_obj = ast.literal_eval(cleaned)
+        if isinstance(python_obj, dict):
+            return python_obj
+        raise ValueError("LLM response is not a JSON object")
+
+
+def make_output(n_items: int, style: str) -> str:
+    items = [
+        {
+            "description": f"Container freight leg {i}",
+            "quantity": 2,
+            "unit_price": 310.25,
+            "total_price": 620.5,
+            "vat_rate": 0.2,
+            "currency": "EUR",
+            "cost_center": None,
+        }
+        for i in range(n_items)
+    ]
+    text = json.dumps(HEADER | {"items": items}, indent=2)
+    if style == "literals":
+        text = text.replace("null", "None").replace('"EUR"\n', '"EUR",\n').replace("}\n  ]", "},\n  ]")
+    elif style == "comments":
+        text = text.replace('"quantity": 2,', '"quantity": 2, # units shipped').replace('"EUR",\n  "seller', '"EUR", # ISO code\n  "seller')
+    elif style == "truncated":
+        text = text[: text.rfind('"total_price"')]
+    return f"```json\n{text}\n```" if style != "truncated" else f"```json\n{text}"
+
+
+def _time(decoder, text: str, repeat: int) -> tuple[float | None, str]:
+    try:
+        decoder(text)
+    except (ValueError, SyntaxError) as exc:
+        return None, f"{type(exc).__name__}"
+    started = time.perf_counter()
+    for _ in range(repeat):
+        decoder(text)
+    return (time.perf_counter() - started) / repeat, "ok"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--items", default="1,10,100,1000,2000", help="Comma-separated line item counts")
+    parser.add_argument("--styles", default="clean,literals,comments,truncated")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", default=None, help="Write results as JSON to this path")
+    args = parser.parse_args(argv)
+
+    decoders = {"legacy": legacy_return_json_result, "tolerant": return_json_result}
+    results = []
+    for style in args.styles.split(","):
+        for n_items in (int(value) for value in args.items.split(",")):
+            text = make_output(n_items, style)
+            row = {"style": style, "items": n_items, "bytes": len(text)}
+            for name, decoder in decoders.items():
+                seconds, status = _time(decoder, text, args.repeat)
+                row[f"{name}_ms"] = round(seconds * 1000, 3) if seconds is not None else None
+                row[f"{name}_status"] = status
+            results.append(row)
+            print(
+                f"{style:<10} {n_items:>5} items "
+                + "  ".join(
+                    f"{name} {row[f'{name}_ms']:>9.3f} ms" if row[f"{name}_ms"] is not None else f"{name} {row[f'{name}_status']:>12}"
+                    for name in decoders
+                )
+            )
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2), encoding="utf-8")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
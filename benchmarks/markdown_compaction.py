@@ -0,0 +1,109 @@
+"""
+Measure token reduction and extraction parity of the markdown compaction stage.
+
+Content parity checks that every table cell and number in the original markdown survives
+compaction. With `--model`, both versions are also extracted and the leaf fields compared.
+
+Usage:
+    python -m benchmarks.markdown_compaction [--fixtures DIR] [--model azure-gpt-4.1-mini] [--output compaction.json]
+"""
+
+import argparse
+import json
+import re
+import sys
+import time
+from pathlib import Path
+
+from src.ocr import split_doc_pages
+from src.preprocessing import compact_pdf_output
+from src.utils import count_tokens
+
+FIXTURES_DIR = Path(__file__).resolve().parent / "fixtures" / "markdown"
+CELL_PATTERN = re.compile(r"<t[dh][^>]*>(.*?)</t[dh]>", re.DOTALL)
+NUMBER_PATTERN = re.compile(r"\d[\d.,/-]*\d|\d")
+
+
+def content_parity(original: str, compacted: str) -> float:
+    """Share of table cells and numbers from `original` that are still present in `compacted`."""
+    values = {" ".join(cell.split()) for cell in CELL_PATTERN.findall(original)}
+    values |= set(NUMBER_PATTERN.findall(original))
+    values.discard("")
+    if not values:
+        return 1.0
+    return sum(value in compacted for value in values) / len(values)
+
+
+def _leaf_fields(data, prefix=""):
+    if isinstance(data, dict):
+        for key, value in data.items():
+            yield from _leaf_fields(value, f"{prefix}{key}.")
+    elif isinstance(data, list) and data and isinstance(data[0], dict):
+        for i, value in enumerate(data):
+            yield from _leaf_fields(value, f"{prefix}{i}.")
+    else:
+        yield prefix.rstrip("."), data
+
+
+def extraction_parity(original: dict, compacted: dict) -> float:
+    """Share of leaf fields extracted identically from the original and compacted markdown."""
+    original_fields = dict(_leaf_fields(original))
+    compacted_fields = dict(_leaf_fields(compacted))
+    keys = original_fields.keys() | compacted_fields.keys()
+    matching = sum(original_fields.get(key) == compacted_fields.get(key) for key in keys)
+    return matching / len(keys) if keys else 1.0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--fixtures", default=str(FIXTURES_DIR), help="Directory of OCR markdown files")
+    parser.add_argument("--model", default=None, help="Also extract both versions with this model and compare fields")
+    parser.add_argument("--output", default=None, help="Write results as JSON to this path")
+    args = parser.parse_args(argv)
+
+    results = []
+    for fixture in sorted(Path(args.fixtures).glob("*.md")):
+        doc_content = fixture.read_text(encoding="utf-8")
+        pdf_output = {"doc_pages": split_doc_pages(doc_content), "doc_content": doc_content}
+        original_tokens = count_tokens(doc_content)
+
+        for table_format in ("pipe", "tsv"):
+            started = time.perf_counter()
+            compacted = compact_pdf_output(pdf_output, table_format=table_format)
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            compacted_tokens = count_tokens(compacted["doc_content"])
+
+            result = {
+                "fixture": fixture.name,
+                "table_format": table_format,
+                "pages": len(pdf_output["doc_pages"]),
+                "original_tokens": original_tokens,
+                "compacted_tokens": compacted_tokens,
+                "token_reduction": round(1 - compacted_tokens / original_tokens, 4),
+                "compaction_ms": round(elapsed_ms, 2),
+                "content_parity": round(content_parity(doc_content, compacted["doc_content"]), 4),
+            }
+
+            if args.model:
+                from src.chains import process_invoice_chain
+
+                original_result = process_invoice_chain(doc_content, model=args.model, use_cache=False)
+                compacted_result = process_invoice_chain(compacted["doc_content"], model=args.model, use_cache=False)
+                result["extraction_parity"] = round(extraction_parity(original_result["content"], compacted_result["content"]), 4)
+                result["original_input_tokens"] = original_result["usage_metadata"]["input_tokens"]
+                result["compacted_input_tokens"] = compacted_result["usage_metadata"]["input_tokens"]
+
+            results.append(result)
+            parity = f"  extraction parity {result['extraction_parity']:.1%}" if "extraction_parity" in result else ""
+            print(
+                f"{fixture.name:<40} {table_format:<5} {original_tokens:>7} -> {compacted_tokens:>7} tokens "
+                f"({result['token_reduction']:.1%} saved, {elapsed_ms:.1f}ms)  content parity {result['content_parity']:.1%}{parity}"
+            )
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2), encoding="utf-8")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
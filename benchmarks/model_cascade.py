@@ -0,0 +1,134 @@
+"""
+Compare the model cascade against single-model extraction on a labelled corpus of OCR markdown.
+
+Each label file in the corpus is JSON with `markdown` (path to the OCR markdown, relative to the
+label file) and `expected` (the fields of `ProcessInvoiceResult` to score; items are matched by
+position). Accuracy is the share of labelled leaf fields extracted correctly, with numbers compared
+to within 1% and strings compared case- and whitespace-insensitively.
+
+Usage:
+    python -m benchmarks.model_cascade [--corpus DIR] [--models azure-gpt-4.1-mini,azure-gpt-4.1]
+        [--cascade azure-gpt-4.1-mini,azure-gpt-4.1] [--stub] [--output cascade.json]
+"""
+
+import argparse
+import json
+import statistics
+import sys
+import time
+from pathlib import Path
+
+from benchmarks.markdown_compaction import _leaf_fields
+from src.chains import DEFAULT_CASCADE, process_invoice_cascade, process_invoice_chain
+
+CORPUS_DIR = Path(__file__).resolve().parent / "fixtures" / "labelled"
+
+
+def _matches(actual, expected) -> bool:
+    if isinstance(expected, (int, float)) and not isinstance(expected, bool):
+        return isinstance(actual, (int, float)) and abs(actual - expected) <= max(0.01, 0.01 * abs(expected))
+    if isinstance(expected, str):
+        return isinstance(actual, str) and " ".join(actual.split()).casefold() == " ".join(expected.split()).casefold()
+    return actual == expected
+
+
+def field_accuracy(actual: dict, expected: dict) -> float:
+    """Share of the leaf fields in `expected` that `actual` matches."""
+    expected_fields = dict(_leaf_fields(expected))
+    actual_fields = dict(_leaf_fields(actual))
+    if not expected_fields:
+        return 1.0
+    return sum(_matches(actual_fields.get(key), value) for key, value in expected_fields.items()) / len(expected_fields)
+
+
+def load_corpus(corpus_dir: Path) -> list[dict]:
+    corpus = []
+    for label_path in sorted(corpus_dir.glob("*.json")):
+        label = json.loads(label_path.read_text(encoding="utf-8"))
+        markdown_path = (label_path.parent / label["markdown"]).resolve()
+        corpus.append({"name": label_path.stem, "markdown": markdown_path.read_text(encoding="utf-8"), "expected": label["expected"]})
+    return corpus
+
+
+def run_scenario(name: str, extract, corpus: list[dict]) -> dict:
+    accuracies, latencies, costs, escalations, failures = [], [], [], [], 0
+    for document in corpus:
+        started = time.perf_counter()
+        try:
+            result = extract(document["markdown"])
+        except Exception as exc:
+            print(f"  {name}: {document['name']} failed: {exc}", file=sys.stderr)
+            failures += 1
+            accuracies.append(0.0)
+            continue
+        latencies.append(time.perf_counter() - started)
+        costs.append(result["usage_metadata"]["llm_cost_usd"])
+        escalations.append(result["usage_metadata"].get("escalations", 0))
+        accuracies.append(field_accuracy(result["content"], document["expected"]))
+
+    return {
+        "scenario": name,
+        "documents": len(corpus),
+        "failed": failures,
+        "accuracy": round(statistics.mean(accuracies), 4) if accuracies else 0.0,
+        "mean_latency_seconds": round(statistics.mean(latencies), 3) if latencies else None,
+        "total_cost_usd": round(sum(costs), 6),
+        "mean_cost_usd": round(statistics.mean(costs), 6) if costs else None,
+        "escalation_rate": round(sum(1 for count in escalations if count) / len(escalations), 4) if escalations else 0.0,
+    }
+
+
+def _register_stub_models() -> tuple[list[str], list[str]]:
+    """Offline stand-ins: a fast cheap model reporting low confidence and a slower expensive one."""
+    from src.models import register_model
+    from src.pipeline.stubs import STUB_INVOICE, register_stub_models
+
+    register_stub_models()
+    uncertain = json.dumps(STUB_INVOICE | {"metadata": {"language": ["en"], "confidence_score": 0.5}})
+    register_model("stub-cheap", "stub", latency=0.05, response=uncertain, input_cost_per_m=0.4, output_cost_per_m=1.6)
+    register_model("stub-strong", "stub", latency=0.3, input_cost_per_m=2.0, output_cost_per_m=8.0)
+    return ["stub-cheap", "stub-strong"], ["stub-cheap", "stub-strong"]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--corpus", default=str(CORPUS_DIR), help="Directory of label files")
+    parser.add_argument("--models", default=",".join(DEFAULT_CASCADE), help="Comma-separated models run on their own")
+    parser.add_argument("--cascade", default=",".join(DEFAULT_CASCADE), help="Comma-separated cascade, cheapest first")
+    parser.add_argument("--min-confidence", type=float, default=0.8)
+    parser.add_argument("--stub", action="store_true", help="Use offline stub models (exercises the harness only)")
+    parser.add_argument("--output", default=None, help="Write results as JSON to this path")
+    args = parser.parse_args(argv)
+
+    models, cascade = args.models.split(","), args.cascade.split(",")
+    if args.stub:
+        models, cascade = _register_stub_models()
+
+    corpus = load_corpus(Path(args.corpus))
+    scenarios = [
+        (model, lambda markdown, model=model: process_invoice_chain(markdown, model=model, use_cache=False)) for model in models
+    ]
+    scenarios.append(
+        (
+            "cascade:" + ">".join(cascade),
+            lambda markdown: process_invoice_cascade(markdown, models=cascade, min_confidence=args.min_confidence, use_cache=False),
+        )
+    )
+
+    results = []
+    for name, extract in scenarios:
+        result = run_scenario(name, extract, corpus)
+        results.append(result)
+        latency = f"{result['mean_latency_seconds']:.2f}s" if result["mean_latency_seconds"] is not None else "-"
+        print(
+            f"{name:<50} accuracy {result['accuracy']:.1%}  mean latency {latency}  "
+            f"cost ${result['total_cost_usd']:.4f}  escalations {result['escalation_rate']:.0%}  failed {result['failed']}"
+        )
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2), encoding="utf-8")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,163 @@
+"""
+Token savings and field recall of page relevance triage on a labelled page set, offline.
+
+Each bundle in `benchmarks/fixtures/pages` is an invoice from `benchmarks/fixtures/markdown` with
+the pages that come with it in practice (cover letters, delivery notes, terms and conditions,
+remittance slips, packing lists), each file labelled relevant or not. For every bundle the
+benchmark reports page precision and recall of `triage_pdf_output`, the tokens of the whole and
+the triaged document, the triage time, and field recall: the share of the labelled fields
+(`benchmarks/fixtures/labelled`) found in the whole document that are still found in the triaged
+one. With `--model`, both versions are also extracted and scored against the labels.
+
+Usage:
+    python -m benchmarks.page_triage [--fixtures DIR] [--threshold 0.5] [--model azure-gpt-4.1-mini]
+        [--output page_triage.json]
+"""
+
+import argparse
+import datetime
+import json
+import re
+import sys
+import time
+from pathlib import Path
+
+from benchmarks.markdown_compaction import _leaf_fields
+from src.ocr import split_doc_pages
+from src.preprocessing import triage_pdf_output
+from src.utils import count_tokens
+
+FIXTURES_DIR = Path(__file__).resolve().parent / "fixtures" / "pages"
+NUMBER_PATTERN = re.compile(r"\d{1,3}(?:[   .,]\d{3})+(?:[.,]\d+)?|\d+(?:[.,]\d+)?")
+
+
+def load_bundle(bundle_path: Path) -> dict:
+    """The joined markdown of a bundle, the relevance label of each page and the expected fields."""
+    markdowns, labels = [], []
+    bundle = json.loads(bundle_path.read_text(encoding="utf-8"))
+    for part in bundle["pages"]:
+        markdown = (bundle_path.parent / part["markdown"]).read_text(encoding="utf-8")
+        markdowns.append(markdown)
+        labels.extend([part["relevant"]] * (markdown.count("<!-- PageBreak -->") + 1))
+    expected = json.loads((bundle_path.parent / bundle["expected"]).read_text(encoding="utf-8"))["expected"]
+    return {"name": bundle_path.stem, "doc_content": "<!-- PageBreak -->".join(markdowns), "labels": labels, "expected": expected}
+
+
+def _parse_number(text: str) -> float:
+    text = re.sub(r"[   ]", "", text)
+    decimal = max(text.rfind(","), text.rfind("."))
+    # A separator followed by exactly three digits is a thousands separator
+    if decimal == -1 or len(text) - decimal - 1 == 3:
+        return float(re.sub(r"[.,]", "", text))
+    return float(re.sub(r"[.,]", "", text[:decimal]) + "." + text[decimal + 1 :])
+
+
+def _spellings(value: str) -> list[str]:
+    """The ways an ISO date may be written on an invoice, or the value itself."""
+    try:
+        date = datetime.date.fromisoformat(value)
+    except ValueError:
+        return [value]
+    return [
+        value,
+        date.strftime("%d/%m/%Y"),
+        date.strftime("%m/%d/%Y"),
+        date.strftime("%d.%m.%Y"),
+        f"{date:%B} {date.day}, {date.year}",
+        f"{date.day} {date:%B} {date.year}",
+    ]
+
+
+def locatable_fields(expected: dict, content: str) -> set[str]:
+    """Leaf fields of `expected` whose value appears in `content`, numbers compared by value."""
+    text = " ".join(re.sub(r"<[^>]+>", " ", content).split()).lower()
+    numbers = {_parse_number(match) for match in NUMBER_PATTERN.findall(text)}
+    found = set()
+    for key, value in _leaf_fields(expected):
+        if value is None or isinstance(value, (bool, list)):
+            continue
+        if isinstance(value, (int, float)):
+            located = float(value) in numbers
+        else:
+            located = any(" ".join(spelling.split()).lower() in text for spelling in _spellings(str(value)))
+        if located:
+            found.add(key)
+    return found
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--fixtures", default=str(FIXTURES_DIR), help="Directory of labelled page bundles")
+    parser.add_argument("--threshold", type=float, default=0.5, help="Relevance score a page needs to be kept")
+    parser.add_argument("--model", default=None, help="Also extract both versions with this model and score them")
+    parser.add_argument("--output", default=None, help="Write results as JSON to this path")
+    args = parser.parse_args(argv)
+
+    results = []
+    for bundle_path in sorted(Path(args.fixtures).glob("*.json")):
+        bundle = load_bundle(bundle_path)
+        pdf_output = {"doc_pages": split_doc_pages(bundle["doc_content"]), "doc_content": bundle["doc_content"]}
+
+        started = time.perf_counter()
+        triaged = triage_pdf_output(pdf_output, threshold=args.threshold)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+
+        kept = {page["page"] for page in triaged["doc_pages"]}
+        relevant = {i for i, label in enumerate(bundle["labels"], start=1) if label}
+        full_tokens = count_tokens(pdf_output["doc_content"])
+        triaged_tokens = count_tokens(triaged["doc_content"])
+        full_fields = locatable_fields(bundle["expected"], pdf_output["doc_content"])
+        triaged_fields = locatable_fields(bundle["expected"], triaged["doc_content"]) & full_fields
+
+        result = {
+            "bundle": bundle["name"],
+            "pages": len(pdf_output["doc_pages"]),
+            "relevant_pages": sorted(relevant),
+            "kept_pages": sorted(kept),
+            "page_precision": round(len(kept & relevant) / len(kept), 4) if kept else 1.0,
+            "page_recall": round(len(kept & relevant) / len(relevant), 4) if relevant else 1.0,
+            "full_tokens": full_tokens,
+            "triaged_tokens": triaged_tokens,
+            "token_reduction": round(1 - triaged_tokens / full_tokens, 4),
+            "triage_ms": round(elapsed_ms, 3),
+            "field_recall": round(len(triaged_fields) / len(full_fields), 4) if full_fields else 1.0,
+            "missing_fields": sorted(full_fields - triaged_fields),
+        }
+
+        if args.model:
+            from benchmarks.model_cascade import field_accuracy
+            from src.chains import process_invoice_chain
+
+            full_result = process_invoice_chain(pdf_output["doc_content"], model=args.model, use_cache=False)
+            triaged_result = process_invoice_chain(triaged["doc_content"], model=args.model, use_cache=False)
+            result["full_accuracy"] = round(field_accuracy(full_result["content"], bundle["expected"]), 4)
+            result["triaged_accuracy"] = round(field_accuracy(triaged_result["content"], bundle["expected"]), 4)
+            result["full_input_tokens"] = full_result["usage_metadata"]["input_tokens"]
+            result["triaged_input_tokens"] = triaged_result["usage_metadata"]["input_tokens"]
+
+        results.append(result)
+        accuracy = (
+            f"  accuracy {result['full_accuracy']:.1%} -> {result['triaged_accuracy']:.1%}" if "full_accuracy" in result else ""
+        )
+        print(
+            f"{bundle['name']:<28} kept {len(kept):>2}/{result['pages']:<2} pages (precision {result['page_precision']:.0%}, "
+            f"recall {result['page_recall']:.0%})  {full_tokens:>6} -> {triaged_tokens:>6} tokens ({result['token_reduction']:.1%} saved, "
+            f"{elapsed_ms:.2f}ms)  field recall {result['field_recall']:.1%}{accuracy}"
+        )
+
+    if results:
+        full_tokens = sum(result["full_tokens"] for result in results)
+        triaged_tokens = sum(result["triaged_tokens"] for result in results)
+        print(
+            f"{'total':<28} {triaged_tokens}/{full_tokens} tokens ({1 - triaged_tokens / full_tokens:.1%} saved)  "
+            f"min page recall {min(result['page_recall'] for result in results):.0%}  "
+            f"min field recall {min(result['field_recall'] for result in results):.1%}"
+        )
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2), encoding="utf-8")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
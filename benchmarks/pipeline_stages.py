@@ -0,0 +1,197 @@
+"""
+Offline benchmark of the extraction pipeline stages at 1/10/100/1000-invoice scales.
+
+OCR is replayed from recorded `parse_pdf_azure` outputs in `benchmarks/fixtures/ocr` and the LLM is
+a stub with configurable latency and output tokens, so no credentials or network are needed. For
+each stage and scale it reports wall time, time per invoice, throughput and peak traced memory.
+Results are written as JSON so runs can be compared across commits.
+
+Stages:
+    return_json_result           decode the fenced JSON of a model response
+    parse_process_invoice_result validate the decoded dict into `ProcessInvoiceResult`
+    flatten_invoice_output       flatten the validated content into CSV rows
+    end_to_end                   `run_batch` (what `main.py` runs) with replayed OCR and the stub LLM
+
+Usage:
+    python -m benchmarks.pipeline_stages [--scales 1,10,100,1000] [--llm-latency 0.05]
+        [--output-tokens 800] [--output results.json]
+    python -m benchmarks.pipeline_stages --record invoice.pdf [...]   # record new OCR fixtures
+"""
+
+import argparse
+import asyncio
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from functools import partial
+from pathlib import Path
+
+# Benchmarks measure extraction, not cache hits
+os.environ.setdefault("RESULT_CACHE_BACKEND", "none")
+
+from src.chains import extract_invoice  # noqa: E402
+from src.chains.process_invoice_chain import return_json_result  # noqa: E402
+from src.models import register_model  # noqa: E402
+from src.parsers import parse_process_invoice_result  # noqa: E402
+from src.pipeline import register_stub_models, run_batch  # noqa: E402
+from src.utils import flatten_invoice_output  # noqa: E402
+
+FIXTURES_DIR = Path(__file__).resolve().parent / "fixtures"
+OCR_FIXTURES_DIR = FIXTURES_DIR / "ocr"
+# Expected extraction of the recorded Moroccan invoice, used as the stub LLM's response
+RESPONSE_FIXTURE = FIXTURES_DIR / "labelled" / "freight_invoice_multi_page.json"
+BENCH_MODEL = "stub-bench"
+
+
+def replay_ocr(pdf_path: str = None, pdf_url: str = None, **kwargs) -> dict:
+    """Stand-in for `parse_pdf_azure` returning a recorded output (`pdf_path` is the fixture JSON)."""
+    return json.loads(Path(pdf_path).read_text(encoding="utf-8"))
+
+
+def record_ocr(pdf_paths: list[str], output_dir: Path = OCR_FIXTURES_DIR) -> None:
+    """Run `parse_pdf_azure` on real documents and store the outputs as fixtures (needs Azure credentials)."""
+    from src.ocr import parse_pdf_azure
+
+    output_dir.mkdir(parents=True, exist_ok=True)
+    for pdf_path in pdf_paths:
+        pdf_output = parse_pdf_azure(pdf_path=pdf_path, use_cache=False)
+        fixture = output_dir / f"{Path(pdf_path).stem}.json"
+        fixture.write_text(json.dumps(pdf_output, indent=2, ensure_ascii=False), encoding="utf-8")
+        print(f"Recorded {pdf_path} -> {fixture}")
+
+
+def _measure(fn, track_memory: bool) -> tuple[float, int | None]:
+    if not track_memory:
+        started = time.perf_counter()
+        fn()
+        return time.perf_counter() - started, None
+
+    tracemalloc.start()
+    try:
+        started = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - started
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return elapsed, peak
+
+
+def _repeat(fn, argument, n: int) -> None:
+    # Results are dropped as they are produced, so peak memory reflects a single call's working set
+    for _ in range(n):
+        fn(argument)
+
+
+def stage_functions(response_text: str, content: dict, fixtures: list[Path], llm_concurrency: int) -> dict:
+    """Map each stage name to a function running it over `n` invoices."""
+    validated = parse_process_invoice_result(content).model_dump()
+
+    def run_end_to_end(n: int) -> None:
+        documents = [fixtures[i % len(fixtures)] for i in range(n)]
+        summary = asyncio.run(
+            run_batch(
+                documents,
+                output=io.StringIO(),
+                model=BENCH_MODEL,
+                llm_concurrency=llm_concurrency,
+                ocr_fn=replay_ocr,
+                extract_fn=extract_invoice,
+            )
+        )
+        if summary["failed"]:
+            raise RuntimeError(f"{summary['failed']} invoices failed in the end-to-end run")
+
+    return {
+        "return_json_result": partial(_repeat, return_json_result, response_text),
+        "parse_process_invoice_result": partial(_repeat, parse_process_invoice_result, content),
+        "flatten_invoice_output": partial(_repeat, flatten_invoice_output, validated),
+        "end_to_end": run_end_to_end,
+    }
+
+
+def _git_commit() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--scales", default="1,10,100,1000", help="Comma-separated invoice counts")
+    parser.add_argument("--stages", default=None, help="Comma-separated subset of stages to run")
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="Stub LLM latency in seconds")
+    parser.add_argument("--output-tokens", type=int, default=800, help="Output tokens reported by the stub LLM")
+    parser.add_argument("--llm-concurrency", type=int, default=8)
+    parser.add_argument("--fixtures", default=str(OCR_FIXTURES_DIR), help="Directory of recorded OCR outputs")
+    parser.add_argument("--no-memory", action="store_true", help="Skip the tracemalloc pass")
+    parser.add_argument("--record", nargs="+", metavar="PDF", help="Record OCR fixtures from these PDFs and exit")
+    parser.add_argument("--output", default=None, help="Write results as JSON to this path")
+    args = parser.parse_args(argv)
+
+    if args.record:
+        record_ocr(args.record, Path(args.fixtures))
+        return 0
+
+    fixtures = sorted(Path(args.fixtures).glob("*.json"))
+    if not fixtures:
+        print(f"No OCR fixtures in {args.fixtures}", file=sys.stderr)
+        return 1
+
+    content = json.loads(RESPONSE_FIXTURE.read_text(encoding="utf-8"))["expected"]
+    response = json.dumps(content, indent=2, ensure_ascii=False)
+    register_stub_models()
+    register_model(BENCH_MODEL, "stub", latency=args.llm_latency, output_tokens=args.output_tokens, response=response)
+
+    stages = stage_functions(f"```json\n{response}\n```", content, fixtures, args.llm_concurrency)
+    if args.stages:
+        stages = {name: stages[name] for name in args.stages.split(",")}
+
+    results = []
+    for name, run in stages.items():
+        for scale in (int(value) for value in args.scales.split(",")):
+            elapsed, _ = _measure(partial(run, scale), track_memory=False)
+            _, peak = (None, None) if args.no_memory else _measure(partial(run, scale), track_memory=True)
+            result = {
+                "stage": name,
+                "invoices": scale,
+                "seconds": round(elapsed, 6),
+                "ms_per_invoice": round(elapsed / scale * 1000, 4),
+                "invoices_per_second": round(scale / elapsed, 2) if elapsed else None,
+                "peak_memory_kb": round(peak / 1024, 1) if peak is not None else None,
+            }
+            results.append(result)
+            memory = f"{result['peak_memory_kb']:>10.1f} KB" if peak is not None else ""
+            print(
+                f"{name:<30} {scale:>5} invoices {elapsed:>9.4f}s {result['ms_per_invoice']:>10.4f} ms/invoice "
+                f"{result['invoices_per_second']:>10} /s {memory}"
+            )
+
+    report = {
+        "benchmark": "pipeline_stages",
+        "commit": _git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": {
+            "llm_latency": args.llm_latency,
+            "output_tokens": args.output_tokens,
+            "llm_concurrency": args.llm_concurrency,
+            "fixtures": [fixture.name for fixture in fixtures],
+        },
+        "results": results,
+    }
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2), encoding="utf-8")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
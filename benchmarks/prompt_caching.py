@@ -0,0 +1,96 @@
+"""
+Prompt template memoization and the modelled effect of provider prefix caching, offline.
+
+Reports:
+    build      seconds per `process_invoice_prompt()` call, compiled each time (as before) and memoized
+    prefix     per invoice in `benchmarks/fixtures/markdown`: prompt tokens, tokens in the shared static
+               prefix, and the LLM cost per invoice without prompt caching, with the prefix read from
+               the cache (steady state) and, for models priced per cache write, on the call that writes it
+
+Tokens are counted locally with `count_tokens`; costs use the prices in `MODEL_CONFIGS` and an
+assumed `--output-tokens` per invoice. Providers only cache prefixes of at least 1024 tokens.
+
+Usage:
+    python -m benchmarks.prompt_caching [--models azure-gpt-4.1,claude-3-5-sonnet] [--output-tokens 800]
+        [--iterations 2000] [--output prompt_caching.json]
+"""
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+from src.chains.process_invoice_chain import calculate_llm_cost
+from src.prompts import process_invoice_prompt
+from src.utils import count_tokens
+
+FIXTURES = Path(__file__).parent / "fixtures" / "markdown"
+MIN_CACHEABLE_TOKENS = 1024
+
+
+def time_builds(iterations: int) -> dict:
+    build = process_invoice_prompt.__wrapped__
+    started = time.perf_counter()
+    for _ in range(iterations):
+        build()
+    compiled = (time.perf_counter() - started) / iterations
+
+    process_invoice_prompt()
+    started = time.perf_counter()
+    for _ in range(iterations):
+        process_invoice_prompt()
+    memoized = (time.perf_counter() - started) / iterations
+    return {"compiled_seconds": round(compiled, 9), "memoized_seconds": round(memoized, 9), "speedup": round(compiled / memoized, 1)}
+
+
+def prompt_tokens(invoice_details: str) -> tuple[int, int]:
+    """Total prompt tokens and tokens in the static prefix (system message and instructions)."""
+    system_message, human_message = process_invoice_prompt().format_messages(invoice_details=invoice_details)
+    static_block, document_block = human_message.content
+    prefix = count_tokens(system_message.content) + count_tokens(static_block["text"])
+    return prefix + count_tokens(document_block["text"]), prefix
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--models", default="azure-gpt-4.1,azure-gpt-4.1-mini,claude-3-5-sonnet")
+    parser.add_argument("--output-tokens", type=int, default=800, help="Assumed output tokens per invoice")
+    parser.add_argument("--iterations", type=int, default=2000, help="Template builds timed per variant")
+    parser.add_argument("--output", default=None, help="Write results as JSON to this path")
+    args = parser.parse_args(argv)
+
+    build = time_builds(args.iterations)
+    print(
+        f"build    compiled {build['compiled_seconds'] * 1e6:>9.1f} us  memoized {build['memoized_seconds'] * 1e6:>7.2f} us  "
+        f"x{build['speedup']}"
+    )
+
+    invoices = []
+    for path in sorted(FIXTURES.glob("*.md")):
+        total, prefix = prompt_tokens(path.read_text(encoding="utf-8"))
+        cached = prefix if prefix >= MIN_CACHEABLE_TOKENS else 0
+        costs = {}
+        for model in args.models.split(","):
+            uncached_cost = calculate_llm_cost(total, args.output_tokens, model)
+            hit_cost = calculate_llm_cost(total, args.output_tokens, model, cached_input_tokens=cached)
+            write_cost = calculate_llm_cost(total, args.output_tokens, model, cache_write_tokens=cached)
+            costs[model] = {
+                "uncached_usd": uncached_cost,
+                "cache_hit_usd": hit_cost,
+                "cache_write_usd": write_cost,
+                "savings_pct": round(100 * (uncached_cost - hit_cost) / uncached_cost, 1),
+            }
+            print(
+                f"prefix   {path.stem:<28} {total:>6} tokens {prefix:>5} prefix ({100 * prefix / total:>4.1f}%)  {model:<20} "
+                f"${uncached_cost:.5f} -> ${hit_cost:.5f} (-{costs[model]['savings_pct']}%), write ${write_cost:.5f}"
+            )
+        invoices.append({"invoice": path.stem, "prompt_tokens": total, "prefix_tokens": prefix, "costs": costs})
+
+    if args.output:
+        Path(args.output).write_text(json.dumps({"build": build, "invoices": invoices}, indent=2), encoding="utf-8")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
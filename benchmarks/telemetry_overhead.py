@@ -0,0 +1,76 @@
+"""
+Measure the overhead of stage timing spans with telemetry enabled and disabled.
+
+Reports the cost of an empty `span()` block per call and the time to parse and validate one
+response (`build_invoice_output`, which opens two spans) in each mode.
+
+Usage:
+    python -m benchmarks.telemetry_overhead [--iterations 100000] [--output telemetry.json]
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+os.environ.setdefault("RESULT_CACHE_BACKEND", "none")
+
+from src.chains.process_invoice_chain import build_invoice_output  # noqa: E402
+from src.telemetry import collect_spans, reset_stage_stats, set_telemetry_enabled, span  # noqa: E402
+
+RESPONSE_FIXTURE = Path(__file__).resolve().parent / "fixtures" / "labelled" / "freight_invoice_multi_page.json"
+USAGE = {"input_tokens": 4000, "output_tokens": 800, "total_tokens": 4800}
+
+
+def _per_call(fn, iterations: int) -> float:
+    started = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - started) / iterations
+
+
+def measure(enabled: bool, response: str, iterations: int) -> dict:
+    set_telemetry_enabled(enabled)
+    reset_stage_stats()
+
+    def empty_span():
+        with span("benchmark"):
+            pass
+
+    def parse_and_validate():
+        build_invoice_output(response, dict(USAGE), "benchmark")
+
+    baseline = _per_call(lambda: None, iterations)
+    with collect_spans() as spans:
+        span_seconds = _per_call(empty_span, iterations) - baseline
+        spans.clear()
+        parse_seconds = _per_call(parse_and_validate, max(1, iterations // 100))
+    return {
+        "telemetry": "enabled" if enabled else "disabled",
+        "span_ns": round(span_seconds * 1e9, 1),
+        "parse_and_validate_us": round(parse_seconds * 1e6, 1),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=100_000)
+    parser.add_argument("--output", default=None, help="Write results as JSON to this path")
+    args = parser.parse_args(argv)
+
+    content = json.loads(RESPONSE_FIXTURE.read_text(encoding="utf-8"))["expected"]
+    response = f"```json\n{json.dumps(content, indent=2)}\n```"
+
+    results = [measure(False, response, args.iterations), measure(True, response, args.iterations)]
+    for result in results:
+        print(f"{result['telemetry']:<10} {result['span_ns']:>10.1f} ns/span {result['parse_and_validate_us']:>12.1f} us/response")
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2), encoding="utf-8")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,86 @@
+"""
+Cost and decisions of the pre-flight token budget (`plan_extraction`) on synthetic invoices, offline.
+
+Each invoice has `--rows` line item rows per page in an HTML table and some body text. For every
+page count and model the benchmark reports the plan (mode, model, pages per chunk, max_tokens),
+the prompt and output token estimates and the planning time per invoice, which is added to every
+extraction. Planning time depends on whether tiktoken's encoding is available (otherwise tokens
+are approximated from the character count), which is printed first.
+
+Usage:
+    python -m benchmarks.token_budget [--pages 1,10,50,200] [--rows 15] [--models azure-gpt-4.1,claude-3-5-sonnet]
+        [--repeat 5] [--output token_budget.json]
+"""
+
+import argparse
+import json
+import logging
+import sys
+import time
+from pathlib import Path
+
+from src.chains.token_budget import plan_extraction
+from src.utils import _get_token_encoding
+
+
+def make_invoice(pages: int, rows: int) -> dict:
+    doc_pages = []
+    for page in range(1, pages + 1):
+        table_rows = "".join(
+            f"<tr><td>SKU-{page:03d}-{row:03d}</td><td>Replacement part {row} for unit {page}</td><td>{row % 7 + 1}</td>"
+            f"<td>{12.5 + row:.2f}</td><td>{(row % 7 + 1) * (12.5 + row):.2f}</td></tr>"
+            for row in range(rows)
+        )
+        content = (
+            f"# Invoice INV-2025-0042, page {page} of {pages}\n\nSeller Name Ltd, 1 High Street, London\n\n"
+            "<table><tr><th>SKU</th><th>Description</th><th>Qty</th><th>Unit price</th><th>Amount</th></tr>"
+            f"{table_rows}</table>\n\nPayment due within 30 days. Bank: GB00 BANK 0000 0000 0000 00\n"
+        )
+        doc_pages.append({"page": page, "has_table": rows > 0, "has_lca": False, "source_url": None, "content": content})
+    return {"doc_pages": doc_pages, "doc_content": "<!-- PageBreak -->".join(page["content"] for page in doc_pages)}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--pages", default="1,10,50,200", help="Comma-separated page counts")
+    parser.add_argument("--rows", type=int, default=15, help="Line item rows per page")
+    parser.add_argument("--models", default="azure-gpt-4.1,azure-gpt-4o,claude-3-5-sonnet")
+    parser.add_argument("--repeat", type=int, default=5, help="Plans timed per invoice and model")
+    parser.add_argument("--output", default=None, help="Write results as JSON to this path")
+    args = parser.parse_args(argv)
+
+    # Plans that fit nowhere log a warning on every repeat
+    logging.getLogger("src.chains.token_budget").setLevel(logging.ERROR)
+    # Build the prompts and load the tokenizer outside the measurement
+    plan_extraction(make_invoice(1, 1), "azure-gpt-4.1")
+    encoding = _get_token_encoding()
+    print(f"tokenizer: {encoding.name if encoding else 'approximate (tiktoken encoding unavailable)'}")
+
+    results = []
+    for pages in map(int, args.pages.split(",")):
+        pdf_output = make_invoice(pages, args.rows)
+        for model in args.models.split(","):
+            started = time.perf_counter()
+            for _ in range(args.repeat):
+                plan = plan_extraction(pdf_output, model)
+            seconds = (time.perf_counter() - started) / args.repeat
+            result = {
+                "pages": pages,
+                "requested_model": model,
+                "plan_seconds": round(seconds, 6),
+                **{key: value for key, value in plan.items() if key != "reasons"},
+            }
+            results.append(result)
+            print(
+                f"{pages:>4} pages {model:<20} {result.get('prompt_tokens', '-'):>8} prompt {result.get('output_tokens', '-'):>7} output  "
+                f"-> {plan['mode']:<8} {plan['model'] or '-':<20} pages/chunk {plan.get('pages_per_chunk', '-'):<3} "
+                f"max_tokens {plan.get('max_tokens') or '-':<6} {seconds * 1000:>8.2f} ms  {len(plan['warnings'])} warnings"
+            )
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2), encoding="utf-8")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
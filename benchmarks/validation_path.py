@@ -0,0 +1,99 @@
+"""
+Per-invoice CPU time and allocations of the validation paths for LLM responses.
+
+Paths:
+    decode_validate_dump  text -> dict (`decode_json_object`) -> `ProcessInvoiceResult` -> `model_dump()`,
+                          the path `process_invoice_chain` used before
+    validate_json_model   `parse_process_invoice_json(text)`, returning the model
+    validate_json_dict    `parse_process_invoice_json(text, as_dict=True)`, returning the dump without a model
+    batch_dict            `parse_process_invoice_results(texts, as_dict=True)` over all invoices at once
+
+Responses are fenced JSON invoices with the given numbers of line items. Peak memory is the
+tracemalloc peak while validating one invoice (or the whole batch, divided per invoice).
+
+Usage:
+    python -m benchmarks.validation_path [--items 10,100,1000] [--invoices 200] [--output validation.json]
+"""
+
+import argparse
+import json
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+from benchmarks.json_decoder import HEADER
+from src.parsers import decode_json_object, extract_json_text, parse_process_invoice_json, parse_process_invoice_results
+from src.parsers.process_invoice_parser import ProcessInvoiceResult
+
+
+def make_response(n_items: int, seed: int = 0) -> str:
+    items = [
+        {
+            "description": f"Line {seed}-{i}",
+            "quantity": 1 + i % 5,
+            "unit_price": 12.5,
+            "subtotal_price": 12.5 * (1 + i % 5),
+            "total_price": 15.0 * (1 + i % 5),
+            "vat_rate": 0.2,
+            "vat_amount": 2.5 * (1 + i % 5),
+            "currency": "EUR",
+        }
+        for i in range(n_items)
+    ]
+    return "```json\n" + json.dumps(HEADER | {"invoice_id": f"INV-{seed}", "items": items}, indent=2) + "\n```"
+
+
+def decode_validate_dump(text: str) -> dict:
+    return ProcessInvoiceResult.model_validate(decode_json_object(text)).model_dump()
+
+
+PATHS = {
+    "decode_validate_dump": lambda texts: [decode_validate_dump(text) for text in texts],
+    "validate_json_model": lambda texts: [parse_process_invoice_json(text) for text in texts],
+    "validate_json_dict": lambda texts: [parse_process_invoice_json(text, as_dict=True) for text in texts],
+    # The batch API takes strict JSON, so the fences are stripped first
+    "batch_dict": lambda texts: parse_process_invoice_results([extract_json_text(text) for text in texts], as_dict=True),
+}
+
+
+def measure(run, texts: list[str]) -> dict:
+    run(texts[:1])  # build the validators outside the measurement
+
+    started = time.process_time()
+    run(texts)
+    cpu = time.process_time() - started
+
+    # Peak of a single invoice for the per-invoice paths, of the whole batch for the batch path
+    sample = texts if run is PATHS["batch_dict"] else texts[:1]
+    tracemalloc.start()
+    try:
+        run(sample)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {"cpu_ms_per_invoice": round(cpu / len(texts) * 1000, 4), "peak_kb_per_invoice": round(peak / len(sample) / 1024, 1)}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--items", default="10,100,1000", help="Comma-separated line item counts")
+    parser.add_argument("--invoices", type=int, default=200, help="Invoices validated per measurement")
+    parser.add_argument("--output", default=None, help="Write results as JSON to this path")
+    args = parser.parse_args(argv)
+
+    results = []
+    for n_items in (int(value) for value in args.items.split(",")):
+        texts = [make_response(n_items, seed) for seed in range(args.invoices)]
+        for name, run in PATHS.items():
+            result = {"path": name, "items": n_items, **measure(run, texts)}
+            results.append(result)
+            print(f"{name:<22} {n_items:>5} items {result['cpu_ms_per_invoice']:>10.4f} ms CPU/invoice {result['peak_kb_per_invoice']:>10.1f} KB peak/invoice")
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2), encoding="utf-8")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
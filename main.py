@@ -1,20 +1,180 @@
-from src.ocr import parse_pdf_azure
-from src.chains import process_invoice_chain
+import argparse
+import asyncio
+import sys
+from functools import partial
 
+from src.ocr import aparse_invoice_prebuilt, aparse_pdf_azure, parse_invoice_prebuilt, parse_pdf_azure
+from src.chains import DEFAULT_CASCADE, EXTRACTION_MODES, extract_invoice, get_hedge_stats, get_route_stats
+from src.export import export_batch_results
+from src.models import warm_up_models
+from src.pipeline import collect_inputs, get_job_store, register_stub_models, run_batch, stub_ocr
+from src.telemetry import render_prometheus, telemetry_enabled
 
-def process_invoice(invoice_filepath):
+
+def parse_pdf_prebuilt(pdf_path: str = None, pdf_url: str = None):
+    return parse_invoice_prebuilt(file_path=pdf_path, invoice_url=pdf_url)
+
+
+async def aparse_pdf_prebuilt(pdf_path: str = None, pdf_url: str = None):
+    return await aparse_invoice_prebuilt(file_path=pdf_path, invoice_url=pdf_url)
+
+
+def process_invoice(invoice_filepath, model="azure-gpt-4.1", mode="single"):
     print(f"Processing invoice from {invoice_filepath}")
-    pdf_output = parse_pdf_azure(pdf_path=invoice_filepath)
-    pdf_markdown = pdf_output["doc_content"]
+    ocr_fn = parse_pdf_prebuilt if mode == "hybrid" else parse_pdf_azure
+    pdf_output = ocr_fn(pdf_path=invoice_filepath)
 
     print(f"Extracting invoice data from invoice markdown")
-    invoice_output = process_invoice_chain(invoice_details=pdf_markdown)
+    invoice_output = extract_invoice(pdf_output, model=model, mode=mode)
     print(f"Invoice data extracted successfully")
     print(f"Invoice data: {invoice_output}")
     return invoice_output
 
 
-if __name__ == "__main__":
-    invoice_filepath = "./data/morocco_invoice.pdf"
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Extract structured data from a batch of invoice PDFs.")
+    parser.add_argument(
+        "inputs",
+        nargs="*",
+        default=["./data/morocco_invoice.pdf"],
+        help="PDF files, directories, glob patterns or manifest files (.txt / .jsonl)",
+    )
+    parser.add_argument("-o", "--output", default="-", help="JSONL output path, or - for stdout")
+    parser.add_argument(
+        "--export",
+        default=None,
+        help="Also export the successful results to this .csv or .parquet file (requires -o to a file)",
+    )
+    parser.add_argument("--model", default="azure-gpt-4.1", help="Model ID passed to load_llm_models")
+    parser.add_argument(
+        "--mode",
+        choices=EXTRACTION_MODES,
+        default="single",
+        help=(
+            "single: one prompt per invoice; pages: extract page groups concurrently (long invoices); "
+            "hybrid: use Azure prebuilt-invoice fields when confident and the LLM only for the rest; "
+            "cascade: try --cascade-models from cheapest to most expensive"
+        ),
+    )
+    parser.add_argument(
+        "--cascade-models",
+        default=",".join(DEFAULT_CASCADE),
+        help="Comma-separated models tried in order in cascade mode",
+    )
+    parser.add_argument(
+        "--hedge-model",
+        default=None,
+        help="Race this model against --model when --model is slower than its p95 latency (single mode)",
+    )
+    parser.add_argument("--compact", action="store_true", help="Compact the OCR markdown before sending it to the LLM")
+    parser.add_argument(
+        "--triage",
+        action="store_true",
+        help="Drop pages unlikely to hold invoice fields (terms, cover letters, delivery notes) before sending the document to the LLM",
+    )
+    parser.add_argument(
+        "--token-budget",
+        action="store_true",
+        help="Check each invoice against --model's context window and output limit first, and switch model, raise max_tokens or extract page groups when it would not fit (single mode)",
+    )
+    parser.add_argument("--ocr-concurrency", type=int, default=4, help="Maximum in-flight OCR calls")
+    parser.add_argument(
+        "--async-ocr",
+        action="store_true",
+        help="Submit OCR through the asyncio scheduler (rate limited by AZURE_DOCUMENT_INTELLIGENCE_TPS)",
+    )
+    parser.add_argument("--llm-concurrency", type=int, default=8, help="Maximum in-flight LLM calls")
+    parser.add_argument(
+        "--metrics",
+        default=None,
+        help="Write per-stage latency histograms to this path in Prometheus text format",
+    )
+    parser.add_argument(
+        "--job-store",
+        default=None,
+        help="SQLite job store that checkpoints each stage so an interrupted batch can be resumed by rerunning it",
+    )
+    parser.add_argument(
+        "--max-attempts", type=int, default=3, help="With --job-store, retry failed invoices on later runs up to this many attempts"
+    )
+    parser.add_argument("--stub", action="store_true", help="Use offline stub OCR and LLM backends")
+    parser.add_argument("--stub-ocr-latency", type=float, default=0.2, help="Stub OCR latency in seconds")
+    return parser.parse_args(argv)
+
 
-    invoice_output = process_invoice(invoice_filepath)
+def main(argv=None):
+    args = parse_args(argv)
+    if args.export and args.output == "-":
+        print("--export needs the JSONL results written to a file with -o", file=sys.stderr)
+        return 2
+
+    pdf_paths = collect_inputs(args.inputs)
+    if not pdf_paths:
+        print("No invoices found", file=sys.stderr)
+        return 1
+
+    if args.stub:
+        register_stub_models()
+        ocr_fn = partial(stub_ocr, latency=args.stub_ocr_latency)
+    elif args.async_ocr:
+        ocr_fn = aparse_pdf_prebuilt if args.mode == "hybrid" else aparse_pdf_azure
+    else:
+        ocr_fn = parse_pdf_prebuilt if args.mode == "hybrid" else parse_pdf_azure
+    model = "stub" if args.stub else args.model
+    cascade_models = ["stub"] if args.stub else args.cascade_models.split(",")
+    hedge_model = "stub" if args.stub and args.hedge_model else args.hedge_model
+    # Warm the models the mode actually calls: `--model` is not used in cascade mode
+    warm_up_models(cascade_models if args.mode == "cascade" else [model, *filter(None, [hedge_model])])
+    job_store = get_job_store(args.job_store) if args.job_store else None
+
+    output = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+    try:
+        summary = asyncio.run(
+            run_batch(
+                pdf_paths,
+                output=output,
+                model=model,
+                ocr_concurrency=args.ocr_concurrency,
+                llm_concurrency=args.llm_concurrency,
+                ocr_fn=ocr_fn,
+                extract_fn=partial(
+                    extract_invoice,
+                    mode=args.mode,
+                    compact=args.compact,
+                    triage=args.triage,
+                    hedge_model=hedge_model,
+                    cascade_models=cascade_models,
+                    token_budget=args.token_budget,
+                ),
+                job_store=job_store,
+                max_attempts=args.max_attempts,
+            )
+        )
+    finally:
+        if output is not sys.stdout:
+            output.close()
+        if job_store:
+            print(f"Job store: {job_store.stats()}", file=sys.stderr)
+            job_store.close()
+
+    print(
+        f"Processed {summary['total']} invoices ({summary['succeeded']} succeeded, {summary['failed']} failed, "
+        f"{summary['truncated']} truncated) "
+        f"in {summary['elapsed_seconds']}s: {summary['invoices_per_minute']} invoices/min",
+        file=sys.stderr,
+    )
+    if args.hedge_model:
+        print(f"Hedging: {get_hedge_stats()}", file=sys.stderr)
+    if args.mode == "hybrid":
+        print(f"Routes: {get_route_stats()}", file=sys.stderr)
+    if args.export:
+        rows = export_batch_results(args.output, args.export)
+        print(f"Exported {rows} rows to {args.export}", file=sys.stderr)
+    if args.metrics and telemetry_enabled():
+        with open(args.metrics, "w", encoding="utf-8") as metrics_file:
+            metrics_file.write(render_prometheus())
+    return 0 if summary["failed"] == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,75 @@
+import argparse
+import ipaddress
+import os
+import sys
+from functools import partial
+
+from aiohttp import web
+
+from src.chains import EXTRACTION_MODES, extract_invoice
+from src.models import warm_up_models
+from src.ocr import aparse_pdf_azure, parse_pdf_azure
+from src.pipeline import register_stub_models, stub_ocr
+from src.service import IngestionService, create_app
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Serve invoice extraction over HTTP with a bounded work queue.")
+    parser.add_argument("--host", default="127.0.0.1", help="Interface to bind; use 0.0.0.0 only with INVOICE_SERVICE_TOKEN set")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--workers", type=int, default=None, help="Concurrent documents (default INVOICE_SERVICE_WORKERS or 4)")
+    parser.add_argument(
+        "--queue-size", type=int, default=None, help="Queued documents before answering 429 (default INVOICE_SERVICE_QUEUE_SIZE or 64)"
+    )
+    parser.add_argument("--model", default="azure-gpt-4.1", help="Model ID passed to load_llm_models")
+    parser.add_argument(
+        "--mode",
+        # hybrid needs the prebuilt-invoice OCR output, which the service does not produce
+        choices=[mode for mode in EXTRACTION_MODES if mode != "hybrid"],
+        default="single",
+        help="Extraction mode (see main.py)",
+    )
+    parser.add_argument("--async-ocr", action="store_true", help="Submit OCR through the asyncio scheduler")
+    parser.add_argument("--sync-max-bytes", type=int, default=None, help="Largest document accepted with ?sync=true")
+    parser.add_argument("--stub", action="store_true", help="Use offline stub OCR and LLM backends")
+    parser.add_argument("--stub-ocr-latency", type=float, default=0.2, help="Stub OCR latency in seconds")
+    return parser.parse_args(argv)
+
+
+def _is_loopback(host: str) -> bool:
+    if host == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.stub:
+        register_stub_models()
+        ocr_fn = partial(stub_ocr, latency=args.stub_ocr_latency)
+    else:
+        ocr_fn = aparse_pdf_azure if args.async_ocr else parse_pdf_azure
+    model = "stub" if args.stub else args.model
+    warm_up_models([model])
+
+    service = IngestionService(
+        workers=args.workers,
+        queue_size=args.queue_size,
+        model=model,
+        ocr_fn=ocr_fn,
+        extract_fn=partial(extract_invoice, mode=args.mode),
+        sync_max_bytes=args.sync_max_bytes,
+    )
+    if not os.getenv("INVOICE_SERVICE_TOKEN") and not _is_loopback(args.host):
+        print(
+            f"Warning: serving on {args.host} without INVOICE_SERVICE_TOKEN; anyone who can reach it can submit documents",
+            file=sys.stderr,
+        )
+    web.run_app(create_app(service), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
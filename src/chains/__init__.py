@@ -1,3 +1,29 @@
+from .extract_invoice import EXTRACTION_MODES, extract_invoice
+from .hedging import get_hedge_stats
+from .hybrid_router import get_route_stats, route_invoice
+from .model_cascade import DEFAULT_CASCADE, process_invoice_cascade, reconcile_totals
 from .process_invoice_chain import process_invoice_chain
+from .process_invoice_pages_chain import process_invoice_pages_chain
+from .result_cache import InMemoryResultCache, ResultCache, SQLiteResultCache, get_result_cache
+from .stream_invoice_chain import astream_process_invoice_chain, stream_process_invoice_chain
+from .token_budget import plan_extraction
 
-__all__ = ["process_invoice_chain"]
+__all__ = [
+    "DEFAULT_CASCADE",
+    "EXTRACTION_MODES",
+    "InMemoryResultCache",
+    "ResultCache",
+    "SQLiteResultCache",
+    "astream_process_invoice_chain",
+    "extract_invoice",
+    "get_hedge_stats",
+    "get_result_cache",
+    "get_route_stats",
+    "plan_extraction",
+    "process_invoice_cascade",
+    "process_invoice_chain",
+    "process_invoice_pages_chain",
+    "reconcile_totals",
+    "route_invoice",
+    "stream_process_invoice_chain",
+]
@@ -0,0 +1,97 @@
+from typing import Callable
+
+from src.chains.hybrid_router import route_invoice
+from src.chains.model_cascade import DEFAULT_CASCADE, process_invoice_cascade
+from src.chains.process_invoice_chain import process_invoice_chain
+from src.chains.process_invoice_pages_chain import process_invoice_pages_chain
+from src.chains.token_budget import plan_extraction
+from src.preprocessing import compact_pdf_output, triage_pdf_output
+
+EXTRACTION_MODES = ("single", "pages", "hybrid", "cascade")
+
+
+def extract_invoice(
+    pdf_output: dict,
+    model: str = "azure-gpt-4.1",
+    mode: str = "single",
+    compact: bool = False,
+    triage: bool = False,
+    hedge_model: str | None = None,
+    cascade_models=DEFAULT_CASCADE,
+    on_response: Callable[[str, dict], None] | None = None,
+    token_budget: bool = False,
+):
+    """
+    Extract structured invoice data from the output of `parse_pdf_azure`.
+
+    Args:
+        pdf_output: Parsed document as returned by `parse_pdf_azure`, or by `parse_invoice_prebuilt`
+            for the `hybrid` mode.
+        model: The ID of the model to use.
+        mode: `single` sends the whole document in one prompt; `pages` extracts page groups
+            concurrently and merges the line items; `hybrid` uses the prebuilt-invoice fields where
+            they are confident and the LLM only for the rest; `cascade` tries `cascade_models` from
+            cheapest to most expensive, escalating only untrusted results (`model` is not used).
+        compact: Whether to compact the markdown (tables to rows, whitespace, repeated
+            headers/footers) before it is sent to the LLM.
+        triage: Whether to drop the pages unlikely to hold invoice fields (cover letters, terms
+            and conditions, delivery notes, remittance slips) before anything else, scored
+            locally by `triage_pdf_output`. Dropped page numbers are recorded under
+            `usage_metadata["dropped_pages"]`.
+        hedge_model: In `single` mode, a model raced against `model` when it is slow.
+        cascade_models: Models tried in order in `cascade` mode.
+        on_response: In `single` mode, called with the raw LLM response and its usage metadata
+            before validation (see `process_invoice_chain`).
+        token_budget: In `single` mode, check the document against the model's context window and
+            output limit before sending it, and switch model, raise `max_tokens` or extract page
+            groups instead when it would not fit (see `plan_extraction`). The plan is recorded
+            under `usage_metadata["token_budget"]`.
+
+    Returns:
+        Dictionary with the extracted `content` and `usage_metadata`.
+    """
+    dropped_pages = None
+    if triage:
+        pdf_output = triage_pdf_output(pdf_output)
+        dropped_pages = pdf_output["dropped_pages"]
+    if compact:
+        pdf_output = compact_pdf_output(pdf_output)
+
+    result_output = _extract(pdf_output, model, mode, hedge_model, cascade_models, on_response, token_budget)
+    if dropped_pages is not None:
+        result_output["usage_metadata"]["dropped_pages"] = dropped_pages
+    return result_output
+
+
+def _extract(pdf_output: dict, model: str, mode: str, hedge_model, cascade_models, on_response, token_budget: bool):
+    if mode == "single" and token_budget:
+        plan = plan_extraction(pdf_output, model)
+        if plan["mode"] == "pages":
+            result_output = process_invoice_pages_chain(
+                doc_pages=pdf_output["doc_pages"],
+                model=plan["model"],
+                pages_per_chunk=plan["pages_per_chunk"],
+                max_tokens=plan["max_tokens"],
+                total_pages=pdf_output.get("total_pages"),
+            )
+        else:
+            result_output = process_invoice_chain(
+                invoice_details=pdf_output["doc_content"],
+                model=plan["model"],
+                hedge_model=hedge_model,
+                on_response=on_response,
+                max_tokens=plan["max_tokens"],
+            )
+        result_output["usage_metadata"]["token_budget"] = plan
+        return result_output
+    if mode == "single":
+        return process_invoice_chain(
+            invoice_details=pdf_output["doc_content"], model=model, hedge_model=hedge_model, on_response=on_response
+        )
+    if mode == "pages":
+        return process_invoice_pages_chain(doc_pages=pdf_output["doc_pages"], model=model, total_pages=pdf_output.get("total_pages"))
+    if mode == "hybrid":
+        return route_invoice(pdf_output, model=model)
+    if mode == "cascade":
+        return process_invoice_cascade(invoice_details=pdf_output["doc_content"], models=cascade_models)
+    raise ValueError(f"Unknown extraction mode: {mode}")
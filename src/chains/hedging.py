@@ -0,0 +1,142 @@
+import asyncio
+import os
+import threading
+import time
+from collections import Counter, defaultdict, deque
+
+# Primary latencies needed before the percentile replaces the default hedge delay
+HEDGE_MIN_SAMPLES = 20
+
+
+class LatencyTracker:
+    """Recent completion latencies per model, used to pick the hedge delay."""
+
+    def __init__(self, max_samples: int = 500):
+        self._samples: dict[str, deque] = defaultdict(lambda: deque(maxlen=max_samples))
+        self._lock = threading.Lock()
+
+    def record(self, model: str, seconds: float) -> None:
+        with self._lock:
+            self._samples[model].append(seconds)
+
+    def percentile(self, model: str, percentile: float) -> float | None:
+        """The `percentile` (0-1) latency of `model`, or None until enough samples are recorded."""
+        with self._lock:
+            samples = sorted(self._samples[model])
+        if len(samples) < HEDGE_MIN_SAMPLES:
+            return None
+        return samples[min(len(samples) - 1, int(percentile * len(samples)))]
+
+
+_latencies = LatencyTracker()
+_hedge_stats: Counter = Counter()
+_hedge_lock = threading.Lock()
+_loop: asyncio.AbstractEventLoop | None = None
+
+
+def _get_loop() -> asyncio.AbstractEventLoop:
+    # One long-lived loop so the shared async HTTP clients always run on the same loop
+    global _loop
+    with _hedge_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="llm-hedging", daemon=True).start()
+        return _loop
+
+
+def hedge_delay(model: str, percentile: float = 0.95) -> float:
+    """
+    Seconds to wait for `model` before hedging: its observed `percentile` latency, or
+    `HEDGE_DEFAULT_DELAY` (default 30s) until enough calls have completed.
+    """
+    delay = _latencies.percentile(model, percentile)
+    return delay if delay is not None else float(os.getenv("HEDGE_DEFAULT_DELAY", "30"))
+
+
+async def _timed(label: str, model: str, call, censor_at: float = 0.0):
+    """
+    Run `call` and record its latency, including when it is cancelled or fails.
+
+    A call that did not succeed only shows that the model takes at least as long as the call ran,
+    so it is recorded as a censored sample of at least `censor_at` (the hedge delay, for the
+    primary). Leaving slow cancelled primaries out would bias the percentile down and raise the
+    hedge rate over time. Failures are not recorded without `censor_at`, since a fast error says
+    nothing about latency.
+    """
+    started = time.perf_counter()
+    try:
+        output = await call()
+    except asyncio.CancelledError:
+        _latencies.record(model, max(time.perf_counter() - started, censor_at))
+        raise
+    except Exception:
+        if censor_at:
+            _latencies.record(model, max(time.perf_counter() - started, censor_at))
+        raise
+    _latencies.record(model, time.perf_counter() - started)
+    return label, output
+
+
+async def race(primary_model: str, primary_call, secondary_model: str, secondary_call, delay: float) -> dict:
+    """
+    Run `primary_call`, and `secondary_call` as well if the primary has not succeeded after `delay` seconds.
+
+    Calls are coroutine factories that return a validated output or raise. The first to succeed
+    wins and the other is cancelled.
+
+    Returns:
+        `{"winner": "primary"|"secondary", "output", "hedged", "loser_output"}`; `loser_output` is the
+        losing call's output when it also finished, or None when it failed or was cancelled.
+    """
+    primary = asyncio.ensure_future(_timed("primary", primary_model, primary_call, censor_at=delay))
+    done, _ = await asyncio.wait({primary}, timeout=delay)
+    if primary in done and primary.exception() is None:
+        _, output = primary.result()
+        return {"winner": "primary", "output": output, "hedged": False, "loser_output": None}
+
+    secondary = asyncio.ensure_future(_timed("secondary", secondary_model, secondary_call))
+    tasks = {primary, secondary}
+    pending = {task for task in tasks if not task.done()}
+    errors = [task.exception() for task in tasks if task.done() and task.exception() is not None]
+    while pending:
+        done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            if task.exception() is not None:
+                errors.append(task.exception())
+                continue
+            label, output = task.result()
+            for loser in pending:
+                loser.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+            loser_task = secondary if label == "primary" else primary
+            loser_output = loser_task.result()[1] if loser_task in done and loser_task.exception() is None else None
+            return {"winner": label, "output": output, "hedged": True, "loser_output": loser_output}
+    raise errors[0]
+
+
+def run_race(*args, **kwargs) -> dict:
+    """Run `race` on the hedging event loop from synchronous code."""
+    return asyncio.run_coroutine_threadsafe(race(*args, **kwargs), _get_loop()).result()
+
+
+def record_hedge(hedged: bool, secondary_won: bool, extra_cost_usd: float) -> float:
+    """Count a hedged call and return the running hedge rate."""
+    with _hedge_lock:
+        _hedge_stats["total"] += 1
+        _hedge_stats["hedged"] += hedged
+        _hedge_stats["secondary_wins"] += secondary_won
+        _hedge_stats["extra_cost_usd"] += extra_cost_usd
+        return _hedge_stats["hedged"] / _hedge_stats["total"]
+
+
+def get_hedge_stats() -> dict:
+    """How many hedging calls raced a secondary model, how often it won and what the extra calls cost."""
+    with _hedge_lock:
+        total = _hedge_stats["total"]
+        return {
+            "total": total,
+            "hedged": _hedge_stats["hedged"],
+            "secondary_wins": _hedge_stats["secondary_wins"],
+            "hedge_rate": round(_hedge_stats["hedged"] / total, 4) if total else 0.0,
+            "extra_cost_usd": round(_hedge_stats["extra_cost_usd"], 6),
+        }
@@ -0,0 +1,186 @@
+import threading
+import time
+from collections import Counter
+from datetime import date
+
+from src.chains.process_invoice_chain import add_llm_cost, invoke_llm, process_invoice_chain
+from src.models import use_cache_breakpoints
+from src.parsers import decode_partial_json_object, parse_process_invoice_result
+from src.prompts import process_invoice_fields_prompt
+from src.telemetry import span
+
+DEFAULT_CONFIDENCE_THRESHOLD = 0.8
+
+# Fields that must be present and confident for an invoice to skip the LLM entirely
+REQUIRED_FIELDS = (
+    "invoice_id",
+    "invoice_date",
+    "invoice_total",
+    "invoice_total_currency",
+    "buyer_name",
+    "seller_name",
+    "items",
+)
+
+# ProcessInvoiceResult field -> (prebuilt-invoice output key, prebuilt-invoice field name)
+PREBUILT_FIELD_MAP = {
+    "invoice_id": ("invoice_id", "InvoiceId"),
+    "purchase_order_number": ("purchase_order", "PurchaseOrder"),
+    "invoice_date": ("invoice_date", "InvoiceDate"),
+    "invoice_due_date": ("due_date", "DueDate"),
+    "invoice_total": ("invoice_total", "InvoiceTotal"),
+    "invoice_total_currency": ("invoice_total_currency", "InvoiceTotal"),
+    "invoice_vat_amount": ("total_tax", "TotalTax"),
+    "buyer_name": ("customer_name", "CustomerName"),
+    "buyer_address": ("customer_address", "CustomerAddress"),
+    "seller_name": ("vendor_name", "VendorName"),
+    "seller_address": ("vendor_address", "VendorAddress"),
+}
+
+_route_counts: Counter = Counter()
+_route_lock = threading.Lock()
+
+
+def _map_address(address) -> dict | None:
+    if not address:
+        return None
+    street = address.get("streetAddress") or " ".join(
+        part for part in (address.get("houseNumber"), address.get("road")) if part
+    )
+    return {
+        "street": street or None,
+        "city": address.get("city"),
+        "state": address.get("state"),
+        "postcode": address.get("postalCode"),
+        "country": address.get("countryRegion"),
+    }
+
+
+def _drop_missing(content: dict) -> dict:
+    # Nested fields (addresses, metadata) fall back to their model defaults rather than None
+    return {field: value for field, value in content.items() if value is not None}
+
+
+def map_prebuilt_fields(prebuilt: dict) -> tuple[dict, dict]:
+    """
+    Map `parse_invoice_prebuilt` output onto `ProcessInvoiceResult` fields.
+
+    Returns:
+        The mapped field values and the confidence of each mapped field.
+    """
+    field_confidence = prebuilt.get("field_confidence") or {}
+    content: dict = {}
+    confidences: dict = {}
+    for field, (prebuilt_key, prebuilt_name) in PREBUILT_FIELD_MAP.items():
+        value = prebuilt.get(prebuilt_key)
+        if field.endswith("_address"):
+            value = _map_address(value)
+        elif isinstance(value, date):
+            value = value.isoformat()
+        content[field] = value
+        confidences[field] = field_confidence.get(prebuilt_name) or 0.0
+
+    items = []
+    for item in prebuilt.get("items") or []:
+        items.append(
+            {
+                "description": item.get("description"),
+                "quantity": item.get("quantity"),
+                "unit_price": item.get("unit_price"),
+                "total_price": item.get("amount"),
+                "vat_amount": item.get("tax"),
+                "currency": item.get("amount_currency"),
+            }
+        )
+    content["items"] = items
+    item_confidences = [item.get("confidence") or 0.0 for item in prebuilt.get("items") or []]
+    confidences["items"] = min(item_confidences) if item_confidences else 0.0
+    return content, confidences
+
+
+def find_uncertain_fields(content: dict, confidences: dict, required_fields=REQUIRED_FIELDS, thresholds: dict | None = None) -> list[str]:
+    """Return the required fields that are missing or below their confidence threshold."""
+    thresholds = thresholds or {}
+    uncertain = []
+    for field in required_fields:
+        threshold = thresholds.get(field, DEFAULT_CONFIDENCE_THRESHOLD)
+        if content.get(field) in (None, "", []) or confidences.get(field, 0.0) < threshold:
+            uncertain.append(field)
+    return uncertain
+
+
+def route_invoice(
+    prebuilt: dict,
+    model: str = "azure-gpt-4.1",
+    thresholds: dict | None = None,
+    required_fields=REQUIRED_FIELDS,
+    max_llm_fields: int = 4,
+):
+    """
+    Decide how much LLM work an invoice needs once Azure's prebuilt-invoice model has run.
+
+    - `prebuilt`: every required field passes its confidence threshold, so the prebuilt fields are
+      returned as-is without calling the LLM.
+    - `partial`: up to `max_llm_fields` header fields are missing or uncertain (line items are
+      confident), so only those fields are requested from the LLM with a reduced prompt.
+    - `full`: anything else goes through `process_invoice_chain` on the prebuilt markdown.
+
+    Args:
+        prebuilt: Output of `parse_invoice_prebuilt`.
+        model: The ID of the model used for the partial and full paths.
+        thresholds: Per-field confidence thresholds, defaulting to `DEFAULT_CONFIDENCE_THRESHOLD`.
+        required_fields: Fields that must be confident for the prebuilt path.
+        max_llm_fields: Maximum number of uncertain fields handled by the partial path.
+
+    Returns:
+        Dictionary with `content` and `usage_metadata`; `usage_metadata["route"]` records the path taken.
+    """
+    started = time.perf_counter()
+    content, confidences = map_prebuilt_fields(prebuilt)
+    uncertain_fields = find_uncertain_fields(content, confidences, required_fields, thresholds)
+
+    if not uncertain_fields:
+        route = "prebuilt"
+        confident = [confidences[field] for field in required_fields]
+        content["metadata"] = {"language": None, "confidence_score": round(min(confident), 4) if confident else None}
+        with span("validation"):
+            parsed_content = parse_process_invoice_result(_drop_missing(content), as_dict=True)
+        usage_metadata = {"input_tokens": 0, "output_tokens": 0, "total_tokens": 0, "model": "prebuilt-invoice", "llm_cost_usd": 0.0}
+        result_output = {"content": parsed_content, "usage_metadata": usage_metadata}
+
+    elif len(uncertain_fields) <= max_llm_fields and "items" not in uncertain_fields:
+        route = "partial"
+        prompt_template = process_invoice_fields_prompt([*uncertain_fields, "metadata"], use_cache_breakpoints(model))
+        result, usage_metadata = invoke_llm(prompt_template, {"invoice_details": prebuilt["doc_content"]}, model)
+
+        with span("json_parse"):
+            llm_content, usage_metadata["truncated"] = decode_partial_json_object(result.content)
+        for field in [*uncertain_fields, "metadata"]:
+            content[field] = llm_content.get(field)
+        with span("validation"):
+            parsed_content = parse_process_invoice_result(_drop_missing(content), as_dict=True)
+
+        add_llm_cost(usage_metadata, usage_metadata["model"])
+        result_output = {"content": parsed_content, "usage_metadata": usage_metadata}
+
+    else:
+        route = "full"
+        result_output = process_invoice_chain(invoice_details=prebuilt["doc_content"], model=model)
+
+    result_output["usage_metadata"]["route"] = route
+    result_output["usage_metadata"]["uncertain_fields"] = uncertain_fields
+    result_output["usage_metadata"]["route_seconds"] = round(time.perf_counter() - started, 3)
+    with _route_lock:
+        _route_counts[route] += 1
+    return result_output
+
+
+def get_route_stats() -> dict:
+    """Return how many invoices took each route in this process."""
+    with _route_lock:
+        total = sum(_route_counts.values())
+        return {
+            "total": total,
+            **{route: _route_counts[route] for route in ("prebuilt", "partial", "full")},
+            "llm_skip_rate": round(_route_counts["prebuilt"] / total, 4) if total else 0.0,
+        }
@@ -0,0 +1,104 @@
+from src.chains.process_invoice_chain import process_invoice_chain
+from src.chains.result_cache import ResultCache
+
+# Cheapest first; each later model is only called when the previous result is not trusted
+DEFAULT_CASCADE = ("azure-gpt-4.1-mini", "azure-gpt-4.1")
+DEFAULT_MIN_CONFIDENCE = 0.8
+
+
+def _close(actual: float, expected: float, tolerance: float) -> bool:
+    return abs(actual - expected) <= max(0.01, tolerance * abs(expected))
+
+
+def reconcile_totals(content: dict, tolerance: float = 0.01) -> list[str]:
+    """
+    Check that the extracted amounts add up, within a relative `tolerance`.
+
+    Only checks whose inputs were all extracted are applied: line totals against the invoice total,
+    line subtotals plus VAT against the invoice total, and quantity times unit price per line.
+
+    Returns:
+        A description of each check that failed.
+    """
+    issues = []
+    items = content.get("items") or []
+    invoice_total = content.get("invoice_total")
+
+    if invoice_total is not None and items and all(item.get("total_price") is not None for item in items):
+        items_total = sum(item["total_price"] for item in items)
+        if not _close(items_total, invoice_total, tolerance):
+            issues.append(f"line totals {items_total:.2f} != invoice total {invoice_total:.2f}")
+
+    vat_amount = content.get("invoice_vat_amount")
+    if invoice_total is not None and vat_amount is not None and items and all(item.get("subtotal_price") is not None for item in items):
+        subtotal = sum(item["subtotal_price"] for item in items)
+        if not _close(subtotal + vat_amount, invoice_total, tolerance):
+            issues.append(f"subtotal {subtotal:.2f} + VAT {vat_amount:.2f} != invoice total {invoice_total:.2f}")
+
+    for i, item in enumerate(items):
+        quantity, unit_price = item.get("quantity"), item.get("unit_price")
+        line_amount = item.get("subtotal_price") if item.get("subtotal_price") is not None else item.get("total_price")
+        if quantity is None or unit_price is None or line_amount is None:
+            continue
+        # Either the net or the gross line amount may be quantity x unit price
+        if not (_close(quantity * unit_price, line_amount, tolerance) or _close(quantity * unit_price, item.get("total_price") or 0.0, tolerance)):
+            issues.append(f"item {i}: {quantity:g} x {unit_price:.2f} != {line_amount:.2f}")
+    return issues
+
+
+def escalation_reasons(content: dict, min_confidence: float = DEFAULT_MIN_CONFIDENCE, tolerance: float = 0.01) -> list[str]:
+    """Reasons not to trust an extraction: low or missing confidence and totals that do not reconcile."""
+    reasons = []
+    confidence = (content.get("metadata") or {}).get("confidence_score")
+    if confidence is None or confidence < min_confidence:
+        reasons.append(f"confidence {confidence} below {min_confidence}")
+    reasons.extend(reconcile_totals(content, tolerance))
+    return reasons
+
+
+def process_invoice_cascade(
+    invoice_details,
+    models=DEFAULT_CASCADE,
+    min_confidence: float = DEFAULT_MIN_CONFIDENCE,
+    tolerance: float = 0.01,
+    cache: ResultCache | None = None,
+    use_cache: bool = True,
+):
+    """
+    Extract an invoice with the cheapest model first, escalating to the next model in `models` only
+    when the response fails validation or was truncated, its `metadata.confidence_score` is below
+    `min_confidence` or its totals do not reconcile.
+
+    When no model is trusted, the last valid result is returned. `usage_metadata` lists every
+    attempt and its escalation reasons under `cascade`, and `llm_cost_usd` sums the cost of the
+    attempts that returned a result.
+    """
+    attempts = []
+    last_error: Exception | None = None
+    result_output = None
+    for model in models:
+        try:
+            result_output = process_invoice_chain(invoice_details, model=model, cache=cache, use_cache=use_cache)
+        except ValueError as exc:
+            # Unparseable output or a result that does not match ProcessInvoiceResult
+            last_error = exc
+            attempts.append({"model": model, "reasons": [f"validation failed: {exc}"], "llm_cost_usd": None})
+            continue
+
+        reasons = escalation_reasons(result_output["content"], min_confidence, tolerance)
+        usage_metadata = result_output["usage_metadata"]
+        if usage_metadata.get("truncated"):
+            reasons.insert(0, "response truncated")
+        attempts.append({"model": model, "reasons": reasons, "llm_cost_usd": usage_metadata["llm_cost_usd"]})
+        if not reasons:
+            break
+
+    if result_output is None:
+        raise last_error or ValueError("No model in the cascade returned a result")
+
+    usage_metadata = result_output["usage_metadata"]
+    usage_metadata["cascade"] = attempts
+    usage_metadata["escalations"] = len(attempts) - 1
+    usage_metadata["llm_cost_usd"] = round(sum(attempt["llm_cost_usd"] or 0.0 for attempt in attempts), 6)
+    usage_metadata["extraction_mode"] = "cascade"
+    return result_output
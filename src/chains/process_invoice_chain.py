@@ -1,39 +1,252 @@
-import json
-import ast
+import time
+from typing import Callable
 
-from src.models import load_llm_models
+from src.chains.hedging import hedge_delay, record_hedge, run_race
+from src.chains.result_cache import ResultCache, get_result_cache
+from src.chains.token_budget import clamp_max_tokens
+from src.llm_scheduler import LlmScheduler, get_llm_scheduler
+from src.models import MODEL_CONFIGS, load_llm_models, use_cache_breakpoints
 from src.prompts import process_invoice_prompt
-from src.parsers import parse_process_invoice_result
+from src.parsers import decode_json_object, parse_partial_process_invoice_json, parse_process_invoice_result
+from src.telemetry import record_output_rate, span
+from src.utils import count_tokens, prompt_cache_tokens
 
 
 def return_json_result(result):
-    if isinstance(result, dict):
-        return result
-    cleaned = result.replace("```json", "").replace("```", "").strip()
-    try:
-        return json.loads(cleaned)
-    except json.JSONDecodeError:
-        python_obj = ast.literal_eval(cleaned)
-        if isinstance(python_obj, dict):
-            return python_obj
-        raise ValueError("LLM response is not a JSON object")
-
-
-def process_invoice_chain(invoice_details, model="azure-gpt-4.1"):
-    prompt_template = process_invoice_prompt()
-    llm = load_llm_models(model=model)
-    chain = prompt_template | llm
-
-    result = chain.invoke({"invoice_details": invoice_details})
-
-    raw_content = return_json_result(result.content)
-    parsed_content = parse_process_invoice_result(raw_content)
-    parsed_content_dict = parsed_content.model_dump()
-
-    result.usage_metadata["model"] = model
-
-    input_tokens = result.usage_metadata["input_tokens"]
-    output_tokens = result.usage_metadata["output_tokens"]
-    result.usage_metadata["llm_cost_usd"] = round(input_tokens * 2.0 / 1000000 + output_tokens * 8.0 / 1000000, 6)
-    result_output = {"content": parsed_content_dict, "usage_metadata": result.usage_metadata}
+    """Decode the JSON object in an LLM response, tolerating fences, comments, trailing commas and truncation."""
+    return decode_json_object(result)
+
+
+def calculate_llm_cost(
+    input_tokens: int,
+    output_tokens: int,
+    model: str | None = None,
+    cached_input_tokens: int = 0,
+    cache_write_tokens: int = 0,
+) -> float:
+    """
+    Cost in USD at `model`'s prices from `MODEL_CONFIGS`, defaulting to $2 / $8 per million tokens.
+
+    `input_tokens` includes the prompt cache reads (`cached_input_tokens`) and writes
+    (`cache_write_tokens`), priced at `cached_input_cost_per_m` and `cache_write_cost_per_m`
+    when the model has them and at the input price otherwise.
+    """
+    config = MODEL_CONFIGS.get(model, {})
+    input_cost = config.get("input_cost_per_m", 2.0)
+    output_cost = config.get("output_cost_per_m", 8.0)
+    cached_input_cost = config.get("cached_input_cost_per_m", input_cost)
+    cache_write_cost = config.get("cache_write_cost_per_m", input_cost)
+    uncached_input_tokens = input_tokens - cached_input_tokens - cache_write_tokens
+    cost = (
+        uncached_input_tokens * input_cost
+        + cached_input_tokens * cached_input_cost
+        + cache_write_tokens * cache_write_cost
+        + output_tokens * output_cost
+    )
+    return round(cost / 1000000, 6)
+
+
+def add_llm_cost(usage_metadata: dict, model: str) -> dict:
+    """
+    Add the prompt cache split of the input tokens and the cost of the call to `usage_metadata`.
+
+    `cached_input_tokens` were served from the provider's prompt cache and `uncached_input_tokens`
+    were not (including `cache_write_input_tokens`, written to it). `prompt_cache_savings_usd` is
+    the cost difference against the same call without prompt caching, negative when cache writes
+    cost more than the reads saved. A split already in `usage_metadata` (such as the sum over
+    several calls) is kept.
+    """
+    if "cached_input_tokens" not in usage_metadata:
+        cached_input_tokens, cache_write_tokens = prompt_cache_tokens(usage_metadata)
+        usage_metadata["cached_input_tokens"] = cached_input_tokens
+        usage_metadata["cache_write_input_tokens"] = cache_write_tokens
+        usage_metadata["uncached_input_tokens"] = usage_metadata["input_tokens"] - cached_input_tokens
+
+    input_tokens, output_tokens = usage_metadata["input_tokens"], usage_metadata["output_tokens"]
+    cached_input_tokens, cache_write_tokens = usage_metadata["cached_input_tokens"], usage_metadata["cache_write_input_tokens"]
+    usage_metadata["llm_cost_usd"] = calculate_llm_cost(input_tokens, output_tokens, model, cached_input_tokens, cache_write_tokens)
+    usage_metadata["prompt_cache_savings_usd"] = round(
+        calculate_llm_cost(input_tokens, output_tokens, model) - usage_metadata["llm_cost_usd"], 6
+    )
+    return usage_metadata
+
+
+def cached_invoice_output(cached: dict) -> dict:
+    """Return a cached extraction, reporting zero LLM cost and keeping the original cost for reporting."""
+    usage_metadata = cached["usage_metadata"] | {
+        "cache_hit": True,
+        "llm_cost_usd": 0.0,
+        "cached_llm_cost_usd": cached["usage_metadata"]["llm_cost_usd"],
+    }
+    return {"content": cached["content"], "usage_metadata": usage_metadata}
+
+
+def build_invoice_output(response_content, usage_metadata: dict, model: str) -> dict:
+    """
+    Parse and validate an LLM response and attach the model and cost to its usage metadata.
+
+    `usage_metadata["truncated"]` is True when the response was cut off (typically at `max_tokens`),
+    so the fields and line items after the cut are missing even though the result validates.
+    """
+    # Text is parsed and validated in one pass straight into the output dictionary
+    truncated = False
+    with span("validation"):
+        if isinstance(response_content, dict):
+            parsed_content_dict = parse_process_invoice_result(response_content, as_dict=True)
+        else:
+            parsed_content_dict, truncated = parse_partial_process_invoice_json(response_content, as_dict=True)
+
+    usage_metadata["truncated"] = truncated
+    usage_metadata["model"] = model
+    add_llm_cost(usage_metadata, model)
+    usage_metadata["cache_hit"] = False
+    return {"content": parsed_content_dict, "usage_metadata": usage_metadata}
+
+
+def _scheduled_usage(result, deployment: str, waited: float, model: str) -> dict:
+    usage_metadata = dict(result.usage_metadata or {}) | {"model": deployment, "queue_wait_seconds": round(waited, 3)}
+    if deployment != model:
+        usage_metadata["requested_model"] = model
+    return usage_metadata
+
+
+def invoke_llm(prompt_template, inputs: dict, model: str, scheduler: LlmScheduler | None = None, max_tokens: int | None = None):
+    """
+    Invoke `prompt_template | llm`, through the LLM scheduler unless it is disabled.
+
+    `max_tokens` overrides the model's configured output limit for this call.
+
+    Returns:
+        The response and its usage metadata, which records the deployment that served the call
+        and, when scheduled, the seconds spent waiting for capacity.
+    """
+    scheduler = scheduler or get_llm_scheduler()
+    if scheduler is None:
+        with span("prompt_render"):
+            messages = prompt_template.format_messages(**inputs)
+        with span("llm_total", model=model) as llm_span:
+            started = time.perf_counter()
+            result = load_llm_models(model=model).invoke(messages, **({"max_tokens": max_tokens} if max_tokens else {}))
+            record_output_rate(model, (result.usage_metadata or {}).get("output_tokens"), time.perf_counter() - started)
+            llm_span.set(cached_input_tokens=prompt_cache_tokens(result.usage_metadata or {})[0])
+        return result, dict(result.usage_metadata or {}) | {"model": model}
+
+    result, deployment, waited = scheduler.invoke(prompt_template, inputs, model, max_tokens)
+    return result, _scheduled_usage(result, deployment, waited, model)
+
+
+async def ainvoke_llm(
+    prompt_template, inputs: dict, model: str, scheduler: LlmScheduler | None = None, max_tokens: int | None = None
+):
+    """Async variant of `invoke_llm`."""
+    scheduler = scheduler or get_llm_scheduler()
+    if scheduler is None:
+        with span("prompt_render"):
+            messages = prompt_template.format_messages(**inputs)
+        with span("llm_total", model=model) as llm_span:
+            started = time.perf_counter()
+            result = await load_llm_models(model=model).ainvoke(messages, **({"max_tokens": max_tokens} if max_tokens else {}))
+            record_output_rate(model, (result.usage_metadata or {}).get("output_tokens"), time.perf_counter() - started)
+            llm_span.set(cached_input_tokens=prompt_cache_tokens(result.usage_metadata or {})[0])
+        return result, dict(result.usage_metadata or {}) | {"model": model}
+
+    result, deployment, waited = await scheduler.ainvoke(prompt_template, inputs, model, max_tokens)
+    return result, _scheduled_usage(result, deployment, waited, model)
+
+
+def hedged_invoice_output(
+    prompt_template,
+    inputs: dict,
+    model: str,
+    hedge_model: str,
+    hedge_percentile: float = 0.95,
+    scheduler: LlmScheduler | None = None,
+    max_tokens: int | None = None,
+) -> dict:
+    """
+    Extract with `model`, racing `hedge_model` if `model` has not answered within its `hedge_percentile` latency.
+
+    The first response that passes validation wins and the other call is cancelled. The usage
+    metadata reports whether the call was hedged, the winning model, the running hedge rate and the
+    extra cost of the losing call (its input tokens when it was cancelled before answering).
+    `max_tokens` is planned for `model`, so each model gets it capped at its own output limit.
+    """
+
+    def extraction(llm_model: str):
+        llm_max_tokens = clamp_max_tokens(llm_model, max_tokens)
+
+        async def call():
+            result, usage_metadata = await ainvoke_llm(prompt_template, inputs, llm_model, scheduler, llm_max_tokens)
+            return build_invoice_output(result.content, usage_metadata, usage_metadata["model"])
+
+        return call
+
+    delay = hedge_delay(model, hedge_percentile)
+    race = run_race(model, extraction(model), hedge_model, extraction(hedge_model), delay)
+    result_output = race["output"]
+
+    extra_cost = 0.0
+    if race["hedged"]:
+        if race["loser_output"]:
+            extra_cost = race["loser_output"]["usage_metadata"]["llm_cost_usd"]
+        else:
+            prompt_text = "".join(str(message.content) for message in prompt_template.format_messages(**inputs))
+            extra_cost = calculate_llm_cost(count_tokens(prompt_text), 0, hedge_model if race["winner"] == "primary" else model)
+
+    hedge_rate = record_hedge(race["hedged"], race["winner"] == "secondary", extra_cost)
+    result_output["usage_metadata"] |= {
+        "hedged": race["hedged"],
+        "hedge_winner": race["winner"],
+        "hedge_delay_seconds": round(delay, 3),
+        "hedge_extra_cost_usd": extra_cost,
+        "hedge_rate": round(hedge_rate, 4),
+    }
+    return result_output
+
+
+def process_invoice_chain(
+    invoice_details,
+    model="azure-gpt-4.1",
+    cache: ResultCache | None = None,
+    use_cache: bool = True,
+    scheduler: LlmScheduler | None = None,
+    hedge_model: str | None = None,
+    hedge_percentile: float = 0.95,
+    on_response: Callable[[str, dict], None] | None = None,
+    max_tokens: int | None = None,
+):
+    """
+    Extract an invoice from its markdown with `model`.
+
+    With `hedge_model`, the same prompt is also sent to `hedge_model` when `model` is slower than its
+    `hedge_percentile` latency, and the first valid response is returned (see `hedged_invoice_output`).
+    `on_response` is called with the raw response text and its usage metadata before validation
+    (not for hedged calls), so callers can checkpoint what they paid for. `max_tokens` overrides
+    the model's configured output limit (see `plan_extraction`).
+    """
+    # Breakpoints are only sent when every model the prompt may go to understands them
+    cache_breakpoint = use_cache_breakpoints(model) and (not hedge_model or use_cache_breakpoints(hedge_model))
+    prompt_template = process_invoice_prompt(cache_breakpoint=cache_breakpoint)
+
+    cache = (cache or get_result_cache()) if use_cache else None
+    cache_key = ResultCache.make_key(model, prompt_template, invoice_details) if cache else None
+    cached = cache.get(cache_key) if cache else None
+    if cached:
+        return cached_invoice_output(cached)
+
+    inputs = {"invoice_details": invoice_details}
+    if hedge_model:
+        result_output = hedged_invoice_output(prompt_template, inputs, model, hedge_model, hedge_percentile, scheduler, max_tokens)
+    else:
+        result, usage_metadata = invoke_llm(prompt_template, inputs, model, scheduler, max_tokens)
+        if on_response:
+            on_response(result.content, usage_metadata)
+        result_output = build_invoice_output(result.content, usage_metadata, usage_metadata["model"])
+
+    # A result served by a fallback or hedge deployment is not `model`'s answer to this prompt, and
+    # a truncated one is not worth keeping
+    usage_metadata = result_output["usage_metadata"]
+    if cache and usage_metadata["model"] == model and not usage_metadata.get("truncated"):
+        cache.set(cache_key, result_output)
+
     return result_output
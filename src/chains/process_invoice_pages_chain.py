@@ -0,0 +1,157 @@
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+from src.chains.process_invoice_chain import add_llm_cost, process_invoice_chain
+from src.models import load_llm_models, use_cache_breakpoints
+from src.parsers import decode_partial_json_object, parse_process_invoice_result
+from src.prompts import process_invoice_fields_prompt, process_invoice_items_prompt
+from src.preprocessing import is_table_row
+from src.prompts.process_invoice_fields_prompt import FIELD_FORMATS
+from src.telemetry import span
+from src.utils import prompt_cache_tokens
+
+# Line items come from the page group calls, so the header call only asks for the other fields
+HEADER_FIELDS = [field for field in FIELD_FORMATS if field != "items"]
+# Page headers/footers, page numbers and blank lines Azure places around a page's body
+LEADING_FURNITURE_PATTERN = re.compile(r"^\s*(?:<!--(?:(?!-->).)*-->\s*)*")
+TRAILING_FURNITURE_PATTERN = re.compile(r"(?:\s*<!--(?:(?!-->).)*-->)*\s*$")
+
+
+def group_pages(doc_pages: list[dict], pages_per_chunk: int) -> list[list[dict]]:
+    """Split `doc_pages` into consecutive groups of at most `pages_per_chunk` pages."""
+    return [doc_pages[i : i + pages_per_chunk] for i in range(0, len(doc_pages), pages_per_chunk)]
+
+
+def continues_table(previous_page: dict, page: dict) -> bool:
+    """
+    Whether `page` opens with the continuation of a table `previous_page` ends with.
+
+    Text before the first table of `page` is allowed only when `previous_page` has it too, as with
+    a letterhead repeated on every page. Tables are recognised both as Azure's HTML and as the text
+    rows `compact_doc_pages` rewrites them into.
+    """
+    previous_body = TRAILING_FURNITURE_PATTERN.sub("", previous_page["content"])
+    ends_with_table = previous_body.endswith("</table>") or is_table_row(previous_body.rpartition("\n")[2])
+    content = LEADING_FURNITURE_PATTERN.sub("", page["content"])
+    lead, table, _ = content.partition("<table>")
+    if not table:
+        lines = content.splitlines()
+        first_row = next((i for i, line in enumerate(lines) if is_table_row(line)), None)
+        if first_row is not None:
+            lead, table = "\n".join(lines[:first_row]), lines[first_row]
+    repeated_lead = all(line.strip() in previous_page["content"] for line in lead.splitlines())
+    return ends_with_table and bool(table) and repeated_lead
+
+
+def merge_items(chunk_items: list[list[dict]], continued: list[bool] | None = None) -> list[dict]:
+    """
+    Merge line items extracted from consecutive page groups.
+
+    A table row split by a page break can be extracted from both groups, so when group `i` continues
+    a table from group `i - 1` (`continued[i]`, see `continues_table`) an item identical to the last
+    item of the previous group is dropped. Identical items at any other boundary are separate line
+    items and kept. Items with no values at all are dropped.
+    """
+    merged: list[dict] = []
+    previous_last: dict | None = None
+    for i, items in enumerate(chunk_items):
+        items = [item for item in items if isinstance(item, dict) and any(value is not None for value in item.values())]
+        if items and continued and continued[i] and previous_last is not None and items[0] == previous_last:
+            items = items[1:]
+        merged.extend(items)
+        if items:
+            previous_last = items[-1]
+    return merged
+
+
+def process_invoice_pages_chain(
+    doc_pages: list[dict],
+    model: str = "azure-gpt-4.1",
+    pages_per_chunk: int = 4,
+    max_concurrency: int = 8,
+    max_tokens: int | None = None,
+    total_pages: int | None = None,
+):
+    """
+    Extract a long invoice with one LLM call per page group instead of one call for the whole document.
+
+    Header fields (everything but the line items) come from the first and last pages, while line
+    items are extracted from every page group concurrently and then merged, so latency scales with
+    the largest group rather than the whole document. Documents that fit in a single group go through `process_invoice_chain`.
+
+    Args:
+        doc_pages: Pages as returned by `parse_pdf_azure`.
+        model: The ID of the model to use for every call.
+        pages_per_chunk: Number of pages sent in each line item call.
+        max_concurrency: Maximum number of concurrent line item calls.
+        max_tokens: Output limit of every call, overriding the model's configured `max_tokens`.
+        total_pages: Page count of the whole document when `doc_pages` is a subset of it (see
+            `triage_pdf_output`), defaulting to `len(doc_pages)`.
+
+    Returns:
+        Dictionary with the merged `ProcessInvoiceResult` content and the summed usage metadata, whose
+        `truncated` is True when any call's response was cut off.
+    """
+    if len(doc_pages) <= pages_per_chunk:
+        invoice_details = "<!-- PageBreak -->".join(page["content"] for page in doc_pages)
+        return process_invoice_chain(invoice_details=invoice_details, model=model, max_tokens=max_tokens)
+
+    llm = load_llm_models(model=model)
+    if max_tokens:
+        llm = llm.bind(max_tokens=max_tokens)
+    cache_breakpoint = use_cache_breakpoints(model)
+    header_chain = process_invoice_fields_prompt(HEADER_FIELDS, cache_breakpoint=cache_breakpoint) | llm
+    # Every page group shares the items prompt's instructions, so all but the first can read them from the prompt cache
+    items_chain = process_invoice_items_prompt(cache_breakpoint=cache_breakpoint) | llm
+
+    header_pages = [doc_pages[0], doc_pages[-1]]
+    header_input = {"invoice_details": "<!-- PageBreak -->".join(page["content"] for page in header_pages)}
+
+    page_groups = group_pages(doc_pages, pages_per_chunk)
+    items_inputs = [
+        {
+            "invoice_details": "<!-- PageBreak -->".join(page["content"] for page in group),
+            "page_range": f"pages {group[0]['page']}-{group[-1]['page']} of {total_pages or len(doc_pages)}",
+        }
+        for group in page_groups
+    ]
+
+    with span("llm_total", model=model, calls=len(items_inputs) + 1), ThreadPoolExecutor(max_workers=1) as executor:
+        header_future = executor.submit(header_chain.invoke, header_input)
+        items_results = items_chain.batch(items_inputs, config={"max_concurrency": max_concurrency})
+        header_result = header_future.result()
+
+    with span("json_parse"):
+        chunk_items = []
+        truncated = False
+        for items_result in items_results:
+            items_content, items_truncated = decode_partial_json_object(items_result.content)
+            chunk_items.append(items_content.get("items") or [])
+            truncated = truncated or items_truncated
+
+        header_content, header_truncated = decode_partial_json_object(header_result.content)
+        truncated = truncated or header_truncated
+        continued = [False] + [continues_table(previous[-1], group[0]) for previous, group in zip(page_groups, page_groups[1:])]
+        header_content["items"] = merge_items(chunk_items, continued)
+    with span("validation"):
+        parsed_content = parse_process_invoice_result(header_content, as_dict=True)
+
+    llm_results = [header_result, *items_results]
+    input_tokens = sum(result.usage_metadata["input_tokens"] for result in llm_results)
+    output_tokens = sum(result.usage_metadata["output_tokens"] for result in llm_results)
+    cached_input_tokens, cache_write_tokens = map(sum, zip(*(prompt_cache_tokens(result.usage_metadata) for result in llm_results)))
+    usage_metadata = {
+        "input_tokens": input_tokens,
+        "output_tokens": output_tokens,
+        "total_tokens": input_tokens + output_tokens,
+        "cached_input_tokens": cached_input_tokens,
+        "cache_write_input_tokens": cache_write_tokens,
+        "uncached_input_tokens": input_tokens - cached_input_tokens,
+        "model": model,
+        "llm_calls": len(llm_results),
+        "extraction_mode": "pages",
+        "cache_hit": False,
+        "truncated": truncated,
+    }
+    add_llm_cost(usage_metadata, model)
+    return {"content": parsed_content, "usage_metadata": usage_metadata}
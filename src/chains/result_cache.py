@@ -0,0 +1,174 @@
+import abc
+import copy
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+class ResultCache(abc.ABC):
+    """
+    Base class for extraction result caches; subclasses implement `_get` and `_set`.
+
+    Entries hold the validated `ProcessInvoiceResult` dict under `content` and the original
+    `usage_metadata` of the LLM call that produced it.
+    """
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(model: str, prompt_template, invoice_details: str) -> str:
+        """
+        Build a cache key from the model ID, the rendered prompt template and the invoice markdown.
+
+        The template is rendered with its `{invoice_details}` placeholder left in place, so any
+        change to the prompt text invalidates previously cached results.
+        """
+        messages = prompt_template.format_messages(invoice_details="{invoice_details}")
+        rendered_prompt = json.dumps([message.content for message in messages], sort_keys=True, default=str)
+        prompt_hash = hashlib.sha256(rendered_prompt.encode("utf-8")).hexdigest()
+        details_hash = hashlib.sha256(invoice_details.encode("utf-8")).hexdigest()
+        return hashlib.sha256(f"{model}:{prompt_hash}:{details_hash}".encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> dict | None:
+        entry = self._get(key)
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return entry
+
+    def set(self, key: str, value: dict) -> None:
+        self._set(key, value)
+
+    def stats(self) -> dict:
+        """Return hit/miss counters for the cache."""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+    @abc.abstractmethod
+    def _get(self, key: str) -> dict | None:
+        """Return the entry stored under `key`, or None."""
+
+    @abc.abstractmethod
+    def _set(self, key: str, value: dict) -> None:
+        """Store `value` under `key`."""
+
+
+class InMemoryResultCache(ResultCache):
+    """Process-local LRU cache holding up to `max_entries` results."""
+
+    def __init__(self, max_entries: int = 1024):
+        super().__init__()
+        self.max_entries = max_entries
+        self._entries: OrderedDict[str, dict] = OrderedDict()
+
+    def _get(self, key: str) -> dict | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+        return copy.deepcopy(entry)
+
+    def _set(self, key: str, value: dict) -> None:
+        with self._lock:
+            self._entries[key] = copy.deepcopy(value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+class SQLiteResultCache(ResultCache):
+    """SQLite-backed cache shared across processes, evicting least recently used rows past `max_entries`."""
+
+    def __init__(self, db_path: str | Path, max_entries: int = 100_000):
+        super().__init__()
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_entries = max_entries
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS result_cache (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_result_cache_accessed_at ON result_cache (accessed_at)")
+
+    def _get(self, key: str) -> dict | None:
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM result_cache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            self._conn.execute("UPDATE result_cache SET accessed_at = ? WHERE key = ?", (time.time(), key))
+        return json.loads(row[0])
+
+    def _set(self, key: str, value: dict) -> None:
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO result_cache (key, value, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value, ensure_ascii=False), now, now),
+            )
+            self._conn.execute(
+                """
+                DELETE FROM result_cache WHERE key IN (
+                    SELECT key FROM result_cache ORDER BY accessed_at DESC LIMIT -1 OFFSET ?
+                )
+                """,
+                (self.max_entries,),
+            )
+
+
+_default_cache: ResultCache | None = None
+_default_cache_lock = threading.Lock()
+
+
+def get_result_cache() -> ResultCache | None:
+    """
+    Return the process-wide extraction result cache, configured from the environment.
+
+    Environment variables:
+        RESULT_CACHE_BACKEND: `memory` (default), `sqlite` or `none`.
+        RESULT_CACHE_PATH: SQLite database path (default `data/cache/results.sqlite3`).
+        RESULT_CACHE_MAX_ENTRIES: Maximum number of cached results.
+    """
+    global _default_cache
+    backend = os.getenv("RESULT_CACHE_BACKEND", "memory").lower()
+    if backend == "none":
+        return None
+
+    with _default_cache_lock:
+        if _default_cache is None:
+            if backend == "sqlite":
+                _default_cache = SQLiteResultCache(
+                    db_path=os.getenv("RESULT_CACHE_PATH", str(Path("data") / "cache" / "results.sqlite3")),
+                    max_entries=int(os.getenv("RESULT_CACHE_MAX_ENTRIES", "100000")),
+                )
+            elif backend == "memory":
+                _default_cache = InMemoryResultCache(max_entries=int(os.getenv("RESULT_CACHE_MAX_ENTRIES", "1024")))
+            else:
+                raise ValueError(f"Unknown result cache backend: {backend}")
+        return _default_cache
@@ -0,0 +1,117 @@
+import time
+
+from src.chains.process_invoice_chain import build_invoice_output, cached_invoice_output
+from src.chains.result_cache import ResultCache, get_result_cache
+from src.models import load_llm_models, use_cache_breakpoints
+from src.parsers import IncrementalInvoiceParser
+from src.prompts import process_invoice_prompt
+from src.telemetry import record_span
+from src.utils import count_tokens
+
+
+def _content_events(content: dict) -> list[dict]:
+    """Replay a complete extraction as the events a streamed extraction would have produced."""
+    events = [{"type": "field", "key": key, "value": value} for key, value in content.items() if key != "items"]
+    events.extend({"type": "item", "index": i, "item": item} for i, item in enumerate(content.get("items") or []))
+    return events
+
+
+def _usage_metadata(response, prompt_template, invoice_details: str) -> dict:
+    if response.usage_metadata:
+        return dict(response.usage_metadata)
+
+    # Some providers only report usage on streams when asked to; estimate it locally instead
+    prompt_text = "".join(str(message.content) for message in prompt_template.format_messages(invoice_details=invoice_details))
+    input_tokens = count_tokens(prompt_text)
+    output_tokens = count_tokens(response.text)
+    return {
+        "input_tokens": input_tokens,
+        "output_tokens": output_tokens,
+        "total_tokens": input_tokens + output_tokens,
+        "estimated": True,
+    }
+
+
+def stream_process_invoice_chain(invoice_details, model="azure-gpt-4.1", cache: ResultCache | None = None, use_cache: bool = True):
+    """
+    Stream an invoice extraction, yielding fields and line items as soon as the model completes them.
+
+    Yields:
+        `{"type": "field", "key", "value"}` for each top-level field, `{"type": "item", "index", "item"}`
+        for each line item and finally `{"type": "result", "result"}` holding the validated output in
+        the same shape as `process_invoice_chain`. Partial events are not validated; the final result is.
+    """
+    prompt_template = process_invoice_prompt(cache_breakpoint=use_cache_breakpoints(model))
+
+    cache = (cache or get_result_cache()) if use_cache else None
+    cache_key = ResultCache.make_key(model, prompt_template, invoice_details) if cache else None
+    cached = cache.get(cache_key) if cache else None
+    if cached:
+        result_output = cached_invoice_output(cached)
+        yield from _content_events(result_output["content"])
+        yield {"type": "result", "result": result_output}
+        return
+
+    llm = load_llm_models(model=model)
+    chain = prompt_template | llm
+
+    parser = IncrementalInvoiceParser()
+    response = None
+    start_unix, started = time.time(), time.perf_counter()
+    for chunk in chain.stream({"invoice_details": invoice_details}):
+        if response is None:
+            record_span("llm_ttft", time.perf_counter() - started, start_unix, {"model": model})
+        response = chunk if response is None else response + chunk
+        yield from parser.feed(chunk.text)
+    record_span("llm_total", time.perf_counter() - started, start_unix, {"model": model})
+    if response is None:
+        raise ValueError("empty LLM response")
+
+    usage_metadata = _usage_metadata(response, prompt_template, invoice_details)
+    result_output = build_invoice_output(response.text, usage_metadata, model)
+
+    if cache and not usage_metadata["truncated"]:
+        cache.set(cache_key, result_output)
+
+    yield {"type": "result", "result": result_output}
+
+
+async def astream_process_invoice_chain(
+    invoice_details, model="azure-gpt-4.1", cache: ResultCache | None = None, use_cache: bool = True
+):
+    """Async variant of `stream_process_invoice_chain`."""
+    prompt_template = process_invoice_prompt(cache_breakpoint=use_cache_breakpoints(model))
+
+    cache = (cache or get_result_cache()) if use_cache else None
+    cache_key = ResultCache.make_key(model, prompt_template, invoice_details) if cache else None
+    cached = cache.get(cache_key) if cache else None
+    if cached:
+        result_output = cached_invoice_output(cached)
+        for event in _content_events(result_output["content"]):
+            yield event
+        yield {"type": "result", "result": result_output}
+        return
+
+    llm = load_llm_models(model=model)
+    chain = prompt_template | llm
+
+    parser = IncrementalInvoiceParser()
+    response = None
+    start_unix, started = time.time(), time.perf_counter()
+    async for chunk in chain.astream({"invoice_details": invoice_details}):
+        if response is None:
+            record_span("llm_ttft", time.perf_counter() - started, start_unix, {"model": model})
+        response = chunk if response is None else response + chunk
+        for event in parser.feed(chunk.text):
+            yield event
+    record_span("llm_total", time.perf_counter() - started, start_unix, {"model": model})
+    if response is None:
+        raise ValueError("empty LLM response")
+
+    usage_metadata = _usage_metadata(response, prompt_template, invoice_details)
+    result_output = build_invoice_output(response.text, usage_metadata, model)
+
+    if cache and not usage_metadata["truncated"]:
+        cache.set(cache_key, result_output)
+
+    yield {"type": "result", "result": result_output}
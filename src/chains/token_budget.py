@@ -0,0 +1,223 @@
+import logging
+import math
+import os
+from functools import lru_cache
+from typing import Iterable
+
+from dotenv import load_dotenv
+
+from src.llm_scheduler import get_llm_scheduler
+from src.models import MODEL_CONFIGS
+from src.prompts import process_invoice_fields_prompt, process_invoice_items_prompt, process_invoice_prompt
+from src.prompts.process_invoice_fields_prompt import FIELD_FORMATS
+from src.telemetry import measured_output_rate
+from src.utils import count_tokens
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Output tokens of the header fields and of one line item as the models write them (indented JSON)
+HEADER_OUTPUT_TOKENS = 450
+ITEM_OUTPUT_TOKENS = 90
+# Head room on output estimates, which only see table rows
+OUTPUT_MARGIN = 1.25
+
+
+def count_table_rows(page: dict) -> int:
+    """Data rows in the tables of a page: HTML rows less one header row per table, or compacted text rows."""
+    if not page.get("has_table"):
+        return 0
+    content = page["content"]
+    if "<tr" in content:
+        return max(content.count("<tr") - content.count("<table"), 0)
+    # Tables compacted to `| a | b |` or tab separated rows
+    return sum(1 for line in content.splitlines() if line.startswith("|") or "\t" in line)
+
+
+def estimate_output_tokens(doc_pages: list[dict], header: bool = True) -> int:
+    """Expected response tokens for `doc_pages`: the header fields and one line item per table row."""
+    rows = sum(count_table_rows(page) for page in doc_pages)
+    return math.ceil(((HEADER_OUTPUT_TOKENS if header else 0) + rows * ITEM_OUTPUT_TOKENS) * OUTPUT_MARGIN)
+
+
+@lru_cache(maxsize=None)
+def prompt_overhead_tokens(prompt: str = "invoice") -> int:
+    """Tokens of the `invoice`, `header` (pages chain header call) or `items` prompt without the invoice markdown."""
+    if prompt == "items":
+        messages = process_invoice_items_prompt().format_messages(invoice_details="", page_range="pages 10-20 of 100")
+    elif prompt == "header":
+        header_fields = [field for field in FIELD_FORMATS if field != "items"]
+        messages = process_invoice_fields_prompt(header_fields).format_messages(invoice_details="")
+    else:
+        messages = process_invoice_prompt().format_messages(invoice_details="")
+    text = ""
+    for message in messages:
+        blocks = message.content if isinstance(message.content, list) else [{"text": message.content}]
+        text += "".join(block["text"] for block in blocks)
+    return count_tokens(text)
+
+
+def _limit(model: str, key: str) -> int | None:
+    """
+    The lowest `key` of `model` and the deployments the LLM scheduler may spill it over to.
+
+    A call planned for `model` can be served by any of them, so it has to fit all of them.
+    """
+    scheduler = get_llm_scheduler()
+    candidates = scheduler.candidates(model) if scheduler else [model]
+    limits = [MODEL_CONFIGS[candidate][key] for candidate in candidates if MODEL_CONFIGS.get(candidate, {}).get(key)]
+    return min(limits) if limits else None
+
+
+def clamp_max_tokens(model: str, max_tokens: int | None) -> int | None:
+    """`max_tokens` lowered to what `model` (and the deployments it may spill over to) can generate."""
+    max_output_tokens = _limit(model, "max_output_tokens")
+    if max_tokens and max_output_tokens:
+        return min(max_tokens, max_output_tokens)
+    return max_tokens
+
+
+def output_tokens_per_second(model: str) -> float | None:
+    """
+    `model`'s output throughput: its configured `output_tokens_per_second`, `TOKEN_BUDGET_OUTPUT_TPS`,
+    or the rate measured on this process's `llm_total` calls. None until one of them is known.
+    """
+    configured = MODEL_CONFIGS.get(model, {}).get("output_tokens_per_second") or os.getenv("TOKEN_BUDGET_OUTPUT_TPS")
+    return float(configured) if configured else measured_output_rate(model)
+
+
+def check_budget(model: str, prompt_tokens: int, output_tokens: int) -> tuple[list[str], int | None]:
+    """
+    Check one call against `model`'s context window and output limit.
+
+    Models without limits in `MODEL_CONFIGS` always fit.
+
+    Returns:
+        The reasons the call does not fit, and the `max_tokens` it needs when that is above the
+        model's configured `max_tokens` but within what the model can generate (None otherwise).
+    """
+    config = MODEL_CONFIGS.get(model, {})
+    issues = []
+    context_window = _limit(model, "context_window")
+    if context_window and prompt_tokens + output_tokens > context_window:
+        issues.append(f"{model}: {prompt_tokens} prompt + {output_tokens} output tokens exceed its {context_window} token context window")
+
+    max_tokens = None
+    max_output_tokens = _limit(model, "max_output_tokens")
+    if max_output_tokens and output_tokens > max_output_tokens:
+        issues.append(f"{model}: {output_tokens} output tokens exceed its {max_output_tokens} token output limit")
+    elif config.get("max_tokens") and output_tokens > config["max_tokens"]:
+        max_tokens = output_tokens
+    return issues, max_tokens
+
+
+def check_timeout(model: str, output_tokens: int) -> str | None:
+    """
+    Warn when generating `output_tokens` would take longer than `model`'s `timeout`.
+
+    Only checked once `model`'s throughput is known (see `output_tokens_per_second`), and never
+    used to reject a call.
+    """
+    timeout = MODEL_CONFIGS.get(model, {}).get("timeout")
+    tokens_per_second = output_tokens_per_second(model)
+    if not timeout or not tokens_per_second or output_tokens / tokens_per_second <= timeout:
+        return None
+    return (
+        f"{model}: {output_tokens} output tokens may take ~{output_tokens / tokens_per_second:.0f}s at "
+        f"{tokens_per_second:.0f} tokens/s, over its {timeout}s timeout"
+    )
+
+
+def _plan_pages(doc_pages: list[dict], page_tokens: list[int], model: str, pages_per_chunk: int) -> tuple[list[str], dict | None]:
+    """Find the largest page group size, up to `pages_per_chunk`, at which every call of the pages chain fits `model`."""
+    # The header call reads the first and last pages but returns no line items
+    header_prompt = prompt_overhead_tokens("header") + page_tokens[0] + page_tokens[-1]
+    issues, header_max_tokens = check_budget(model, header_prompt, estimate_output_tokens([]))
+    if issues:
+        return [f"pages header call: {issue}" for issue in issues], None
+
+    # Fewer pages per group than the document has, or the pages chain sends it in one call
+    for size in range(min(pages_per_chunk, len(doc_pages) - 1), 0, -1):
+        max_tokens = [header_max_tokens]
+        for start in range(0, len(doc_pages), size):
+            group = doc_pages[start : start + size]
+            group_prompt = prompt_overhead_tokens("items") + sum(page_tokens[start : start + size])
+            group_issues, group_max_tokens = check_budget(model, group_prompt, estimate_output_tokens(group, header=False))
+            if group_issues:
+                issues = [f"pages of {size}: {issue}" for issue in group_issues]
+                break
+            max_tokens.append(group_max_tokens)
+        else:
+            needed = [tokens for tokens in max_tokens if tokens]
+            pages_plan = {"pages_per_chunk": size, "max_tokens": max(needed) if needed else None}
+            return [], pages_plan | {"calls": math.ceil(len(doc_pages) / size) + 1}
+    return issues, None
+
+
+def plan_extraction(
+    pdf_output: dict,
+    model: str,
+    budget_models: Iterable[str] | None = None,
+    pages_per_chunk: int = 4,
+) -> dict:
+    """
+    Choose how to extract `pdf_output` within the models' limits before any LLM call is made.
+
+    Prompt tokens are counted locally and output tokens estimated from the table rows of
+    `doc_pages`. The whole document goes to `model` in one call when that fits its context
+    window and output limit (raising `max_tokens` for the call when only the configured
+    `max_tokens` is too low). Otherwise the first of `budget_models` (default `TOKEN_BUDGET_MODELS`,
+    `azure-gpt-4.1`) it fits is used, and failing that the pages chain with `model`, then with
+    each of `budget_models`, at the largest page group size that fits.
+
+    The limits are checked against estimates, so a document that fits no option is still sent to
+    `model` in one call, with a logged warning. Calls that may outlast the model's `timeout` are
+    only warned about too.
+
+    Returns:
+        `mode` (`single` or `pages`), `model`, `max_tokens` for the call or None, `pages_per_chunk`
+        in `pages` mode, the `prompt_tokens` and `output_tokens` estimates of the whole document,
+        the `reasons` any option tried before was rejected and `warnings` about the chosen one.
+    """
+    if budget_models is None:
+        budget_models = [name for name in os.getenv("TOKEN_BUDGET_MODELS", "azure-gpt-4.1").split(",") if name]
+    candidates = list(dict.fromkeys([model, *budget_models]))
+
+    doc_pages = pdf_output["doc_pages"]
+    page_tokens = [count_tokens(page["content"]) for page in doc_pages]
+    prompt_tokens = prompt_overhead_tokens("invoice") + sum(page_tokens)
+    output_tokens = estimate_output_tokens(doc_pages)
+    plan = {"prompt_tokens": prompt_tokens, "output_tokens": output_tokens, "reasons": [], "warnings": []}
+
+    for candidate in candidates:
+        issues, max_tokens = check_budget(candidate, prompt_tokens, output_tokens)
+        if not issues:
+            return _warn(plan | {"mode": "single", "model": candidate, "max_tokens": max_tokens}, output_tokens)
+        plan["reasons"].extend(issues)
+
+    if len(doc_pages) > 1:
+        for candidate in candidates:
+            issues, pages_plan = _plan_pages(doc_pages, page_tokens, candidate, pages_per_chunk)
+            if pages_plan:
+                group_output = max(
+                    estimate_output_tokens(doc_pages[start : start + pages_plan["pages_per_chunk"]], header=False)
+                    for start in range(0, len(doc_pages), pages_plan["pages_per_chunk"])
+                )
+                return _warn(plan | {"mode": "pages", "model": candidate, **pages_plan}, group_output)
+            plan["reasons"].extend(issues)
+
+    plan["warnings"].append(
+        f"Invoice may not fit the limits of {', '.join(candidates)} ({'; '.join(plan['reasons'])}); sending it to {model} anyway"
+    )
+    return _warn(plan | {"mode": "single", "model": model, "max_tokens": None}, output_tokens)
+
+
+def _warn(plan: dict, call_output_tokens: int) -> dict:
+    """Add the timeout warning for the largest call of `plan` and log the plan's warnings."""
+    timeout_warning = check_timeout(plan["model"], call_output_tokens)
+    if timeout_warning:
+        plan["warnings"].append(timeout_warning)
+    for warning in plan["warnings"]:
+        logger.warning("Token budget: %s", warning)
+    return plan
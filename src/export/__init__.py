@@ -0,0 +1,17 @@
+from .columnar import (
+    COLUMN_NAMES,
+    EXPORT_FORMATS,
+    InvoiceTableWriter,
+    arrow_schema,
+    export_batch_results,
+    export_invoices,
+)
+
+__all__ = [
+    "COLUMN_NAMES",
+    "EXPORT_FORMATS",
+    "InvoiceTableWriter",
+    "arrow_schema",
+    "export_batch_results",
+    "export_invoices",
+]
@@ -0,0 +1,200 @@
+import csv
+import json
+from pathlib import Path
+from typing import Iterable, List, Union, get_args, get_origin
+
+from pydantic import BaseModel
+
+from src.parsers.process_invoice_parser import InvoiceItem, ProcessInvoiceResult
+
+EXPORT_FORMATS = ("csv", "parquet")
+DEFAULT_BATCH_ROWS = 8192
+
+
+def _is_model(annotation) -> bool:
+    return isinstance(annotation, type) and issubclass(annotation, BaseModel)
+
+
+def _leaf_columns(model: type[BaseModel], prefix: str = "", path: tuple = ()) -> list[tuple[str, tuple, object]]:
+    """(column name, key path, annotation) for every scalar field, nested models flattened with `_`."""
+    columns = []
+    for name, field in model.model_fields.items():
+        if _is_model(field.annotation):
+            columns.extend(_leaf_columns(field.annotation, f"{prefix}{name}_", (*path, name)))
+        elif not (get_origin(field.annotation) in (list, List) and any(_is_model(arg) for arg in get_args(field.annotation))):
+            columns.append((f"{prefix}{name}", (*path, name), field.annotation))
+    return columns
+
+
+# One row per line item (or one row for an invoice without items), named like `flatten_invoice_output`
+INVOICE_COLUMNS = _leaf_columns(ProcessInvoiceResult)
+ITEM_COLUMNS = _leaf_columns(InvoiceItem, prefix="item_")
+COLUMN_NAMES = [name for name, _, _ in INVOICE_COLUMNS + ITEM_COLUMNS]
+
+
+def _is_list(annotation) -> bool:
+    return any(get_origin(arg) in (list, List) for arg in (annotation, *get_args(annotation)))
+
+
+def _arrow_type(annotation):
+    import pyarrow as pa
+
+    args = [arg for arg in get_args(annotation) if arg is not type(None)] or [annotation]
+    base = args[0]
+    if get_origin(base) in (list, List):
+        return pa.list_(_arrow_type(get_args(base)[0]))
+    return {str: pa.string(), float: pa.float64(), int: pa.int64(), bool: pa.bool_()}.get(base, pa.string())
+
+
+def arrow_schema(extra_columns: tuple[str, ...] = ()):
+    """The fixed Arrow schema of the export, with `extra_columns` (strings) first."""
+    import pyarrow as pa
+
+    fields = [pa.field(name, pa.string()) for name in extra_columns]
+    fields.extend(pa.field(name, _arrow_type(annotation)) for name, _, annotation in INVOICE_COLUMNS + ITEM_COLUMNS)
+    return pa.schema(fields)
+
+
+def _get_path(content: dict, path: tuple):
+    value = content
+    for key in path:
+        value = (value or {}).get(key)
+    return value
+
+
+class InvoiceTableWriter:
+    """
+    Stream validated invoices to CSV or Parquet in fixed-size columnar batches.
+
+    Rows are accumulated column by column: invoice-level values are repeated once per line item
+    instead of merged into a dict per row. Every `batch_rows` rows the batch is written (as one
+    Parquet row group) and dropped, so memory stays bounded however many invoices are exported.
+
+    In CSV, missing values are empty and list values (`metadata_language`) are joined with `;`.
+    Parquet keeps them as nulls and lists. Writing Parquet requires `pyarrow`.
+    """
+
+    def __init__(
+        self,
+        path: Union[str, Path],
+        format: str | None = None,
+        batch_rows: int = DEFAULT_BATCH_ROWS,
+        extra_columns: tuple[str, ...] = (),
+    ):
+        self.path = Path(path)
+        self.format = format or self.path.suffix.lstrip(".").lower()
+        if self.format not in EXPORT_FORMATS:
+            raise ValueError(f"Unsupported export format {self.format!r}; expected one of {EXPORT_FORMATS}")
+        self.batch_rows = batch_rows
+        self.extra_columns = tuple(extra_columns)
+        self.columns = [*self.extra_columns, *COLUMN_NAMES]
+        self.rows_written = 0
+        self._batch: dict[str, list] = {name: [] for name in self.columns}
+        self._batch_size = 0
+        self._file = None
+        self._csv_writer = None
+        self._parquet_writer = None
+        self._list_columns = [name for name, _, annotation in INVOICE_COLUMNS + ITEM_COLUMNS if _is_list(annotation)]
+
+    def write(self, content: dict, **extra) -> None:
+        """Add one invoice's content (as returned by `process_invoice_chain`), with values for `extra_columns`."""
+        items = content.get("items") or [{}]
+        n_rows = len(items)
+        batch = self._batch
+        for name in self.extra_columns:
+            batch[name].extend([extra.get(name)] * n_rows)
+        for name, path, _ in INVOICE_COLUMNS:
+            batch[name].extend([_get_path(content, path)] * n_rows)
+        for name, (key,), _ in ITEM_COLUMNS:
+            batch[name].extend([(item or {}).get(key) for item in items])
+
+        self._batch_size += n_rows
+        if self._batch_size >= self.batch_rows:
+            self.flush()
+
+    def write_many(self, contents: Iterable[dict]) -> None:
+        """Add every invoice content in `contents`."""
+        for content in contents:
+            self.write(content)
+
+    def flush(self) -> None:
+        """Write the buffered rows."""
+        if not self._batch_size:
+            return
+        if self.format == "csv":
+            self._flush_csv()
+        else:
+            self._flush_parquet()
+        self.rows_written += self._batch_size
+        self._batch = {name: [] for name in self.columns}
+        self._batch_size = 0
+
+    def _flush_csv(self) -> None:
+        if self._csv_writer is None:
+            self._open_csv()
+        for name in self._list_columns:
+            self._batch[name] = [";".join(map(str, value)) if value else value for value in self._batch[name]]
+        self._csv_writer.writerows(zip(*(self._batch[name] for name in self.columns)))
+
+    def _flush_parquet(self) -> None:
+        import pyarrow as pa
+
+        if self._parquet_writer is None:
+            self._open_parquet()
+        self._parquet_writer.write_table(pa.table(self._batch, schema=self._parquet_writer.schema))
+
+    def _open_csv(self) -> None:
+        self._file = open(self.path, "w", encoding="utf-8", newline="")
+        self._csv_writer = csv.writer(self._file)
+        self._csv_writer.writerow(self.columns)
+
+    def _open_parquet(self) -> None:
+        import pyarrow.parquet as pq
+
+        self._parquet_writer = pq.ParquetWriter(self.path, arrow_schema(self.extra_columns))
+
+    def close(self) -> None:
+        """Write the remaining rows and close the file; an export without rows still gets its header/schema."""
+        self.flush()
+        if self.format == "csv":
+            if self._csv_writer is None:
+                self._open_csv()
+            self._file.close()
+        else:
+            if self._parquet_writer is None:
+                self._open_parquet()
+            self._parquet_writer.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def export_invoices(
+    contents: Iterable[dict], path: Union[str, Path], format: str | None = None, batch_rows: int = DEFAULT_BATCH_ROWS
+) -> int:
+    """Export invoice contents to CSV or Parquet (format from the file suffix by default) and return the row count."""
+    with InvoiceTableWriter(path, format=format, batch_rows=batch_rows) as writer:
+        writer.write_many(contents)
+    return writer.rows_written
+
+
+def export_batch_results(
+    jsonl_path: Union[str, Path], path: Union[str, Path], format: str | None = None, batch_rows: int = DEFAULT_BATCH_ROWS
+) -> int:
+    """
+    Export the successful records of a `run_batch` JSONL file, with a leading `source` column.
+
+    The file is read line by line, so the export never holds more than one batch in memory.
+    """
+    with InvoiceTableWriter(path, format=format, batch_rows=batch_rows, extra_columns=("source",)) as writer:
+        with open(jsonl_path, encoding="utf-8") as records:
+            for line in records:
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                if record.get("status") == "ok":
+                    writer.write(record["content"], source=record.get("source"))
+    return writer.rows_written
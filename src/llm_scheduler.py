@@ -0,0 +1,358 @@
+import asyncio
+import os
+import random
+import re
+import threading
+import time
+from collections import deque
+
+from src.models import MODEL_CONFIGS, load_llm_models
+from src.telemetry import record_output_rate, span
+from src.utils import count_tokens, prompt_cache_tokens
+
+WINDOW_SECONDS = 60.0
+
+
+def deployment_setting(model: str, key: str):
+    """
+    The `tpm`, `rpm` or `fallbacks` of a deployment, None when it has none.
+
+    Read from `LLM_<KEY>_<MODEL>` in the environment, with the model ID upper-cased and other
+    characters replaced by `_` (`LLM_TPM_AZURE_GPT_4_1=150000`, `LLM_FALLBACKS_AZURE_GPT_4_1=azure-gpt-4o`),
+    or else from the model's `MODEL_CONFIGS` entry.
+    """
+    value = os.getenv(f"LLM_{key.upper()}_{re.sub(r'[^A-Z0-9]', '_', model.upper())}")
+    if value is None:
+        return MODEL_CONFIGS.get(model, {}).get(key)
+    if key == "fallbacks":
+        return [name for name in value.split(",") if name]
+    return int(value)
+
+
+def is_rate_limit_error(exc: Exception) -> bool:
+    """Whether `exc` is a provider's throttling error (HTTP 429 / resource exhausted)."""
+    response = getattr(exc, "response", None)
+    status_code = getattr(exc, "status_code", None) or getattr(response, "status_code", None) or getattr(exc, "code", None)
+    return status_code == 429 or type(exc).__name__ in ("RateLimitError", "ResourceExhausted", "TooManyRequests")
+
+
+def retry_after_seconds(exc: Exception) -> float | None:
+    """The `Retry-After` delay attached to a throttling error, if the provider sent one."""
+    headers = getattr(getattr(exc, "response", None), "headers", None)
+    if not headers:
+        return None
+    for header, scale in (("retry-after-ms", 1000), ("retry-after", 1)):
+        value = headers.get(header)
+        if value:
+            try:
+                return max(0.0, float(value) / scale)
+            except ValueError:
+                continue
+    return None
+
+
+class DeploymentBudget:
+    """
+    Rolling one-minute token and request budget of a single deployment.
+
+    Reservations are made with the estimated token count before a request is sent and corrected
+    with the reported usage afterwards. `throttle` blocks the deployment after a 429.
+    """
+
+    def __init__(self, model: str, tpm: int | None = None, rpm: int | None = None):
+        self.model = model
+        self.tpm = tpm
+        self.rpm = rpm
+        self._lock = threading.Lock()
+        # [timestamp, tokens] per request; lists so the token count can be corrected after the call
+        self._window: deque[list] = deque()
+        self._throttled_until = 0.0
+        self.waiting = 0
+        self._stats = {"requests": 0, "throttled": 0, "spillovers": 0, "waits": 0, "total_wait_seconds": 0.0, "max_wait_seconds": 0.0}
+
+    def _prune(self, now: float) -> None:
+        while self._window and now - self._window[0][0] >= WINDOW_SECONDS:
+            self._window.popleft()
+
+    def _wait_seconds(self, tokens: int, now: float) -> float:
+        if now < self._throttled_until:
+            return self._throttled_until - now
+        wait = 0.0
+        if self.rpm and len(self._window) >= self.rpm:
+            wait = max(wait, self._window[-self.rpm][0] + WINDOW_SECONDS - now)
+        if self.tpm:
+            used = sum(entry[1] for entry in self._window)
+            # A request larger than the whole budget is let through once the window is empty
+            excess = used + min(tokens, self.tpm) - self.tpm
+            for timestamp, entry_tokens in self._window:
+                if excess <= 0:
+                    break
+                excess -= entry_tokens
+                wait = max(wait, timestamp + WINDOW_SECONDS - now)
+        return wait
+
+    def try_reserve(self, tokens: int) -> tuple[float, list | None]:
+        """Reserve `tokens` now if the budget allows; otherwise return the seconds until it might."""
+        with self._lock:
+            now = time.monotonic()
+            self._prune(now)
+            wait = self._wait_seconds(tokens, now)
+            if wait > 0:
+                return wait, None
+            entry = [now, tokens]
+            self._window.append(entry)
+            self._stats["requests"] += 1
+            return 0.0, entry
+
+    def settle(self, entry: list, tokens: int) -> None:
+        """Replace a reservation's estimate with the tokens actually used."""
+        with self._lock:
+            entry[1] = tokens
+
+    def throttle(self, seconds: float) -> None:
+        with self._lock:
+            self._throttled_until = max(self._throttled_until, time.monotonic() + seconds)
+            self._stats["throttled"] += 1
+
+    def record_wait(self, seconds: float, spilled_over: bool) -> None:
+        with self._lock:
+            if seconds > 0:
+                self._stats["waits"] += 1
+                self._stats["total_wait_seconds"] += seconds
+                self._stats["max_wait_seconds"] = max(self._stats["max_wait_seconds"], seconds)
+            if spilled_over:
+                self._stats["spillovers"] += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            now = time.monotonic()
+            self._prune(now)
+            stats = dict(self._stats)
+            stats["total_wait_seconds"] = round(stats["total_wait_seconds"], 3)
+            stats["max_wait_seconds"] = round(stats["max_wait_seconds"], 3)
+            stats["avg_wait_seconds"] = round(stats["total_wait_seconds"] / stats["waits"], 3) if stats["waits"] else 0.0
+            return {
+                "queue_depth": self.waiting,
+                "tokens_last_minute": sum(entry[1] for entry in self._window),
+                "requests_last_minute": len(self._window),
+                "tpm": self.tpm,
+                "rpm": self.rpm,
+                **stats,
+            }
+
+
+class LlmScheduler:
+    """
+    Route LLM calls through per-deployment TPM/RPM budgets with backoff and spillover.
+
+    Before a call, the prompt is counted locally and the expected output added, and the request is
+    sent to the requested deployment if its rolling budget allows. Otherwise it spills over to the
+    first of the deployment's configured `fallbacks` with room, or waits for the earliest one to free
+    up. A 429 blocks the deployment for the `Retry-After` delay plus jittered exponential backoff
+    and the call is retried, possibly on a fallback. Models are loaded with the provider SDK's own
+    retries disabled, so every 429 reaches the scheduler.
+
+    Budgets and fallbacks come from `deployment_setting`; deployments without them are unlimited
+    and never spill over. Thread-safe.
+    """
+
+    def __init__(
+        self,
+        max_wait_seconds: float = 300.0,
+        max_retries: int = 4,
+        backoff_base: float = 1.0,
+        backoff_max: float = 30.0,
+        output_tokens_estimate: int = 2000,
+    ):
+        self.max_wait_seconds = max_wait_seconds
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.output_tokens_estimate = output_tokens_estimate
+        self._budgets: dict[str, DeploymentBudget] = {}
+        self._lock = threading.Lock()
+
+    def budget(self, model: str) -> DeploymentBudget:
+        with self._lock:
+            budget = self._budgets.get(model)
+            if budget is None:
+                tpm, rpm = deployment_setting(model, "tpm"), deployment_setting(model, "rpm")
+                budget = self._budgets[model] = DeploymentBudget(model, tpm=tpm, rpm=rpm)
+            return budget
+
+    def candidates(self, model: str) -> list[str]:
+        """The requested deployment followed by its configured fallbacks."""
+        return [model, *(deployment_setting(model, "fallbacks") or [])]
+
+    def estimate_tokens(self, model: str, prompt_text: str, max_tokens: int | None = None) -> int:
+        """
+        Tokens to reserve for a call: the prompt plus the expected output.
+
+        A per-call `max_tokens` is sized for the output expected from this prompt (see the token
+        budget), so it is reserved in full; otherwise `output_tokens_estimate` is reserved, capped
+        by the deployment's configured `max_tokens`.
+        """
+        if max_tokens:
+            output_tokens = max_tokens
+        else:
+            configured = MODEL_CONFIGS.get(model, {}).get("max_tokens")
+            output_tokens = min(self.output_tokens_estimate, configured) if configured else self.output_tokens_estimate
+        return count_tokens(prompt_text) + output_tokens
+
+    def _try_reserve(self, model: str, tokens: int) -> tuple[str | None, list | None, float]:
+        """Reserve on the first candidate with room, or return the shortest wait among them."""
+        shortest_wait = float("inf")
+        for candidate in self.candidates(model):
+            wait, entry = self.budget(candidate).try_reserve(tokens)
+            if entry is not None:
+                return candidate, entry, 0.0
+            shortest_wait = min(shortest_wait, wait)
+        return None, None, shortest_wait
+
+    def _acquire(self, model: str, tokens: int) -> tuple[str, list, float]:
+        requested = self.budget(model)
+        started = time.monotonic()
+        deadline = started + self.max_wait_seconds
+        waiting = False
+        try:
+            while True:
+                deployment, entry, wait = self._try_reserve(model, tokens)
+                if entry is not None:
+                    waited = time.monotonic() - started if waiting else 0.0
+                    requested.record_wait(waited, spilled_over=deployment != model)
+                    return deployment, entry, waited
+
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise TimeoutError(f"No capacity for {model} or its fallbacks after {self.max_wait_seconds}s")
+                if not waiting:
+                    waiting = True
+                    requested.waiting += 1
+                time.sleep(min(wait, remaining, 1.0))
+        finally:
+            if waiting:
+                requested.waiting -= 1
+
+    async def _aacquire(self, model: str, tokens: int) -> tuple[str, list, float]:
+        requested = self.budget(model)
+        started = time.monotonic()
+        deadline = started + self.max_wait_seconds
+        waiting = False
+        try:
+            while True:
+                deployment, entry, wait = self._try_reserve(model, tokens)
+                if entry is not None:
+                    waited = time.monotonic() - started if waiting else 0.0
+                    requested.record_wait(waited, spilled_over=deployment != model)
+                    return deployment, entry, waited
+
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise TimeoutError(f"No capacity for {model} or its fallbacks after {self.max_wait_seconds}s")
+                if not waiting:
+                    waiting = True
+                    requested.waiting += 1
+                await asyncio.sleep(min(wait, remaining, 1.0))
+        finally:
+            if waiting:
+                requested.waiting -= 1
+
+    def _backoff(self, attempt: int, retry_after: float | None) -> float:
+        return (retry_after or 0.0) + random.uniform(0, min(self.backoff_max, self.backoff_base * 2**attempt))
+
+    def _handle_error(self, budget: DeploymentBudget, entry: list, exc: Exception, attempt: int) -> None:
+        """Re-raise `exc` unless it is a retryable 429, in which case the deployment is blocked for a while."""
+        budget.settle(entry, 0)
+        if not is_rate_limit_error(exc) or attempt == self.max_retries:
+            raise exc
+        budget.throttle(self._backoff(attempt, retry_after_seconds(exc)))
+
+    @staticmethod
+    def _settle_usage(budget: DeploymentBudget, entry: list, response) -> None:
+        usage = response.usage_metadata or {}
+        if usage.get("total_tokens"):
+            budget.settle(entry, usage["total_tokens"])
+
+    def invoke(self, prompt_template, inputs: dict, model: str, max_tokens: int | None = None):
+        """
+        Run `prompt_template | llm` on `inputs` within the deployment budgets.
+
+        `max_tokens` overrides the deployment's configured output limit for this call.
+
+        Returns:
+            The model response, the deployment that served it and the seconds spent waiting for capacity.
+        """
+        # Rendered once and reused across retries and fallback deployments
+        with span("prompt_render"):
+            messages = prompt_template.format_messages(**inputs)
+        prompt_text = "".join(str(message.content) for message in messages)
+        call_kwargs = {"max_tokens": max_tokens} if max_tokens else {}
+        total_wait = 0.0
+        for attempt in range(self.max_retries + 1):
+            deployment, entry, waited = self._acquire(model, self.estimate_tokens(model, prompt_text, max_tokens))
+            total_wait += waited
+            budget = self.budget(deployment)
+            try:
+                with span("llm_total", model=deployment) as llm_span:
+                    started = time.perf_counter()
+                    response = load_llm_models(model=deployment, max_retries=0).invoke(messages, **call_kwargs)
+                    record_output_rate(deployment, (response.usage_metadata or {}).get("output_tokens"), time.perf_counter() - started)
+                    llm_span.set(cached_input_tokens=prompt_cache_tokens(response.usage_metadata or {})[0])
+            except Exception as exc:
+                self._handle_error(budget, entry, exc, attempt)
+                continue
+            self._settle_usage(budget, entry, response)
+            return response, deployment, total_wait
+
+    async def ainvoke(self, prompt_template, inputs: dict, model: str, max_tokens: int | None = None):
+        """Async variant of `invoke`."""
+        # Rendered once and reused across retries and fallback deployments
+        with span("prompt_render"):
+            messages = prompt_template.format_messages(**inputs)
+        prompt_text = "".join(str(message.content) for message in messages)
+        call_kwargs = {"max_tokens": max_tokens} if max_tokens else {}
+        total_wait = 0.0
+        for attempt in range(self.max_retries + 1):
+            deployment, entry, waited = await self._aacquire(model, self.estimate_tokens(model, prompt_text, max_tokens))
+            total_wait += waited
+            budget = self.budget(deployment)
+            try:
+                with span("llm_total", model=deployment) as llm_span:
+                    started = time.perf_counter()
+                    response = await load_llm_models(model=deployment, max_retries=0).ainvoke(messages, **call_kwargs)
+                    record_output_rate(deployment, (response.usage_metadata or {}).get("output_tokens"), time.perf_counter() - started)
+                    llm_span.set(cached_input_tokens=prompt_cache_tokens(response.usage_metadata or {})[0])
+            except Exception as exc:
+                self._handle_error(budget, entry, exc, attempt)
+                continue
+            self._settle_usage(budget, entry, response)
+            return response, deployment, total_wait
+
+    def stats(self) -> dict:
+        """Queue depth, wait times, throttling and usage in the last minute per deployment."""
+        with self._lock:
+            budgets = list(self._budgets.values())
+        return {budget.model: budget.stats() for budget in budgets}
+
+
+_scheduler: LlmScheduler | None = None
+_scheduler_lock = threading.Lock()
+
+
+def get_llm_scheduler() -> LlmScheduler | None:
+    """
+    Return the process-wide LLM scheduler when `LLM_SCHEDULER=on`, otherwise None.
+
+    `LLM_SCHEDULER_MAX_WAIT` sets how long a call may wait for capacity and `LLM_SCHEDULER_MAX_RETRIES`
+    how often a throttled call is retried.
+    """
+    global _scheduler
+    if os.getenv("LLM_SCHEDULER", "off").lower() not in ("on", "1", "true"):
+        return None
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = LlmScheduler(
+                max_wait_seconds=float(os.getenv("LLM_SCHEDULER_MAX_WAIT", "300")),
+                max_retries=int(os.getenv("LLM_SCHEDULER_MAX_RETRIES", "4")),
+            )
+        return _scheduler
@@ -1,117 +1,365 @@
-from langchain_openai import AzureChatOpenAI
-from langchain_anthropic import ChatAnthropic
-from langchain_google_genai import ChatGoogleGenerativeAI
+import asyncio
+import os
+import threading
+import weakref
 
 from dotenv import load_dotenv
 
 load_dotenv()
 
 
-def load_llm_models(model: str):
+# Model ID -> provider and constructor arguments. Add new deployments here rather than in code.
+# The optional `tpm`/`rpm` (the deployment's tokens/requests per minute quota) and `fallbacks`
+# (equivalent deployments to spill over to) are read by the LLM scheduler, which also takes them
+# from the environment (see `src.llm_scheduler.deployment_setting`), and `input_cost_per_m`/`output_cost_per_m`
+# (USD per million tokens) by the cost calculation, with `cached_input_cost_per_m`/`cache_write_cost_per_m`
+# for input tokens read from or written to the provider's prompt cache. `context_window`,
+# `max_output_tokens` (the model's limits, which `max_tokens` may set lower) and the optional
+# `output_tokens_per_second` are read by the pre-flight token budget. None of these are passed
+# to the constructor.
+MODEL_CONFIGS: dict[str, dict] = {
+    "azure-gpt-4o": {
+        "provider": "azure_openai",
+        "azure_deployment": "gpt-4o",
+        "azure_endpoint": "https://construct-llm.openai.azure.com/openai/deployments/gpt-4o/chat/completions?api-version=2024-08-01-preview",
+        "api_version": "2024-08-01-preview",
+        "temperature": 0,
+        "max_tokens": 16384,
+        "timeout": 240,
+        "input_cost_per_m": 2.5,
+        "output_cost_per_m": 10.0,
+        "cached_input_cost_per_m": 1.25,
+        "context_window": 128_000,
+        "max_output_tokens": 16_384,
+    },
+    "azure-gpt-4.1-mini": {
+        "provider": "azure_openai",
+        "azure_deployment": "gpt-4.1-mini",
+        "azure_endpoint": "https://chris-m5tp6zj5-eastus2.cognitiveservices.azure.com/",
+        "api_version": "2024-12-01-preview",
+        "temperature": 0,
+        "max_tokens": 16384,
+        "timeout": 240,
+        "input_cost_per_m": 0.4,
+        "output_cost_per_m": 1.6,
+        "cached_input_cost_per_m": 0.1,
+        "context_window": 1_047_576,
+        "max_output_tokens": 32_768,
+    },
+    "azure-gpt-4.1": {
+        "provider": "azure_openai",
+        "azure_deployment": "gpt-4.1-parsetron",
+        "azure_endpoint": "https://parsetron.openai.azure.com/openai/deployments/gpt-4.1-parsetron/chat/completions?api-version=2025-01-01-preview",
+        "api_version": "2024-12-01-preview",
+        "temperature": 0,
+        "timeout": 240,
+        "input_cost_per_m": 2.0,
+        "output_cost_per_m": 8.0,
+        "cached_input_cost_per_m": 0.5,
+        "context_window": 1_047_576,
+        "max_output_tokens": 32_768,
+    },
+    "azure-o4-mini": {
+        "provider": "azure_openai",
+        "azure_deployment": "o4-mini-parsetron",
+        "azure_endpoint": "https://parsetron.openai.azure.com/openai/deployments/o4-mini-parsetron/chat/completions?api-version=2025-01-01-preview",
+        "api_version": "2024-12-01-preview",
+        "temperature": 1,
+        "timeout": 240,
+        "input_cost_per_m": 1.1,
+        "output_cost_per_m": 4.4,
+        "cached_input_cost_per_m": 0.275,
+        "context_window": 200_000,
+        "max_output_tokens": 100_000,
+    },
+    "azure-o3": {
+        "provider": "azure_openai",
+        "azure_deployment": "o3-parsetron",
+        "azure_endpoint": "https://parsetron.openai.azure.com/openai/deployments/o3-parsetron/chat/completions?api-version=2025-01-01-preview",
+        "api_version": "2024-12-01-preview",
+        "temperature": 1,
+        "timeout": 240,
+        "input_cost_per_m": 2.0,
+        "output_cost_per_m": 8.0,
+        "cached_input_cost_per_m": 0.5,
+        "context_window": 200_000,
+        "max_output_tokens": 100_000,
+    },
+    "azure-gpt-5": {
+        "provider": "azure_openai",
+        "azure_deployment": "gpt-5-parsetron",
+        "azure_endpoint": "https://parsetron.openai.azure.com/openai/deployments/gpt-5-parsetron/chat/completions?api-version=2025-01-01-preview",
+        "api_version": "2024-12-01-preview",
+        "temperature": 1,
+        "timeout": 240,
+        "input_cost_per_m": 1.25,
+        "output_cost_per_m": 10.0,
+        "cached_input_cost_per_m": 0.125,
+        "context_window": 400_000,
+        "max_output_tokens": 128_000,
+    },
+    "claude-3-5-sonnet": {
+        "provider": "anthropic",
+        "model": "claude-3-5-sonnet-latest",
+        "temperature": 0,
+        "max_tokens": 8192,
+        "timeout": 240,
+        "input_cost_per_m": 3.0,
+        "output_cost_per_m": 15.0,
+        "cached_input_cost_per_m": 0.3,
+        "cache_write_cost_per_m": 3.75,
+        "context_window": 200_000,
+        "max_output_tokens": 8_192,
+    },
+    "claude-3-7-sonnet": {
+        "provider": "anthropic",
+        "model": "claude-3-7-sonnet-latest",
+        "temperature": 0,
+        "max_tokens": 64000,
+        "timeout": 240,
+        "input_cost_per_m": 3.0,
+        "output_cost_per_m": 15.0,
+        "cached_input_cost_per_m": 0.3,
+        "cache_write_cost_per_m": 3.75,
+        "context_window": 200_000,
+        "max_output_tokens": 64_000,
+    },
+    "gemini-2.0-flash": {
+        "provider": "google_genai",
+        "model": "gemini-2.0-flash",
+        "temperature": 0,
+        "max_tokens": 32000,
+        "timeout": 240,
+        "input_cost_per_m": 0.1,
+        "output_cost_per_m": 0.4,
+        "cached_input_cost_per_m": 0.025,
+        "context_window": 1_048_576,
+        "max_output_tokens": 8_192,
+    },
+    "gemini-2.5-flash": {
+        "provider": "google_genai",
+        "model": "gemini-2.5-flash",
+        "temperature": 0,
+        "max_tokens": 65000,
+        "timeout": 240,
+        "input_cost_per_m": 0.3,
+        "output_cost_per_m": 2.5,
+        "cached_input_cost_per_m": 0.03,
+        "context_window": 1_048_576,
+        "max_output_tokens": 65_536,
+    },
+    "gemini-2.5-pro": {
+        "provider": "google_genai",
+        "model": "gemini-2.5-pro",
+        "temperature": 0,
+        "max_tokens": 65000,
+        "timeout": 300,
+        "input_cost_per_m": 1.25,
+        "output_cost_per_m": 10.0,
+        "cached_input_cost_per_m": 0.125,
+        "context_window": 1_048_576,
+        "max_output_tokens": 65_536,
+    },
+}
+
+
+# MODEL_CONFIGS keys that describe the deployment rather than the chat model constructor
+DEPLOYMENT_KEYS = (
+    "tpm",
+    "rpm",
+    "fallbacks",
+    "input_cost_per_m",
+    "output_cost_per_m",
+    "cached_input_cost_per_m",
+    "cache_write_cost_per_m",
+    "context_window",
+    "max_output_tokens",
+    "output_tokens_per_second",
+)
+
+_http_clients: tuple | None = None
+_llm_registry: dict[tuple[str, int | None], object] = {}
+_registry_lock = threading.RLock()
+
+
+def _loop_bound_async_client(**kwargs):
+    """
+    An `httpx.AsyncClient` that sends each request through a pool of its own per running event loop.
+
+    Async connections belong to the loop that opened them, and a model is shared by every loop of
+    the process (`asyncio.run` calls, the hedging loop, the service), so one plain client would
+    fail, or hang, once used from a second loop.
+    """
+    import httpx
+
+    class LoopBoundAsyncClient(httpx.AsyncClient):
+        def __init__(self, **kwargs):
+            super().__init__(**kwargs)
+            self._client_kwargs = kwargs
+            self._loop_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = (
+                weakref.WeakKeyDictionary()
+            )
+            self._loop_clients_lock = threading.Lock()
+
+        def _loop_client(self) -> httpx.AsyncClient:
+            loop = asyncio.get_running_loop()
+            with self._loop_clients_lock:
+                client = self._loop_clients.get(loop)
+                if client is None:
+                    # Pooled connections keep their loop alive, so pools of finished loops are dropped here
+                    for closed_loop in [other for other in self._loop_clients if other.is_closed()]:
+                        del self._loop_clients[closed_loop]
+                    client = self._loop_clients[loop] = httpx.AsyncClient(**self._client_kwargs)
+                return client
+
+        async def send(self, request, **kwargs):
+            return await self._loop_client().send(request, **kwargs)
+
+        async def aclose(self) -> None:
+            """Close the running loop's pool."""
+            with self._loop_clients_lock:
+                client = self._loop_clients.pop(asyncio.get_running_loop(), None)
+            if client is not None:
+                await client.aclose()
+
+    return LoopBoundAsyncClient(**kwargs)
+
+
+def _get_http_clients() -> tuple:
+    """
+    Return the keep-alive HTTP clients shared by every Azure OpenAI deployment.
+
+    The async client keeps one pool per running event loop (see `_loop_bound_async_client`). Pool
+    sizes can be set with the `LLM_HTTP_MAX_CONNECTIONS` and `LLM_HTTP_MAX_KEEPALIVE` environment
+    variables.
+    """
+    global _http_clients
+    with _registry_lock:
+        if _http_clients is None:
+            import httpx
+
+            limits = httpx.Limits(
+                max_connections=int(os.getenv("LLM_HTTP_MAX_CONNECTIONS", "100")),
+                max_keepalive_connections=int(os.getenv("LLM_HTTP_MAX_KEEPALIVE", "20")),
+            )
+            _http_clients = (httpx.Client(limits=limits), _loop_bound_async_client(limits=limits))
+        return _http_clients
+
+
+# Provider SDKs are imported inside the builders so a process only pays for the ones it uses
+def _build_azure_openai(params: dict):
+    from langchain_openai import AzureChatOpenAI
+
+    http_client, http_async_client = _get_http_clients()
+    # Report token usage on streamed responses as well
+    params = {"stream_usage": True, **params}
+    return AzureChatOpenAI(**params, http_client=http_client, http_async_client=http_async_client)
+
+
+def _build_anthropic(params: dict):
+    from langchain_anthropic import ChatAnthropic
+
+    # ChatAnthropic keeps its own pooled clients for the lifetime of the instance
+    return ChatAnthropic(**params)
+
+
+def _build_google_genai(params: dict):
+    from langchain_google_genai import ChatGoogleGenerativeAI
+
+    return ChatGoogleGenerativeAI(**params)
+
+
+PROVIDER_BUILDERS = {
+    "azure_openai": _build_azure_openai,
+    "anthropic": _build_anthropic,
+    "google_genai": _build_google_genai,
+}
+
+
+def use_cache_breakpoints(model: str) -> bool:
+    """
+    Whether prompts for `model` should carry explicit prompt cache breakpoints.
+
+    Anthropic only caches prompt prefixes marked with `cache_control`, and a cache write costs
+    more than a plain input token, so breakpoints are opt-in with `LLM_PROMPT_CACHING=on`. Azure
+    OpenAI and Gemini cache long shared prefixes automatically and need no markers.
+    """
+    if os.getenv("LLM_PROMPT_CACHING", "off").lower() not in ("on", "1", "true"):
+        return False
+    return MODEL_CONFIGS.get(model, {}).get("provider") == "anthropic"
+
+
+def register_provider(provider: str, builder) -> None:
+    """
+    Add or replace a provider.
+
+    Args:
+        provider: The name models refer to in their `provider` key.
+        builder: Callable building the chat model from a model's constructor arguments (a dict).
+    """
+    with _registry_lock:
+        PROVIDER_BUILDERS[provider] = builder
+
+
+def register_model(model: str, provider: str, **params) -> None:
+    """
+    Add or replace a model configuration.
+
+    Args:
+        model: The ID the model is loaded by.
+        provider: One of the keys of `PROVIDER_BUILDERS`.
+        params: Constructor arguments for the provider's chat model.
+    """
+    if provider not in PROVIDER_BUILDERS:
+        raise ValueError(f"Unknown provider: {provider}")
+
+    with _registry_lock:
+        MODEL_CONFIGS[model] = {"provider": provider, **params}
+        for key in [key for key in _llm_registry if key[0] == model]:
+            del _llm_registry[key]
+
+
+def load_llm_models(model: str, max_retries: int | None = None):
     """
     Load an LLM model based on the provided model ID.
 
+    Each model is built once per process and shared by all callers, so its HTTP connection pool
+    survives between calls. Safe to call from multiple threads.
+
     Args:
         model: The ID of the model to load.
+        max_retries: Overrides the provider SDK's own retry count, e.g. 0 for callers that retry
+            throttled requests themselves. Each value gets its own instance.
 
     Returns:
         The loaded LLM model.
     """
+    key = (model, max_retries)
+    llm = _llm_registry.get(key)
+    if llm is not None:
+        return llm
+
+    with _registry_lock:
+        llm = _llm_registry.get(key)
+        if llm is None:
+            if model not in MODEL_CONFIGS:
+                raise ValueError(f"Unknown model: {model}")
+            params = {key: value for key, value in MODEL_CONFIGS[model].items() if key not in DEPLOYMENT_KEYS}
+            provider = params.pop("provider")
+            if max_retries is not None:
+                params["max_retries"] = max_retries
+            llm = PROVIDER_BUILDERS[provider](params)
+            _llm_registry[key] = llm
+        return llm
+
+
+def warm_up_models(models: list[str]) -> None:
+    """Build the given models ahead of the first request."""
+    for model in models:
+        load_llm_models(model)
+
 
-    if model == "azure-gpt-4o":
-        llm = AzureChatOpenAI(
-            azure_deployment="gpt-4o",
-            azure_endpoint="https://construct-llm.openai.azure.com/openai/deployments/gpt-4o/chat/completions?api-version=2024-08-01-preview",
-            api_version="2024-08-01-preview",
-            temperature=0,
-            max_tokens=16384,
-            timeout=240,
-        )
-
-    elif model == "azure-gpt-4.1-mini":
-        llm = AzureChatOpenAI(
-            azure_deployment="gpt-4.1-mini",
-            azure_endpoint="https://chris-m5tp6zj5-eastus2.cognitiveservices.azure.com/",
-            api_version="2024-12-01-preview",
-            temperature=0,
-            max_tokens=16384,
-            timeout=240,
-        )
-
-    elif model == "azure-gpt-4.1":
-        llm = AzureChatOpenAI(
-            azure_deployment="gpt-4.1-parsetron",
-            azure_endpoint="https://parsetron.openai.azure.com/openai/deployments/gpt-4.1-parsetron/chat/completions?api-version=2025-01-01-preview",
-            api_version="2024-12-01-preview",
-            temperature=0,
-            timeout=240,
-        )
-
-    elif model == "azure-o4-mini":
-        llm = AzureChatOpenAI(
-            azure_deployment="o4-mini-parsetron",
-            azure_endpoint="https://parsetron.openai.azure.com/openai/deployments/o4-mini-parsetron/chat/completions?api-version=2025-01-01-preview",
-            api_version="2024-12-01-preview",
-            temperature=1,
-            timeout=240,
-        )
-
-    elif model == "azure-o3":
-        llm = AzureChatOpenAI(
-            azure_deployment="o3-parsetron",
-            azure_endpoint="https://parsetron.openai.azure.com/openai/deployments/o3-parsetron/chat/completions?api-version=2025-01-01-preview",
-            api_version="2024-12-01-preview",
-            temperature=1,
-            timeout=240,
-        )
-
-    elif model == "azure-gpt-5":
-        llm = AzureChatOpenAI(
-            azure_deployment="gpt-5-parsetron",
-            azure_endpoint="https://parsetron.openai.azure.com/openai/deployments/gpt-5-parsetron/chat/completions?api-version=2025-01-01-preview",
-            api_version="2024-12-01-preview",
-            temperature=1,
-            timeout=240,
-        )
-
-    elif model == "claude-3-5-sonnet":
-        llm = ChatAnthropic(
-            model="claude-3-5-sonnet-latest",
-            temperature=0,
-            max_tokens=8192,
-            timeout=240,
-        )
-
-    elif model == "claude-3-7-sonnet":
-        llm = ChatAnthropic(
-            model="claude-3-7-sonnet-latest",
-            temperature=0,
-            max_tokens=64000,
-            timeout=240,
-        )
-
-    elif model == "gemini-2.0-flash":
-        llm = ChatGoogleGenerativeAI(
-            model="gemini-2.0-flash",
-            temperature=0,
-            max_tokens=32000,
-            timeout=240,
-        )
-
-    elif model == "gemini-2.5-flash":
-        llm = ChatGoogleGenerativeAI(
-            model="gemini-2.5-flash",
-            temperature=0,
-            max_tokens=65000,
-            timeout=240,
-        )
-
-    elif model == "gemini-2.5-pro":
-        llm = ChatGoogleGenerativeAI(
-            model="gemini-2.5-pro",
-            temperature=0,
-            max_tokens=65000,
-            timeout=300,
-        )
-
-    return llm
+def clear_model_registry() -> None:
+    """Drop every cached model so the next call rebuilds it from `MODEL_CONFIGS`."""
+    with _registry_lock:
+        _llm_registry.clear()
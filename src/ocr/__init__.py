@@ -1,3 +1,17 @@
-from .azure_doc_parser import parse_invoice_prebuilt, parse_pdf_azure
+from .async_doc_parser import AsyncOcrScheduler, TokenBucket, aparse_invoice_prebuilt, aparse_pdf_azure, close_ocr_scheduler, get_ocr_scheduler
+from .azure_doc_parser import parse_invoice_prebuilt, parse_pdf_azure, split_doc_pages
+from .ocr_cache import OcrCache, get_ocr_cache
 
-__all__ = ["parse_invoice_prebuilt", "parse_pdf_azure"]
+__all__ = [
+    "AsyncOcrScheduler",
+    "OcrCache",
+    "TokenBucket",
+    "aparse_invoice_prebuilt",
+    "aparse_pdf_azure",
+    "close_ocr_scheduler",
+    "get_ocr_cache",
+    "get_ocr_scheduler",
+    "parse_invoice_prebuilt",
+    "parse_pdf_azure",
+    "split_doc_pages",
+]
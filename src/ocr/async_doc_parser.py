@@ -0,0 +1,300 @@
+import asyncio
+import os
+import random
+import time
+import weakref
+
+from src.ocr.azure_doc_parser import analyze_request_body, load_document, make_doc_slug, prebuilt_invoice_output, split_doc_pages
+from src.ocr.ocr_cache import OcrCache, get_ocr_cache
+from src.telemetry import span
+from src.utils import DocumentSource
+
+
+def _retry_after_seconds(headers) -> float | None:
+    """Seconds requested by a `Retry-After`/`retry-after-ms` header, if any."""
+    if not headers:
+        return None
+    retry_after = headers.get("Retry-After") or headers.get("retry-after")
+    if retry_after:
+        try:
+            return max(0.0, float(retry_after))
+        except ValueError:
+            return None
+    retry_after_ms = headers.get("retry-after-ms") or headers.get("x-ms-retry-after-ms")
+    if retry_after_ms:
+        try:
+            return max(0.0, float(retry_after_ms) / 1000)
+        except ValueError:
+            return None
+    return None
+
+
+class TokenBucket:
+    """
+    Async token bucket limiting requests to `rate` per second with bursts of up to `capacity`.
+
+    Waiters are served in arrival order. `pause` stops handing out tokens until the given delay has
+    passed, so one throttled response slows down every caller instead of only the one that saw it.
+    """
+
+    def __init__(self, rate: float, capacity: float | None = None):
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.rate = rate
+        self.capacity = capacity or rate
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self) -> None:
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self._paused_until:
+                    await asyncio.sleep(self._paused_until - now)
+                    continue
+                self._refill(now)
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+    def pause(self, seconds: float) -> None:
+        now = time.monotonic()
+        self._paused_until = max(self._paused_until, now + seconds)
+        # Drop the burst allowance so requests resume at the steady rate
+        self._tokens = 0.0
+        self._updated = max(self._updated, self._paused_until)
+
+
+def _rate_limit_policy(scheduler: "AsyncOcrScheduler"):
+    from azure.core.pipeline.policies import AsyncHTTPPolicy
+
+    class RateLimitPolicy(AsyncHTTPPolicy):
+        """
+        Take a token before every HTTP attempt and pause its bucket on 429.
+
+        Submissions (POSTs, including their retries) and result polls (GETs) are limited separately,
+        like the service does, so polling many in-flight documents does not hold back new submissions.
+        """
+
+        async def send(self, request):
+            bucket = scheduler.bucket if request.http_request.method == "POST" else scheduler.poll_bucket
+            if bucket:
+                await bucket.acquire()
+            scheduler._stats["requests"] += 1
+            response = await self.next.send(request)
+            if response.http_response.status_code == 429:
+                scheduler._stats["throttled"] += 1
+                if bucket:
+                    bucket.pause(_retry_after_seconds(response.http_response.headers) or 1.0)
+            return response
+
+    return RateLimitPolicy()
+
+
+class AsyncOcrScheduler:
+    """
+    Submit documents to Azure Document Intelligence from asyncio without tripping its rate limits.
+
+    A single async `DocumentIntelligenceClient` is shared by every call, so connections are reused.
+    Every HTTP attempt takes a token from a bucket sized to the resource's transactions-per-second
+    limit, one for analyze submissions (`tps`) and one for result polls (`poll_tps`); a 429 pauses
+    the bucket for the `Retry-After` delay. Throttled submissions are retried with
+    jittered exponential backoff (the SDK's own retry policy does not retry POSTs on 429), and polling
+    for results uses `polling_interval` unless the service asks for a different delay.
+
+    The client is bound to the event loop that first uses it; use `get_ocr_scheduler` to get one
+    scheduler per loop.
+    """
+
+    def __init__(
+        self,
+        endpoint: str | None = None,
+        key: str | None = None,
+        tps: float | None = None,
+        poll_tps: float | None = None,
+        max_concurrency: int | None = None,
+        polling_interval: float | None = None,
+        max_retries: int = 6,
+        backoff_base: float = 1.0,
+        backoff_max: float = 60.0,
+    ):
+        self.endpoint = endpoint or os.getenv("AZURE_DOCUMENT_INTELLIGENCE_ENDPOINT")
+        self.key = key or os.getenv("AZURE_DOCUMENT_INTELLIGENCE_KEY")
+        tps = tps if tps is not None else float(os.getenv("AZURE_DOCUMENT_INTELLIGENCE_TPS", "15"))
+        # No burst allowance: the service counts requests over a sliding window, so spread them evenly
+        self.bucket = TokenBucket(tps, capacity=1) if tps > 0 else None
+        poll_tps = poll_tps if poll_tps is not None else float(os.getenv("AZURE_DOCUMENT_INTELLIGENCE_POLL_TPS", "50"))
+        self.poll_bucket = TokenBucket(poll_tps, capacity=1) if poll_tps > 0 else None
+        max_concurrency = max_concurrency or int(os.getenv("AZURE_DOCUMENT_INTELLIGENCE_MAX_CONCURRENCY", "200"))
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self.polling_interval = (
+            polling_interval
+            if polling_interval is not None
+            else float(os.getenv("AZURE_DOCUMENT_INTELLIGENCE_POLLING_INTERVAL", "1.0"))
+        )
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._client = None
+        self._stats = {"submitted": 0, "completed": 0, "failed": 0, "retries": 0, "requests": 0, "throttled": 0, "in_flight": 0}
+
+    def _get_client(self):
+        if self._client is None:
+            # Azure SDKs are imported on first use to keep module import cheap
+            from azure.core.credentials import AzureKeyCredential
+            from azure.ai.documentintelligence.aio import DocumentIntelligenceClient
+
+            self._client = DocumentIntelligenceClient(
+                endpoint=self.endpoint,
+                credential=AzureKeyCredential(self.key),
+                per_retry_policies=[_rate_limit_policy(self)],
+                polling_interval=self.polling_interval,
+            )
+        return self._client
+
+    def _backoff(self, attempt: int, retry_after: float | None) -> float:
+        # Full jitter on top of whatever the service asked for, so throttled callers do not resubmit in lockstep
+        backoff = random.uniform(0, min(self.backoff_max, self.backoff_base * 2**attempt))
+        return (retry_after or 0.0) + backoff
+
+    async def analyze(self, model_id: str, pdf_bytes: bytes | bytearray | memoryview | None = None, url: str | None = None, **kwargs):
+        """
+        Analyze a document with `model_id` and return the SDK's `AnalyzeResult`.
+
+        Args:
+            model_id: Document Intelligence model, e.g. `prebuilt-layout` or `prebuilt-invoice`.
+            pdf_bytes: Document content.
+            url: Publicly reachable document URL, used when `pdf_bytes` is not given.
+            **kwargs: Passed to `begin_analyze_document`; markdown output is requested by default.
+        """
+        from azure.ai.documentintelligence.models import AnalyzeDocumentRequest
+        from azure.core.exceptions import HttpResponseError
+
+        if pdf_bytes is None and not url:
+            raise ValueError("Either pdf_bytes or url is required")
+        request = analyze_request_body(pdf_bytes) if pdf_bytes is not None else AnalyzeDocumentRequest(url_source=url)
+        kwargs.setdefault("output_content_format", "markdown")
+        kwargs.setdefault("polling_interval", self.polling_interval)
+
+        client = self._get_client()
+        async with self._semaphore:
+            self._stats["submitted"] += 1
+            self._stats["in_flight"] += 1
+            try:
+                # Submit time includes rate-limit waits and 429 retries
+                with span("ocr_submit", model=model_id):
+                    for attempt in range(self.max_retries + 1):
+                        try:
+                            poller = await client.begin_analyze_document(model_id, request, **kwargs)
+                            break
+                        except HttpResponseError as exc:
+                            if exc.status_code != 429 or attempt == self.max_retries:
+                                raise
+                            self._stats["retries"] += 1
+                            headers = exc.response.headers if exc.response is not None else None
+                            await asyncio.sleep(self._backoff(attempt, _retry_after_seconds(headers)))
+                with span("ocr_poll", model=model_id):
+                    result = await poller.result()
+            except Exception:
+                self._stats["failed"] += 1
+                raise
+            finally:
+                self._stats["in_flight"] -= 1
+        self._stats["completed"] += 1
+        return result
+
+    def stats(self) -> dict:
+        """Counters for submitted/completed/failed documents, HTTP requests, 429 responses and retries."""
+        return dict(self._stats)
+
+    async def close(self) -> None:
+        if self._client is not None:
+            await self._client.close()
+            self._client = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+
+_schedulers: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, AsyncOcrScheduler]" = weakref.WeakKeyDictionary()
+
+
+def get_ocr_scheduler() -> AsyncOcrScheduler:
+    """Return the scheduler shared by all OCR calls on the running event loop, configured from the environment."""
+    loop = asyncio.get_running_loop()
+    scheduler = _schedulers.get(loop)
+    if scheduler is None:
+        scheduler = _schedulers[loop] = AsyncOcrScheduler()
+    return scheduler
+
+
+async def close_ocr_scheduler() -> None:
+    """Close the running event loop's shared scheduler, if any, releasing its client connections."""
+    scheduler = _schedulers.pop(asyncio.get_running_loop(), None)
+    if scheduler is not None:
+        await scheduler.close()
+
+
+async def aparse_pdf_azure(
+    pdf_url: str = None,
+    pdf_path: str = None,
+    use_cache: bool = True,
+    scheduler: AsyncOcrScheduler | None = None,
+    pdf_bytes: DocumentSource = None,
+    filename: str = None,
+):
+    """
+    Async variant of `parse_pdf_azure`, submitted through an `AsyncOcrScheduler`.
+
+    Returns the same dictionary as `parse_pdf_azure` and shares its OCR cache.
+    """
+    api_model = "prebuilt-layout"
+    mode = "markdown"
+
+    doc_slug = make_doc_slug(pdf_url=pdf_url, pdf_path=filename or pdf_path)
+    if pdf_bytes is not None:
+        doc_slug = doc_slug or "document"
+    if not doc_slug:
+        print("No PDF path or URL provided")
+        return None
+
+    content = await asyncio.to_thread(load_document, pdf_url, pdf_path, pdf_bytes)
+
+    cache = get_ocr_cache() if use_cache else None
+    cache_key = OcrCache.make_key(content, api_model, mode) if cache else None
+    cached = await asyncio.to_thread(cache.get, cache_key) if cache else None
+    if cached:
+        doc_pages = [page | {"source_url": pdf_url} for page in cached["doc_pages"]]
+        return {"doc_slug": doc_slug, "doc_pages": doc_pages, "doc_content": cached["doc_content"], "cache_hit": True}
+
+    scheduler = scheduler or get_ocr_scheduler()
+    result = await scheduler.analyze(api_model, pdf_bytes=content)
+
+    doc_pages = split_doc_pages(result.content, source_url=pdf_url)
+    if cache:
+        await asyncio.to_thread(cache.set, cache_key, result.content, doc_pages)
+
+    return {"doc_slug": doc_slug, "doc_pages": doc_pages, "doc_content": result.content, "cache_hit": False}
+
+
+async def aparse_invoice_prebuilt(
+    file_path: str = None, invoice_url: str = None, scheduler: AsyncOcrScheduler | None = None, pdf_bytes: DocumentSource = None
+) -> dict:
+    """Async variant of `parse_invoice_prebuilt`, submitted through an `AsyncOcrScheduler`."""
+    scheduler = scheduler or get_ocr_scheduler()
+    if pdf_bytes is not None or file_path:
+        content = await asyncio.to_thread(load_document, None, file_path, pdf_bytes)
+        invoices = await scheduler.analyze("prebuilt-invoice", pdf_bytes=content)
+    else:
+        invoices = await scheduler.analyze("prebuilt-invoice", url=invoice_url)
+    return prebuilt_invoice_output(invoices, invoice_url=invoice_url)
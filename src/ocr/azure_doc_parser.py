@@ -1,35 +1,81 @@
-from azure.core.credentials import AzureKeyCredential
-from azure.ai.documentintelligence import DocumentIntelligenceClient
-from azure.ai.documentintelligence.models import AnalyzeDocumentRequest
-from langchain_community.document_loaders import AzureAIDocumentIntelligenceLoader
-
+import base64
 from dotenv import load_dotenv
 import os
+from functools import lru_cache
 from pathlib import Path
 from urllib.parse import urlparse
 from slugify import slugify
 
-from src.utils import download_pdf
+from src.ocr.ocr_cache import OcrCache, get_ocr_cache
+from src.telemetry import span
+from src.utils import DocumentSource, fetch_pdf, read_document
 
 
 load_dotenv()
 
 
-def parse_invoice_prebuilt(file_path: str = None, invoice_url: str = None) -> dict:
+@lru_cache(maxsize=1)
+def _get_document_intelligence_client():
+    # Azure SDKs are imported on first use to keep module import cheap
+    from azure.core.credentials import AzureKeyCredential
+    from azure.ai.documentintelligence import DocumentIntelligenceClient
+
     endpoint = os.getenv("AZURE_DOCUMENT_INTELLIGENCE_ENDPOINT")
     key = os.getenv("AZURE_DOCUMENT_INTELLIGENCE_KEY")
 
-    document_intelligence_client = DocumentIntelligenceClient(endpoint=endpoint, credential=AzureKeyCredential(key))
+    # Shared across calls so the connection pool is reused
+    return DocumentIntelligenceClient(endpoint=endpoint, credential=AzureKeyCredential(key))
+
+
+def analyze_request_body(content: bytes | bytearray | memoryview) -> bytes:
+    """
+    JSON body of an analyze request sending `content` as `base64Source`, serialized in one pass.
+
+    Equivalent to `AnalyzeDocumentRequest(bytes_source=content)`, whose serializer builds the base64
+    text, the JSON string and then its UTF-8 encoding, each as large as the document or larger.
+    """
+    return b'{"base64Source": "' + base64.b64encode(content) + b'"}'
 
-    # invoice_url = "https://raw.githubusercontent.com/Azure-Samples/cognitive-services-REST-api-samples/master/curl/form-recognizer/invoice_sample.jpg"
-    file_bytes = Path(file_path).read_bytes()
 
-    if file_path:
-        poller = document_intelligence_client.begin_analyze_document("prebuilt-invoice", AnalyzeDocumentRequest(bytes_source=file_bytes))
+def load_document(pdf_url: str = None, pdf_path: str = None, pdf_bytes: DocumentSource = None) -> bytes | bytearray | memoryview:
+    """The document's bytes from whichever source is given: in-memory content, then a local path, then a URL."""
+    if pdf_bytes is not None:
+        return read_document(pdf_bytes)
+    if pdf_path:
+        return Path(pdf_path).read_bytes()
+    print(f"Downloading PDF from URL: {pdf_url}")
+    return fetch_pdf(pdf_url)
+
+
+def parse_invoice_prebuilt(file_path: str = None, invoice_url: str = None, pdf_bytes: DocumentSource = None) -> dict:
+    """
+    Parse an invoice with Azure's prebuilt-invoice model.
+
+    Besides the extracted fields, the output holds the per-field confidences under `field_confidence`
+    and the document markdown under `doc_content`/`doc_pages`, in the same shape as `parse_pdf_azure`.
+    A URL without a file or bytes is passed to Azure as-is instead of being downloaded.
+    """
+    from azure.ai.documentintelligence.models import AnalyzeDocumentRequest
+
+    document_intelligence_client = _get_document_intelligence_client()
+
+    if pdf_bytes is not None or file_path:
+        request = analyze_request_body(load_document(pdf_path=file_path, pdf_bytes=pdf_bytes))
     elif invoice_url:
-        poller = document_intelligence_client.begin_analyze_document("prebuilt-invoice", AnalyzeDocumentRequest(url_source=invoice_url))
-    invoices = poller.result()
+        request = AnalyzeDocumentRequest(url_source=invoice_url)
+    else:
+        raise ValueError("Either file_path, invoice_url or pdf_bytes is required")
+
+    with span("ocr_submit", model="prebuilt-invoice"):
+        poller = document_intelligence_client.begin_analyze_document("prebuilt-invoice", request, output_content_format="markdown")
+    with span("ocr_poll", model="prebuilt-invoice"):
+        invoices = poller.result()
 
+    return prebuilt_invoice_output(invoices, invoice_url=invoice_url)
+
+
+def prebuilt_invoice_output(invoices, invoice_url: str = None) -> dict:
+    """Flatten a prebuilt-invoice `AnalyzeResult` into the dictionary returned by `parse_invoice_prebuilt`."""
     for idx, invoice in enumerate(invoices.documents):
         field = invoice.fields
         output = {
@@ -71,83 +117,117 @@ def parse_invoice_prebuilt(file_path: str = None, invoice_url: str = None) -> di
                     "description": item["valueObject"]["Description"]["valueString"] if item["valueObject"].get("Description") else None,
                     "quantity": item["valueObject"]["Quantity"]["valueNumber"] if item["valueObject"].get("Quantity") else None,
                     "date": item["valueObject"]["Date"]["valueDate"] if item["valueObject"].get("Date") else None,
+                    "unit_price": item["valueObject"]["UnitPrice"]["valueCurrency"]["amount"] if item["valueObject"].get("UnitPrice") else None,
+                    "tax": item["valueObject"]["Tax"]["valueCurrency"]["amount"] if item["valueObject"].get("Tax") else None,
+                    "confidence": item.get("confidence"),
                 }
-                for item in field["Items"]["valueArray"]
+                for item in ((field["Items"].get("valueArray") or []) if field.get("Items") else [])
             ],
+            "confidence": invoice.confidence,
+            "field_confidence": {name: value.get("confidence") for name, value in field.items()},
+            "doc_content": invoices.content,
+            "doc_pages": split_doc_pages(invoices.content, source_url=invoice_url),
         }
 
         return output
 
 
-def parse_pdf_azure(pdf_url: str = None, pdf_path: str = None):
+def split_doc_pages(doc_content: str, source_url: str = None) -> list[dict]:
+    """Split Azure markdown on page breaks and flag the pages containing tables."""
+    doc_pages = []
+    with span("markdown_split"):
+        for i, page in enumerate(doc_content.split("<!-- PageBreak -->"), start=1):
+            has_table = True if "<table>" in page else False
+            has_lca = True if "<table>" in page and "gwp" in page.lower() else False
+            doc_page = {
+                "page": i,
+                "has_table": has_table,
+                "has_lca": has_lca,
+                "source_url": source_url,
+                "content": page,
+            }
+            doc_pages.append(doc_page)
+    return doc_pages
+
+
+def make_doc_slug(pdf_url: str = None, pdf_path: str = None) -> str | None:
+    """Slug identifying a document by its file name, or None when neither a path nor a URL is given."""
+    doc_slug_source: str | None = None
+    if pdf_path:
+        doc_slug_source = Path(pdf_path).stem
+    elif pdf_url:
+        parsed_url = urlparse(pdf_url)
+        doc_slug_source = Path(parsed_url.path).stem or parsed_url.netloc
+
+    if not doc_slug_source:
+        return None
+    return slugify(doc_slug_source) or "document"
+
+
+def parse_pdf_azure(
+    pdf_url: str = None, pdf_path: str = None, use_cache: bool = True, pdf_bytes: DocumentSource = None, filename: str = None
+):
     """
     Parse PDF using Azure Document Intelligence and return content split by pages
 
+    The document is read into memory once and sent as `base64Source` without intermediate copies;
+    URLs are streamed straight into memory rather than through a temporary file. Results are cached on the SHA-256 of the PDF
+    bytes, so re-submitting the same document returns the stored markdown instead of calling Azure again.
+
     Args:
         pdf_url: URL of the PDF document
-        pdf_title: Title of the PDF document
+        pdf_path: Local path of the PDF document
+        use_cache: Whether to read from and write to the OCR cache
+        pdf_bytes: In-memory PDF (bytes, memoryview or binary file-like object), used instead of the path or URL
+        filename: Name used for the document slug when the PDF is given as bytes
 
     Returns:
-        List of dictionaries containing parsed content and metadata
+        Dictionary containing the document slug, parsed content split by pages and whether the
+        result was served from the OCR cache
     """
-    if pdf_url and not pdf_path:
-        print(f"Downloading PDF from URL: {pdf_url}")
-        pdf_path = download_pdf(pdf_url)
-        temp_file = True
-    else:
-        temp_file = False
-
-    try:
-        loader = AzureAIDocumentIntelligenceLoader(
-            api_endpoint=os.getenv("AZURE_DOCUMENT_INTELLIGENCE_ENDPOINT"),
-            api_key=os.getenv("AZURE_DOCUMENT_INTELLIGENCE_KEY"),
-            url_path=pdf_url,
-            file_path=pdf_path,
-            api_model="prebuilt-layout",
-            mode="markdown",
-        )
-
-        documents = loader.load()
-
-        doc_pages_raw = documents[0].page_content.split("<!-- PageBreak -->")
-
-        temp_dir = Path("data") / "temp"
-        temp_dir.mkdir(parents=True, exist_ok=True)
+    api_model = "prebuilt-layout"
+    mode = "markdown"
 
-        doc_slug_source: str | None = None
-        if pdf_path:
-            doc_slug_source = Path(pdf_path).stem
-        elif pdf_url:
-            parsed_url = urlparse(pdf_url)
-            doc_slug_source = Path(parsed_url.path).stem or parsed_url.netloc
+    doc_slug = make_doc_slug(pdf_url=pdf_url, pdf_path=filename or pdf_path)
+    if pdf_bytes is not None:
+        doc_slug = doc_slug or "document"
+    if not doc_slug:
+        print("No PDF path or URL provided")
+        return None
 
-        if not doc_slug_source:
-            print("No PDF path or URL provided")
-            return None
+    content = load_document(pdf_url=pdf_url, pdf_path=pdf_path, pdf_bytes=pdf_bytes)
 
-        doc_slug = slugify(doc_slug_source) or "document"
-        output_path = temp_dir / f"{doc_slug}.md"
-        output_path.write_text(documents[0].page_content, encoding="utf-8")
-
-        doc_pages = []
-        for i, page in enumerate(doc_pages_raw, start=1):
-            has_table = True if "<table>" in page else False
-            has_lca = True if "<table>" in page and "gwp" in page.lower() else False
-            doc_page = {
-                "page": i,
-                "has_table": has_table,
-                "has_lca": has_lca,
-                "source_url": pdf_url,
-                "content": page,
-            }
-            doc_pages.append(doc_page)
+    cache = get_ocr_cache() if use_cache else None
+    cache_key = OcrCache.make_key(content, api_model, mode) if cache else None
 
+    cached = cache.get(cache_key) if cache else None
+    if cached:
+        doc_pages = [page | {"source_url": pdf_url} for page in cached["doc_pages"]]
         return {
             "doc_slug": doc_slug,
             "doc_pages": doc_pages,
-            "doc_content": documents[0].page_content,
+            "doc_content": cached["doc_content"],
+            "cache_hit": True,
         }
-    finally:
-        # Clean up temporary file if we downloaded it
-        if temp_file and pdf_path and Path(pdf_path).exists():
-            Path(pdf_path).unlink()
+
+    # Submit and poll separately (rather than through the LangChain loader) so each is timed
+    with span("ocr_submit", model=api_model):
+        poller = _get_document_intelligence_client().begin_analyze_document(
+            api_model, analyze_request_body(content), output_content_format=mode
+        )
+    # Release the document while polling; only the markdown is needed from here on
+    del content
+    with span("ocr_poll", model=api_model):
+        doc_content = poller.result().content
+
+    doc_pages = split_doc_pages(doc_content, source_url=pdf_url)
+
+    if cache:
+        cache.set(cache_key, doc_content, doc_pages)
+
+    return {
+        "doc_slug": doc_slug,
+        "doc_pages": doc_pages,
+        "doc_content": doc_content,
+        "cache_hit": False,
+    }
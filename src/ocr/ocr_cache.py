@@ -0,0 +1,138 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+class OcrCache:
+    """
+    Content-addressed on-disk cache for OCR results.
+
+    Entries are keyed on the SHA-256 of the document bytes plus the OCR model and mode, so the same
+    PDF is only sent to Azure Document Intelligence once. Entries older than `max_age_seconds` are
+    dropped, and the least recently used entries are evicted once the cache exceeds `max_bytes`.
+    """
+
+    def __init__(self, cache_dir: str | Path, max_bytes: int = 512 * 1024 * 1024, max_age_seconds: float = 30 * 24 * 3600):
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_seconds
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(pdf_bytes: bytes, api_model: str, mode: str) -> str:
+        """Return the cache key for a document analysed with the given OCR model and mode."""
+        digest = hashlib.sha256(pdf_bytes).hexdigest()
+        return f"{digest}-{api_model}-{mode}"
+
+    def _entry_path(self, key: str) -> Path:
+        return self.cache_dir / f"{key}.json"
+
+    def get(self, key: str) -> dict | None:
+        """Return the cached entry for `key`, or None if it is missing or expired."""
+        path = self._entry_path(key)
+        try:
+            stat = path.stat()
+            if time.time() - stat.st_mtime > self.max_age_seconds:
+                path.unlink(missing_ok=True)
+                raise FileNotFoundError(path)
+            entry = json.loads(path.read_text(encoding="utf-8"))
+            # Touch the entry so eviction treats it as recently used
+            os.utime(path)
+        except (FileNotFoundError, json.JSONDecodeError):
+            with self._lock:
+                self.misses += 1
+            return None
+
+        with self._lock:
+            self.hits += 1
+        return entry
+
+    def set(self, key: str, doc_content: str, doc_pages: list[dict]) -> None:
+        """Store the OCR output for `key` and evict old entries if the cache is over budget."""
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        path = self._entry_path(key)
+        temp_path = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        entry = {"doc_content": doc_content, "doc_pages": doc_pages, "created_at": time.time()}
+        temp_path.write_text(json.dumps(entry, ensure_ascii=False), encoding="utf-8")
+        temp_path.replace(path)
+        self.evict()
+
+    def evict(self) -> None:
+        """Remove expired entries, then the least recently used ones until under `max_bytes`."""
+        if not self.cache_dir.exists():
+            return
+
+        now = time.time()
+        entries = []
+        for path in self.cache_dir.glob("*.json"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            if now - stat.st_mtime > self.max_age_seconds:
+                path.unlink(missing_ok=True)
+                with self._lock:
+                    self.evictions += 1
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        total_bytes = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total_bytes <= self.max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total_bytes -= size
+            with self._lock:
+                self.evictions += 1
+
+    def clear(self) -> None:
+        """Remove every entry from the cache."""
+        for path in self.cache_dir.glob("*.json"):
+            path.unlink(missing_ok=True)
+
+    def stats(self) -> dict:
+        """Return hit/miss counters and the current size of the cache."""
+        entries = list(self.cache_dir.glob("*.json")) if self.cache_dir.exists() else []
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "entries": len(entries),
+            "size_bytes": sum(path.stat().st_size for path in entries if path.exists()),
+        }
+
+
+_default_cache: OcrCache | None = None
+_default_cache_lock = threading.Lock()
+
+
+def get_ocr_cache() -> OcrCache:
+    """
+    Return the process-wide OCR cache, configured from the environment.
+
+    Environment variables:
+        OCR_CACHE_DIR: Directory for cache entries (default `data/cache/ocr`).
+        OCR_CACHE_MAX_MB: Maximum cache size in megabytes (default 512).
+        OCR_CACHE_MAX_AGE_DAYS: Maximum age of an entry in days (default 30).
+    """
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = OcrCache(
+                cache_dir=os.getenv("OCR_CACHE_DIR", str(Path("data") / "cache" / "ocr")),
+                max_bytes=int(float(os.getenv("OCR_CACHE_MAX_MB", "512")) * 1024 * 1024),
+                max_age_seconds=float(os.getenv("OCR_CACHE_MAX_AGE_DAYS", "30")) * 24 * 3600,
+            )
+        return _default_cache
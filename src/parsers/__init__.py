@@ -1,3 +1,22 @@
-from .process_invoice_parser import parse_process_invoice_result
+from .incremental_json import IncrementalInvoiceParser
+from .json_decoder import decode_json_object, decode_partial_json_object, extract_json_text, loads_partial, loads_tolerant, repair_json
+from .process_invoice_parser import (
+    parse_partial_process_invoice_json,
+    parse_process_invoice_json,
+    parse_process_invoice_result,
+    parse_process_invoice_results,
+)
 
-__all__ = ["parse_process_invoice_result"]
+__all__ = [
+    "IncrementalInvoiceParser",
+    "decode_json_object",
+    "decode_partial_json_object",
+    "extract_json_text",
+    "loads_partial",
+    "loads_tolerant",
+    "parse_partial_process_invoice_json",
+    "parse_process_invoice_json",
+    "parse_process_invoice_result",
+    "parse_process_invoice_results",
+    "repair_json",
+]
@@ -0,0 +1,118 @@
+import json
+
+from src.parsers.json_decoder import loads_tolerant
+
+
+class IncrementalInvoiceParser:
+    """
+    Incrementally parse a streamed invoice JSON object.
+
+    Text is fed chunk by chunk as it arrives from the model. Each top-level field is emitted as soon
+    as its value is complete, and each element of the top-level `items` array is emitted on its own,
+    so callers can render partial results long before the response finishes. Leading code fences
+    and `#` comments outside strings are ignored.
+
+    Events are dictionaries of the form `{"type": "field", "key": ..., "value": ...}` or
+    `{"type": "item", "index": ..., "item": ...}`.
+    """
+
+    def __init__(self, items_key: str = "items"):
+        self.items_key = items_key
+        self._clean: list[str] = []
+        self._started = False
+        self._done = False
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._in_comment = False
+        self._key: str | None = None
+        self._key_start: int | None = None
+        self._value_start: int | None = None
+        self._in_items = False
+        self._item_start: int | None = None
+        self._item_count = 0
+
+    def feed(self, chunk: str) -> list[dict]:
+        """Consume the next chunk of model output and return the events it completed."""
+        events: list[dict] = []
+        for char in chunk:
+            if self._done:
+                break
+            if not self._started:
+                if char != "{":
+                    continue
+                self._started = True
+
+            if self._in_comment:
+                if char == "\n":
+                    self._in_comment = False
+                else:
+                    continue
+            elif not self._in_string and char == "#":
+                self._in_comment = True
+                continue
+
+            position = len(self._clean)
+            self._clean.append(char)
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                    if self._depth == 1 and self._key is None and self._key_start is not None:
+                        self._key = json.loads("".join(self._clean[self._key_start : position + 1]))
+                continue
+
+            if char == '"':
+                self._in_string = True
+                if self._depth == 1 and self._key is None:
+                    self._key_start = position
+            elif char in "{[":
+                self._depth += 1
+                if self._depth == 2 and char == "[" and self._key == self.items_key:
+                    self._in_items = True
+                elif self._depth == 3 and self._in_items and char == "{":
+                    self._item_start = position
+            elif char in "}]":
+                if self._depth == 3 and self._in_items and char == "}" and self._item_start is not None:
+                    events.append(self._emit_item(position))
+                self._depth -= 1
+                if self._depth == 1 and self._in_items:
+                    self._in_items = False
+                if self._depth == 0:
+                    event = self._emit_field(position)
+                    if event:
+                        events.append(event)
+                    self._done = True
+            elif char == ":" and self._depth == 1 and self._key is not None and self._value_start is None:
+                self._value_start = position + 1
+            elif char == "," and self._depth == 1:
+                event = self._emit_field(position)
+                if event:
+                    events.append(event)
+        return events
+
+    @property
+    def text(self) -> str:
+        """The JSON text consumed so far, without code fences or comments."""
+        return "".join(self._clean)
+
+    def _emit_item(self, end: int) -> dict:
+        item = loads_tolerant("".join(self._clean[self._item_start : end + 1]))
+        event = {"type": "item", "index": self._item_count, "item": item}
+        self._item_count += 1
+        self._item_start = None
+        return event
+
+    def _emit_field(self, end: int) -> dict | None:
+        key, value_start = self._key, self._value_start
+        self._key = self._key_start = self._value_start = None
+        if key is None or value_start is None or key == self.items_key:
+            return None
+        value_text = "".join(self._clean[value_start:end])
+        if not value_text.strip():
+            return None
+        return {"type": "field", "key": key, "value": loads_tolerant(value_text)}
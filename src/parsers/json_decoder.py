@@ -0,0 +1,284 @@
+import json
+import re
+from functools import lru_cache
+
+FENCE = "```"
+_SKIP_PATTERN = re.compile(r"(?:\s+|#[^\n]*|//[^\n]*)*")
+_NUMBER_PATTERN = re.compile(r"-?(?:\d+(?:\.\d*)?|\.\d+)(?:[eE][-+]?\d+)?")
+_IDENTIFIER_PATTERN = re.compile(r"[A-Za-z_][A-Za-z0-9_]*")
+_SINGLE_QUOTED_PATTERN = re.compile(r"'((?:[^'\\]|\\.)*)'", re.DOTALL)
+_SINGLE_QUOTED_ESCAPE_PATTERN = re.compile(r'(\\.)|"', re.DOTALL)
+_LITERALS = {"null": None, "None": None, "true": True, "True": True, "false": False, "False": False}
+# Strings are matched first so comment markers, commas and literals inside them are left alone
+_NORMALIZE_PATTERN = re.compile(r'"(?:[^"\\]|\\.)*"|#[^\n]*|//[^\n]*|,(?=\s*[}\]])|\b(?:None|True|False)\b', re.DOTALL)
+_NORMALIZED_TOKENS = {"None": "null", "True": "true", "False": "false"}
+
+
+@lru_cache(maxsize=1)
+def _get_loads():
+    # orjson is several times faster on large outputs; fall back to the standard library without it
+    try:
+        import orjson
+
+        return orjson.loads
+    except ImportError:
+        return json.loads
+
+
+def extract_json_text(text: str) -> str:
+    """
+    Return the JSON part of a model response in a single pass.
+
+    The body of the first code fence is used when there is one (an unterminated fence runs to the
+    end of the text); otherwise any prose before the first `{` or `[` is dropped. A fence whose JSON
+    starts on the fence line (```` ```json{"a": 1}``` ````) has its body start at that `{` or `[`.
+    """
+    fence_start = text.find(FENCE)
+    if fence_start != -1:
+        info_start = fence_start + len(FENCE)
+        line_end = text.find("\n", info_start)
+        info = text[info_start : line_end if line_end != -1 else len(text)]
+        if line_end == -1 or "{" in info or "[" in info:
+            body_start = _json_start(text, info_start)
+            if body_start == -1:
+                return ""
+        else:
+            body_start = line_end + 1
+        fence_end = text.find(FENCE, body_start)
+        return text[body_start : fence_end if fence_end != -1 else len(text)].strip()
+
+    body_start = _json_start(text, 0)
+    return text[body_start:].strip() if body_start != -1 else text.strip()
+
+
+def _json_start(text: str, start: int) -> int:
+    """Index of the first `{` or `[` from `start`, or -1."""
+    starts = [index for index in (text.find("{", start), text.find("[", start)) if index != -1]
+    return min(starts) if starts else -1
+
+
+class _Truncated(Exception):
+    """The text ended inside a scalar value."""
+
+
+class _RepairParser:
+    """
+    Recursive-descent parser for the almost-JSON models produce.
+
+    Accepts trailing and missing commas, `#` and `//` comments, single-quoted strings and Python's
+    `None`/`True`/`False`. When the text is truncated, objects are closed where the text ends, a key
+    or scalar that was cut off is dropped, and so is an array element (e.g. a line item) that was cut
+    off. Unquoted keys are accepted.
+    """
+
+    def __init__(self, text: str):
+        self.text = text
+        self.pos = 0
+        self.depth = 0
+        self.truncated = False
+
+    def parse(self):
+        try:
+            value = self._value()
+        except _Truncated:
+            raise ValueError("JSON text ends before the first value is complete") from None
+        self._skip()
+        if self.pos < len(self.text):
+            raise ValueError(f"Unexpected trailing text at position {self.pos}")
+        return value
+
+    def _skip(self) -> None:
+        self.pos = _SKIP_PATTERN.match(self.text, self.pos).end()
+
+    def _value(self):
+        self._skip()
+        if self.pos >= len(self.text):
+            raise _Truncated
+        char = self.text[self.pos]
+        if char == "{":
+            return self._object()
+        if char == "[":
+            return self._array()
+        if char in "\"'":
+            return self._string()
+
+        match = _NUMBER_PATTERN.match(self.text, self.pos)
+        if match:
+            return self._scalar_end(match, float if any(c in match.group() for c in ".eE") else int)
+        match = _IDENTIFIER_PATTERN.match(self.text, self.pos)
+        if match and match.group() in _LITERALS:
+            return _LITERALS[self._scalar_end(match, str)]
+        if self.depth and match and match.end() == len(self.text):
+            raise _Truncated
+        raise ValueError(f"Unexpected character {char!r} at position {self.pos}")
+
+    def _scalar_end(self, match: re.Match, convert):
+        # Inside a container, a number or literal running into the end of the text may have been cut short
+        if self.depth and match.end() == len(self.text):
+            raise _Truncated
+        self.pos = match.end()
+        return convert(match.group())
+
+    def _string(self) -> str:
+        if self.text[self.pos] == '"':
+            try:
+                value, self.pos = json.decoder.scanstring(self.text, self.pos + 1)
+            except json.JSONDecodeError as exc:
+                if "Unterminated" in exc.msg:
+                    raise _Truncated from None
+                raise ValueError(str(exc)) from None
+            return value
+
+        match = _SINGLE_QUOTED_PATTERN.match(self.text, self.pos)
+        if not match:
+            raise _Truncated
+        self.pos = match.end()
+        # Re-quote as a JSON string: escape bare double quotes and unescape single quotes
+        body = _SINGLE_QUOTED_ESCAPE_PATTERN.sub(
+            lambda escape: '\\"' if escape.group(1) is None else escape.group(1).replace("\\'", "'"), match.group(1)
+        )
+        return json.decoder.scanstring(f'"{body}"', 1)[0]
+
+    def _key(self) -> str:
+        if self.text[self.pos] in "\"'":
+            return self._string()
+        match = _IDENTIFIER_PATTERN.match(self.text, self.pos)
+        if not match:
+            raise ValueError(f"Expected an object key at position {self.pos}")
+        if match.end() == len(self.text):
+            raise _Truncated
+        self.pos = match.end()
+        return match.group()
+
+    def _object(self) -> dict:
+        self.pos += 1
+        self.depth += 1
+        result = {}
+        while True:
+            self._skip()
+            if self.pos >= len(self.text):
+                self.truncated = True
+                return result
+            char = self.text[self.pos]
+            if char == "}":
+                self.pos += 1
+                self.depth -= 1
+                return result
+            if char == ",":
+                self.pos += 1
+                continue
+            try:
+                key = self._key()
+                self._skip()
+                if self.pos >= len(self.text):
+                    raise _Truncated
+                if self.text[self.pos] != ":":
+                    raise ValueError(f"Expected ':' at position {self.pos}")
+                self.pos += 1
+                result[key] = self._value()
+            except _Truncated:
+                self.truncated = True
+                self.pos = len(self.text)
+                return result
+
+    def _array(self) -> list:
+        self.pos += 1
+        self.depth += 1
+        result = []
+        while True:
+            self._skip()
+            if self.pos >= len(self.text):
+                self.truncated = True
+                return result
+            char = self.text[self.pos]
+            if char == "]":
+                self.pos += 1
+                self.depth -= 1
+                return result
+            if char == ",":
+                self.pos += 1
+                continue
+            try:
+                value = self._value()
+            except _Truncated:
+                self.truncated = True
+                self.pos = len(self.text)
+                return result
+            if self.truncated:
+                return result
+            result.append(value)
+
+
+def repair_json(text: str):
+    """Parse almost-JSON model output with `_RepairParser`, raising ValueError when it cannot be read."""
+    return _RepairParser(text).parse()
+
+
+def _repair_json_partial(text: str) -> tuple:
+    parser = _RepairParser(text)
+    return parser.parse(), parser.truncated
+
+
+def _normalize_token(match: re.Match) -> str:
+    token = match.group()
+    if token[0] == '"':
+        return token
+    return _NORMALIZED_TOKENS.get(token, "")
+
+
+def loads_tolerant(text: str):
+    """
+    Decode a JSON value with the fast parser.
+
+    Malformed text is retried once with comments, trailing commas and Python literals rewritten in a
+    single regex pass, and only then parsed with `repair_json` (single quotes, truncation, ...).
+    """
+    return loads_partial(text)[0]
+
+
+def loads_partial(text: str) -> tuple:
+    """
+    Decode a JSON value like `loads_tolerant`, and report whether the text was truncated.
+
+    Returns:
+        The value and True when the text ended before the value did (for example at the model's
+        `max_tokens`), in which case the value only holds what came before the cut.
+    """
+    loads = _get_loads()
+    try:
+        return loads(text), False
+    except ValueError:
+        pass
+    # Truncated text cannot be fixed by the rewrite, so skip straight to the repair parser
+    if text.rstrip().endswith(("}", "]")):
+        try:
+            return loads(_NORMALIZE_PATTERN.sub(_normalize_token, text)), False
+        except ValueError:
+            pass
+    return _repair_json_partial(text)
+
+
+def decode_json_object(result) -> dict:
+    """
+    Decode the JSON object in a model response.
+
+    Dictionaries are returned unchanged. Text has its code fence or leading prose removed by
+    `extract_json_text` and is decoded with `loads_tolerant`; no Python code is evaluated.
+
+    Raises:
+        ValueError: If the response is not a JSON object.
+    """
+    return decode_partial_json_object(result)[0]
+
+
+def decode_partial_json_object(result) -> tuple[dict, bool]:
+    """
+    Decode the JSON object in a model response like `decode_json_object`, and report whether the
+    response was truncated (see `loads_partial`).
+    """
+    if isinstance(result, dict):
+        return result, False
+    value, truncated = loads_partial(extract_json_text(result))
+    if not isinstance(value, dict):
+        raise ValueError("LLM response is not a JSON object")
+    return value, truncated
@@ -1,7 +1,10 @@
-import json
-from typing import Any, Dict, List, Optional, Union
+from functools import lru_cache
+from typing import Annotated, Any, Dict, Iterable, List, Optional, Tuple, Union, get_args, get_origin
 
-from pydantic import BaseModel, Field, ValidationError
+from pydantic import BaseModel, Field, TypeAdapter, ValidationError
+from typing_extensions import TypedDict
+
+from src.parsers.json_decoder import extract_json_text, loads_partial
 
 
 class Address(BaseModel):
@@ -56,11 +59,131 @@ class ProcessInvoiceResult(BaseModel):
     metadata: Metadata = Field(default_factory=Metadata)
 
 
-def parse_process_invoice_result(payload: Union[str, Dict[str, Any]]) -> ProcessInvoiceResult:
-    if isinstance(payload, str):
-        payload = json.loads(payload)
+def _dump_default(value):
+    return value.model_dump() if isinstance(value, BaseModel) else value
+
+
+def _dict_annotation(annotation):
+    # Swap every model in the annotation, e.g. Optional[List[InvoiceItem]], for its TypedDict
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        return _typed_dict_for(annotation)
+    args = get_args(annotation)
+    if not args:
+        return annotation
+    dict_args = tuple(_dict_annotation(arg) for arg in args)
+    return Union[dict_args] if get_origin(annotation) is Union else get_origin(annotation)[dict_args]
+
+
+@lru_cache(maxsize=None)
+def _typed_dict_for(model: type[BaseModel]) -> type:
+    """A TypedDict with `model`'s fields and defaults, validating to what `model_dump()` would return."""
+    fields = {}
+    for name, field in model.model_fields.items():
+        if field.default_factory is not None:
+            default = Field(default_factory=lambda factory=field.default_factory: _dump_default(factory()))
+        elif field.is_required():
+            default = Field()
+        else:
+            default = Field(default=_dump_default(field.default))
+        fields[name] = Annotated[_dict_annotation(field.annotation), default]
+    return TypedDict(f"{model.__name__}Dict", fields)
+
+
+@lru_cache(maxsize=None)
+def _get_adapter(as_dict: bool, many: bool = False) -> TypeAdapter:
+    # Built on first use; the dict adapter validates straight into plain dicts without building models
+    result_type = _typed_dict_for(ProcessInvoiceResult) if as_dict else ProcessInvoiceResult
+    return TypeAdapter(List[result_type] if many else result_type)
+
+
+def _invalid(exc: ValidationError) -> ValueError:
+    return ValueError(f"Invalid process invoice result: {exc}")
+
+
+def parse_process_invoice_result(
+    payload: Union[str, bytes, Dict[str, Any]], as_dict: bool = False
+) -> Union[ProcessInvoiceResult, Dict[str, Any]]:
+    """
+    Validate a decoded result, or strict JSON text, against `ProcessInvoiceResult`.
+
+    With `as_dict`, returns the same dictionary as `model_dump()` without building the model.
+    """
+    adapter = _get_adapter(as_dict)
+    try:
+        if isinstance(payload, (str, bytes)):
+            return adapter.validate_json(payload)
+        return adapter.validate_python(payload)
+    except ValidationError as exc:
+        raise _invalid(exc) from exc
+
+
+def parse_process_invoice_json(text: Union[str, bytes], as_dict: bool = False) -> Union[ProcessInvoiceResult, Dict[str, Any]]:
+    """
+    Validate the JSON in an LLM response straight from text, without an intermediate dictionary.
+
+    The code fence is stripped and the text is parsed and validated in one `validate_json` call. Only
+    malformed JSON (comments, trailing commas, truncation) is decoded with `loads_tolerant` first.
+
+    Raises:
+        ValueError: If the response cannot be decoded or does not match `ProcessInvoiceResult`.
+    """
+    return parse_partial_process_invoice_json(text, as_dict=as_dict)[0]
+
+
+def parse_partial_process_invoice_json(
+    text: Union[str, bytes], as_dict: bool = False
+) -> Tuple[Union[ProcessInvoiceResult, Dict[str, Any]], bool]:
+    """
+    Validate the JSON in an LLM response like `parse_process_invoice_json`, and report whether the
+    response was truncated.
 
+    Every `ProcessInvoiceResult` field is optional, so a truncated response still validates; the
+    flag is the only sign that fields and line items after the cut are missing.
+    """
+    json_text = extract_json_text(text) if isinstance(text, str) else text
+    adapter = _get_adapter(as_dict)
     try:
-        return ProcessInvoiceResult.model_validate(payload)
+        return adapter.validate_json(json_text), False
     except ValidationError as exc:
-        raise ValueError(f"Invalid process invoice result: {exc}") from exc
+        if exc.errors()[0]["type"] != "json_invalid":
+            raise _invalid(exc) from exc
+
+    content, truncated = loads_partial(json_text.decode() if isinstance(json_text, bytes) else json_text)
+    if not isinstance(content, dict):
+        raise ValueError("LLM response is not a JSON object")
+    return parse_process_invoice_result(content, as_dict=as_dict), truncated
+
+
+def parse_process_invoice_results(
+    payloads: Iterable[Union[str, bytes, Dict[str, Any]]], as_dict: bool = False
+) -> List[Union[ProcessInvoiceResult, Dict[str, Any], ValueError]]:
+    """
+    Validate many results at once.
+
+    Strict JSON texts are joined into one array and validated in a single call (dictionaries are
+    validated as one list). When any payload fails, or a text holds more or fewer than one value so
+    the joined array does not line up with `payloads`, each is validated on its own and the failures
+    are returned as `ValueError`s in their positions, like `asyncio.gather(return_exceptions=True)`.
+    """
+    payloads = list(payloads)
+    adapter = _get_adapter(as_dict, many=True)
+    results = None
+    try:
+        if all(isinstance(payload, dict) for payload in payloads):
+            results = adapter.validate_python(payloads)
+        elif all(isinstance(payload, str) for payload in payloads):
+            results = adapter.validate_json("[" + ",".join(payloads) + "]")
+        elif all(isinstance(payload, bytes) for payload in payloads):
+            results = adapter.validate_json(b"[" + b",".join(payloads) + b"]")
+    except ValidationError:
+        pass
+    if results is not None and len(results) == len(payloads):
+        return results
+
+    results = []
+    for payload in payloads:
+        try:
+            results.append(parse_process_invoice_result(payload, as_dict=as_dict))
+        except ValueError as exc:
+            results.append(exc)
+    return results
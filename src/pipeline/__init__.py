@@ -0,0 +1,16 @@
+from .batch_pipeline import collect_inputs, run_batch
+from .job_queue import InvoiceJob, InvoiceJobQueue
+from .job_store import JobStore, get_job_store
+from .stubs import StubChatModel, register_stub_models, stub_ocr
+
+__all__ = [
+    "InvoiceJob",
+    "InvoiceJobQueue",
+    "JobStore",
+    "StubChatModel",
+    "collect_inputs",
+    "get_job_store",
+    "register_stub_models",
+    "run_batch",
+    "stub_ocr",
+]
@@ -0,0 +1,239 @@
+import asyncio
+import glob
+import inspect
+import json
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from pathlib import Path
+from typing import Callable, Iterable
+
+from src.chains import extract_invoice
+from src.chains.process_invoice_chain import build_invoice_output
+from src.ocr import close_ocr_scheduler, parse_pdf_azure
+from src.pipeline.job_store import JobStore, make_worker_id
+from src.telemetry import acall_with_spans, call_with_spans, telemetry_enabled
+
+
+def collect_inputs(sources: Iterable[str]) -> list[Path]:
+    """
+    Resolve directories, glob patterns and manifest files into a list of documents.
+
+    Directories are searched recursively for PDFs. Manifests are `.txt` files with one path per
+    line or `.jsonl` files with a `path` key per line; relative paths resolve against the manifest.
+    """
+    paths: list[Path] = []
+    for source in sources:
+        source_path = Path(source)
+        if source_path.is_dir():
+            paths.extend(sorted(source_path.rglob("*.pdf")))
+        elif source_path.is_file() and source_path.suffix.lower() in {".txt", ".jsonl"}:
+            for line in source_path.read_text(encoding="utf-8").splitlines():
+                line = line.strip()
+                if not line or line.startswith("#"):
+                    continue
+                entry = json.loads(line)["path"] if source_path.suffix.lower() == ".jsonl" else line
+                entry_path = Path(entry)
+                paths.append(entry_path if entry_path.is_absolute() else source_path.parent / entry_path)
+        elif source_path.is_file():
+            paths.append(source_path)
+        else:
+            paths.extend(Path(match) for match in sorted(glob.glob(source, recursive=True)))
+
+    # Preserve order while dropping duplicates
+    return list(dict.fromkeys(paths))
+
+
+async def run_batch(
+    pdf_paths: list[Path],
+    output=sys.stdout,
+    model: str = "azure-gpt-4.1",
+    ocr_concurrency: int = 4,
+    llm_concurrency: int = 8,
+    ocr_fn: Callable = parse_pdf_azure,
+    extract_fn: Callable = extract_invoice,
+    job_store: JobStore | None = None,
+    max_attempts: int = 3,
+) -> dict:
+    """
+    Run OCR and LLM extraction over `pdf_paths` as a two-stage pipeline.
+
+    Each stage has its own bounded pool of workers, so OCR for the next invoice overlaps with the
+    LLM call for the previous one. A JSON line is written to `output` as each invoice completes,
+    including the invoice's stage timing `spans` unless telemetry is disabled.
+
+    Args:
+        pdf_paths: Documents to process.
+        output: Text stream receiving one JSON result per line.
+        model: Model ID passed to `extract_fn`.
+        ocr_concurrency: Maximum number of in-flight OCR calls.
+        llm_concurrency: Maximum number of in-flight LLM calls.
+        ocr_fn: Callable with the `parse_pdf_azure` signature. Coroutine functions such as
+            `aparse_pdf_azure` are awaited directly instead of taking an executor thread.
+        extract_fn: Callable with the `extract_invoice` signature.
+        job_store: Makes the batch resumable. Documents are registered by content hash and claimed
+            from the store; the OCR output, raw LLM response and final record are checkpointed, so
+            a rerun only runs the stages that did not complete. Documents finished by an earlier
+            run are written again from the store with `"resumed": true`. Only this batch's
+            documents are claimed; workers in other processes running the same batch can drain
+            it concurrently.
+        max_attempts: With `job_store`, failed documents are retried by later runs until they
+            have been attempted this many times.
+
+    Returns:
+        Summary with the number of invoices written (`total`, those run or resumed by this call),
+        success/failure counts, elapsed time and throughput in invoices per minute.
+    """
+    loop = asyncio.get_running_loop()
+    async_ocr = inspect.iscoroutinefunction(ocr_fn)
+    executor = ThreadPoolExecutor(
+        max_workers=llm_concurrency + (0 if async_ocr else ocr_concurrency), thread_name_prefix="invoice-batch"
+    )
+
+    ocr_queue: asyncio.Queue = asyncio.Queue()
+    # Bounded so OCR cannot run arbitrarily far ahead of the LLM stage
+    llm_queue: asyncio.Queue = asyncio.Queue(maxsize=llm_concurrency * 2)
+    counts = {"succeeded": 0, "failed": 0, "truncated": 0}
+
+    worker_id = make_worker_id()
+    if job_store:
+        job_ids = await asyncio.to_thread(job_store.add_many, pdf_paths)
+        batch_id = job_store.make_batch_id(job_ids)
+        await asyncio.to_thread(job_store.set_batch, job_ids, batch_id)
+        await asyncio.to_thread(job_store.requeue, max_attempts)
+    else:
+        for pdf_path in pdf_paths:
+            ocr_queue.put_nowait(pdf_path)
+
+    def write_record(record: dict) -> None:
+        counts["succeeded" if record["status"] == "ok" else "failed"] += 1
+        counts["truncated"] += bool(record.get("truncated"))
+        output.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+        output.flush()
+
+    async def finish(record: dict, job: dict | None = None, stage: str | None = None) -> None:
+        if job and record["status"] == "ok":
+            await asyncio.to_thread(job_store.checkpoint, job["job_id"], "result", record)
+        elif job:
+            await asyncio.to_thread(job_store.fail, job["job_id"], stage, record["error"])
+        write_record(record)
+
+    if job_store:
+        # Documents the store will not run again are reported from their stored state
+        for job_id in dict.fromkeys(job_ids):
+            job = await asyncio.to_thread(job_store.get, job_id)
+            if job["status"] == "done":
+                write_record(job["result"] | {"resumed": True})
+            elif job["status"] == "failed":
+                write_record(
+                    {"source": job["source"], "status": "error", "stage": job["error_stage"], "error": job["error"], "resumed": True}
+                )
+
+    async def next_document() -> tuple[Path, dict | None] | None:
+        if job_store:
+            job = await asyncio.to_thread(job_store.claim, worker_id, batch_id)
+            return (Path(job["source"]), job) if job else None
+        try:
+            return ocr_queue.get_nowait(), None
+        except asyncio.QueueEmpty:
+            return None
+
+    async def ocr_worker() -> None:
+        while True:
+            document = await next_document()
+            if document is None:
+                return
+
+            pdf_path, job = document
+            if job and job["ocr_output"] is not None:
+                await llm_queue.put((pdf_path, job["ocr_output"], None, [], job))
+                continue
+
+            started = time.perf_counter()
+            try:
+                if async_ocr:
+                    pdf_output, spans = await acall_with_spans(ocr_fn, pdf_path=str(pdf_path))
+                else:
+                    pdf_output, spans = await loop.run_in_executor(executor, partial(call_with_spans, ocr_fn, pdf_path=str(pdf_path)))
+                if not pdf_output:
+                    raise ValueError("Unable to parse PDF")
+            except Exception as exc:
+                await finish({"source": str(pdf_path), "status": "error", "stage": "ocr", "error": str(exc)}, job, "ocr")
+                continue
+            if job:
+                await asyncio.to_thread(job_store.checkpoint, job["job_id"], "ocr", pdf_output)
+            await llm_queue.put((pdf_path, pdf_output, time.perf_counter() - started, spans, job))
+
+    async def llm_worker() -> None:
+        while True:
+            item = await llm_queue.get()
+            if item is None:
+                return
+
+            pdf_path, pdf_output, ocr_seconds, spans, job = item
+            resumed_stages = ["ocr"] if ocr_seconds is None else []
+            # Set once the raw response is checkpointed, so a failure after it is a validation failure
+            stage = {"name": "llm"}
+
+            def checkpoint_response(text: str, usage_metadata: dict) -> None:
+                job_store.checkpoint(job["job_id"], "llm", {"text": text, "usage_metadata": usage_metadata})
+                stage["name"] = "validate"
+
+            if job and job["llm_output"] is not None:
+                # The LLM already answered before the interruption: only validate its response
+                llm_output = job["llm_output"]
+                stage["name"] = "validate"
+                resumed_stages.append("llm")
+                call = partial(build_invoice_output, llm_output["text"], llm_output["usage_metadata"], llm_output["usage_metadata"]["model"])
+            elif job:
+                call = partial(extract_fn, pdf_output, model=model, on_response=checkpoint_response)
+            else:
+                call = partial(extract_fn, pdf_output, model=model)
+
+            started = time.perf_counter()
+            try:
+                invoice_output, llm_spans = await loop.run_in_executor(executor, partial(call_with_spans, call))
+            except Exception as exc:
+                await finish({"source": str(pdf_path), "status": "error", "stage": "llm", "error": str(exc)}, job, stage["name"])
+                continue
+            record = {
+                "source": str(pdf_path),
+                "status": "ok",
+                "pages": len(pdf_output["doc_pages"]),
+                "ocr_seconds": round(ocr_seconds, 3) if ocr_seconds is not None else None,
+                "llm_seconds": round(time.perf_counter() - started, 3),
+                "content": invoice_output["content"],
+                "usage_metadata": invoice_output["usage_metadata"],
+            }
+            if invoice_output["usage_metadata"].get("truncated"):
+                # Validated, but the fields and line items after the cut are missing
+                record["truncated"] = True
+            if resumed_stages:
+                record["resumed_stages"] = resumed_stages
+            if telemetry_enabled():
+                record["spans"] = spans + llm_spans
+            await finish(record, job, stage["name"])
+
+    started = time.perf_counter()
+    try:
+        llm_tasks = [asyncio.create_task(llm_worker()) for _ in range(llm_concurrency)]
+        await asyncio.gather(*(ocr_worker() for _ in range(ocr_concurrency)))
+        for _ in llm_tasks:
+            await llm_queue.put(None)
+        await asyncio.gather(*llm_tasks)
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+        if async_ocr:
+            await close_ocr_scheduler()
+
+    elapsed = time.perf_counter() - started
+    total = counts["succeeded"] + counts["failed"]
+    return {
+        "total": total,
+        "succeeded": counts["succeeded"],
+        "failed": counts["failed"],
+        "truncated": counts["truncated"],
+        "elapsed_seconds": round(elapsed, 3),
+        "invoices_per_minute": round(total / elapsed * 60, 2) if elapsed else 0.0,
+    }
@@ -0,0 +1,143 @@
+import hashlib
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable
+
+from src.chains import stream_process_invoice_chain
+from src.ocr import parse_pdf_azure
+
+
+class InvoiceJob:
+    """
+    Progress and result of one uploaded PDF, updated by a worker thread and read by the UI.
+
+    `status` moves from `queued` through `ocr` and `extracting` to `done` or `error`. While
+    extracting, `partial` holds the top-level fields and `partial_items` the line items streamed so
+    far. The PDF bytes are released once the job finishes.
+    """
+
+    def __init__(self, job_id: str, filename: str, pdf_bytes: bytes):
+        self.job_id = job_id
+        self.filename = filename
+        self.pdf_bytes = pdf_bytes
+        self.status = "queued"
+        self.pdf_output: dict | None = None
+        self.partial: dict = {}
+        self.partial_items: list[dict] = []
+        self.result: dict | None = None
+        self.error: str | None = None
+        self.submitted_at = time.time()
+        self.started_at: float | None = None
+        self.finished_at: float | None = None
+
+    @property
+    def items_extracted(self) -> int:
+        return len(self.partial_items)
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ("done", "error")
+
+    @property
+    def seconds(self) -> float | None:
+        """Processing time so far, or in total once finished."""
+        if self.started_at is None:
+            return None
+        return (self.finished_at or time.time()) - self.started_at
+
+
+class InvoiceJobQueue:
+    """
+    Process uploaded PDFs on a background worker pool.
+
+    Jobs are keyed by the SHA-256 of the PDF bytes: submitting a document that is already queued,
+    running or finished returns the existing job instead of running OCR and the LLM again.
+    Extraction streams, so `items_extracted` and `partial` fields grow while a job runs. One queue
+    is meant to be shared by the whole process, so only the `max_finished_jobs` most recently
+    finished jobs are kept.
+
+    Args:
+        max_workers: Documents processed concurrently (default `INVOICE_APP_WORKERS`, 4).
+        model: Model used for extraction.
+        ocr_fn: Callable with the `parse_pdf_azure` signature; it is given the PDF as `pdf_bytes`.
+        max_finished_jobs: Finished jobs kept for `get` (default `INVOICE_APP_MAX_FINISHED_JOBS`, 256).
+    """
+
+    def __init__(
+        self,
+        max_workers: int | None = None,
+        model: str = "azure-gpt-4.1",
+        ocr_fn: Callable = parse_pdf_azure,
+        max_finished_jobs: int | None = None,
+    ):
+        self.max_workers = max_workers or int(os.getenv("INVOICE_APP_WORKERS", "4"))
+        self.model = model
+        self.ocr_fn = ocr_fn
+        self.max_finished_jobs = max_finished_jobs or int(os.getenv("INVOICE_APP_MAX_FINISHED_JOBS", "256"))
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="invoice-job")
+        self._jobs: dict[str, InvoiceJob] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_job_id(pdf_bytes: bytes) -> str:
+        return hashlib.sha256(pdf_bytes).hexdigest()
+
+    def submit(self, pdf_bytes: bytes, filename: str) -> InvoiceJob:
+        """Queue a PDF unless the same document already has a job (failed jobs are retried)."""
+        job_id = self.make_job_id(pdf_bytes)
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None and job.status != "error":
+                return job
+            job = self._jobs[job_id] = InvoiceJob(job_id, filename, pdf_bytes)
+            self._evict_finished()
+        self._executor.submit(self._run, job)
+        return job
+
+    def _evict_finished(self) -> None:
+        """Drop the oldest finished jobs beyond `max_finished_jobs`; the caller holds `_lock`."""
+        finished = sorted((job for job in self._jobs.values() if job.finished), key=lambda job: job.finished_at or 0.0)
+        for job in finished[: max(len(finished) - self.max_finished_jobs, 0)]:
+            del self._jobs[job.job_id]
+
+    def get(self, job_id: str) -> InvoiceJob | None:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def jobs(self) -> list[InvoiceJob]:
+        """All jobs in submission order."""
+        with self._lock:
+            return list(self._jobs.values())
+
+    def pending(self) -> bool:
+        return any(not job.finished for job in self.jobs())
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _run(self, job: InvoiceJob) -> None:
+        job.started_at = time.time()
+        try:
+            job.status = "ocr"
+            job.pdf_output = self.ocr_fn(pdf_bytes=job.pdf_bytes, filename=job.filename)
+            if not job.pdf_output:
+                raise ValueError("Unable to parse the PDF")
+
+            job.status = "extracting"
+            for event in stream_process_invoice_chain(invoice_details=job.pdf_output["doc_content"], model=self.model):
+                if event["type"] == "field":
+                    job.partial[event["key"]] = event["value"]
+                elif event["type"] == "item":
+                    job.partial_items.append(event["item"])
+                elif event["type"] == "result":
+                    job.result = event["result"]
+            status = "done"
+        except Exception as exc:
+            job.error = str(exc)
+            status = "error"
+        job.pdf_bytes = None
+        # `finished` is read from the status, so `finished_at` must be set first
+        job.finished_at = time.time()
+        job.status = status
@@ -0,0 +1,289 @@
+import hashlib
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+from collections.abc import Mapping
+from pathlib import Path
+from typing import Iterable, Iterator
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Checkpoint column of each stage and the stage that runs after it
+STAGES = {"ocr": ("ocr_output", "llm"), "llm": ("llm_output", "validate"), "result": ("result", "done")}
+JOB_STATUSES = ("pending", "running", "done", "failed")
+
+
+def _json_default(value):
+    # SDK models in prebuilt-invoice output are mappings but not dicts; dates become ISO strings
+    return dict(value) if isinstance(value, Mapping) else str(value)
+
+
+def _dumps(value) -> str:
+    return json.dumps(value, ensure_ascii=False, default=_json_default)
+
+
+def make_worker_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _worker_is_dead(worker: str | None) -> bool:
+    """Whether `worker` was a process on this host that no longer exists (other hosts are never assumed dead)."""
+    host, _, pid = (worker or "").rpartition(":")
+    if host != socket.gethostname() or not pid.isdigit():
+        return False
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return True
+    except PermissionError:
+        return False
+    return False
+
+
+class JobStore:
+    """
+    Durable, resumable state of a batch of invoices, stored in SQLite.
+
+    Each document is one job keyed by the SHA-256 of its bytes, so adding a document twice (or the
+    same batch again) does not create new work. Jobs record a checkpoint per stage: the OCR output,
+    the raw LLM response and the final validated record. `stage` names the next stage to run, so
+    a job claimed after a crash skips everything already paid for.
+
+    Each run tags the jobs it added with a batch ID and claims only jobs of that batch, so runs over
+    different documents can share one database. Workers claim jobs in an immediate transaction,
+    which serializes claims across threads and processes sharing the database. A claim is a lease: if it expires (or the claiming process on
+    this host has died), `requeue` makes the job claimable again.
+
+    Args:
+        db_path: SQLite database path.
+        lease_seconds: How long a claim (renewed at every checkpoint) stays valid.
+    """
+
+    def __init__(self, db_path: str | Path, lease_seconds: float = 900.0):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.lease_seconds = lease_seconds
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False, isolation_level=None, timeout=30.0)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS jobs (
+                job_id TEXT PRIMARY KEY,
+                batch_id TEXT,
+                source TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'pending',
+                stage TEXT NOT NULL DEFAULT 'ocr',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                worker TEXT,
+                lease_expires REAL,
+                error TEXT,
+                error_stage TEXT,
+                ocr_output TEXT,
+                llm_output TEXT,
+                result TEXT,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL
+            )
+            """
+        )
+        # Stores created before jobs were tagged with their batch
+        if "batch_id" not in {row["name"] for row in self._conn.execute("PRAGMA table_info(jobs)")}:
+            self._conn.execute("ALTER TABLE jobs ADD COLUMN batch_id TEXT")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status_created_at ON jobs (status, created_at)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_batch_id_status ON jobs (batch_id, status)")
+
+    @staticmethod
+    def make_job_id(pdf_path: str | Path) -> str:
+        """SHA-256 of the document's bytes, read in chunks."""
+        with open(pdf_path, "rb") as file:
+            return hashlib.file_digest(file, "sha256").hexdigest()
+
+    @staticmethod
+    def make_batch_id(job_ids: Iterable[str]) -> str:
+        """SHA-256 of a batch's sorted job IDs, so every run over the same documents shares one batch."""
+        return hashlib.sha256("\n".join(sorted(set(job_ids))).encode()).hexdigest()
+
+    def _transaction(self, statements):
+        """Run `statements(conn)` in an immediate transaction and return its result."""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                result = statements(self._conn)
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+        return result
+
+    def add_many(self, pdf_paths: Iterable[str | Path]) -> list[str]:
+        """Register documents and return their job IDs; documents already in the store keep their state."""
+        now = time.time()
+        rows = [(self.make_job_id(pdf_path), str(pdf_path), now, now) for pdf_path in pdf_paths]
+        self._transaction(
+            lambda conn: conn.executemany(
+                "INSERT OR IGNORE INTO jobs (job_id, source, created_at, updated_at) VALUES (?, ?, ?, ?)", rows
+            )
+        )
+        return [job_id for job_id, _, _, _ in rows]
+
+    def add(self, pdf_path: str | Path) -> str:
+        return self.add_many([pdf_path])[0]
+
+    def set_batch(self, job_ids: Iterable[str], batch_id: str) -> None:
+        """Move jobs into `batch_id`, the batch `claim` draws from."""
+        rows = [(batch_id, job_id) for job_id in job_ids]
+        self._transaction(lambda conn: conn.executemany("UPDATE jobs SET batch_id = ? WHERE job_id = ?", rows))
+
+    def claim(self, worker: str | None = None, batch_id: str | None = None) -> dict | None:
+        """
+        Lease the oldest pending job (or one whose lease expired) to `worker`, or return None when there is none.
+
+        With `batch_id`, only jobs of that batch are claimed.
+        """
+        worker = worker or make_worker_id()
+        batch_filter = "batch_id = ? AND" if batch_id is not None else ""
+
+        def statements(conn):
+            now = time.time()
+            row = conn.execute(
+                f"""
+                SELECT job_id FROM jobs
+                WHERE {batch_filter} (status = 'pending' OR (status = 'running' AND lease_expires < ?))
+                ORDER BY created_at LIMIT 1
+                """,
+                (batch_id, now) if batch_id is not None else (now,),
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute(
+                """
+                UPDATE jobs SET status = 'running', worker = ?, lease_expires = ?, attempts = attempts + 1, updated_at = ?
+                WHERE job_id = ?
+                """,
+                (worker, now + self.lease_seconds, now, row["job_id"]),
+            )
+            return conn.execute("SELECT * FROM jobs WHERE job_id = ?", (row["job_id"],)).fetchone()
+
+        row = self._transaction(statements)
+        return self._decode(row) if row is not None else None
+
+    def checkpoint(self, job_id: str, stage: str, value) -> None:
+        """Store the output of `stage` (`ocr`, `llm` or `result`), advance the job and renew its lease."""
+        column, next_stage = STAGES[stage]
+        now = time.time()
+        status = "done" if next_stage == "done" else "running"
+        with self._lock:
+            self._conn.execute(
+                f"""
+                UPDATE jobs SET {column} = ?, stage = ?, status = ?, lease_expires = ?, updated_at = ?,
+                    error = NULL, error_stage = NULL, worker = CASE WHEN ? = 'done' THEN NULL ELSE worker END
+                WHERE job_id = ?
+                """,
+                (_dumps(value), next_stage, status, now + self.lease_seconds, now, status, job_id),
+            )
+
+    def fail(self, job_id: str, stage: str, error: str) -> None:
+        """
+        Mark a job failed at `stage`, keeping its earlier checkpoints.
+
+        A response that failed validation is dropped, so a retry asks the LLM again instead of
+        re-validating the same output.
+        """
+        reset_llm = ", llm_output = NULL, stage = 'llm'" if stage == "validate" else ""
+        with self._lock:
+            self._conn.execute(
+                f"""
+                UPDATE jobs SET status = 'failed', error = ?, error_stage = ?, worker = NULL, lease_expires = NULL,
+                    updated_at = ?{reset_llm}
+                WHERE job_id = ?
+                """,
+                (error, stage, time.time(), job_id),
+            )
+
+    def requeue(self, max_attempts: int = 3) -> int:
+        """
+        Make interrupted and retryable jobs claimable again and return how many were requeued.
+
+        Covers running jobs whose lease expired or whose worker process on this host has died,
+        and failed jobs with fewer than `max_attempts` attempts.
+        """
+
+        def statements(conn):
+            now = time.time()
+            running = conn.execute("SELECT job_id, worker, lease_expires FROM jobs WHERE status = 'running'").fetchall()
+            stale = [(row["job_id"],) for row in running if row["lease_expires"] < now or _worker_is_dead(row["worker"])]
+            conn.executemany("UPDATE jobs SET status = 'pending', worker = NULL, lease_expires = NULL WHERE job_id = ?", stale)
+            retried = conn.execute(
+                "UPDATE jobs SET status = 'pending' WHERE status = 'failed' AND attempts < ?", (max_attempts,)
+            ).rowcount
+            return len(stale) + retried
+
+        return self._transaction(statements)
+
+    def get(self, job_id: str) -> dict | None:
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return self._decode(row) if row is not None else None
+
+    def records(self) -> Iterator[dict]:
+        """Stored records of finished jobs, in the order they were added."""
+        with self._lock:
+            rows = self._conn.execute("SELECT result FROM jobs WHERE status = 'done' ORDER BY created_at").fetchall()
+        for row in rows:
+            yield json.loads(row["result"])
+
+    def stats(self) -> dict:
+        """Jobs per status, checkpoints per stage, failures per stage and attempts."""
+        with self._lock:
+            totals = self._conn.execute(
+                """
+                SELECT COUNT(*) AS jobs,
+                    COUNT(ocr_output) AS ocr, COUNT(llm_output) AS llm, COUNT(result) AS result,
+                    COALESCE(SUM(attempts), 0) AS attempts,
+                    MIN(CASE WHEN status = 'pending' THEN created_at END) AS oldest_pending
+                FROM jobs
+                """
+            ).fetchone()
+            by_status = dict(self._conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+            failed_by_stage = dict(
+                self._conn.execute("SELECT error_stage, COUNT(*) FROM jobs WHERE status = 'failed' GROUP BY error_stage").fetchall()
+            )
+        return {
+            "jobs": totals["jobs"],
+            "status": {status: by_status.get(status, 0) for status in JOB_STATUSES},
+            "checkpoints": {"ocr": totals["ocr"], "llm": totals["llm"], "result": totals["result"]},
+            "failed_by_stage": failed_by_stage,
+            "attempts": totals["attempts"],
+            "oldest_pending_seconds": round(time.time() - totals["oldest_pending"], 3) if totals["oldest_pending"] else None,
+        }
+
+    def close(self) -> None:
+        self._conn.close()
+
+    @staticmethod
+    def _decode(row: sqlite3.Row) -> dict:
+        job = dict(row)
+        for column, _ in STAGES.values():
+            job[column] = json.loads(job[column]) if job[column] is not None else None
+        return job
+
+
+def get_job_store(db_path: str | Path | None = None) -> JobStore:
+    """
+    Open the job store at `db_path`, configured from the environment.
+
+    Environment variables:
+        JOB_STORE_PATH: Database used when `db_path` is not given (default `data/jobs.sqlite3`).
+        JOB_STORE_LEASE_SECONDS: How long a claim stays valid without a checkpoint (default 900).
+    """
+    return JobStore(
+        db_path or os.getenv("JOB_STORE_PATH", "data/jobs.sqlite3"),
+        lease_seconds=float(os.getenv("JOB_STORE_LEASE_SECONDS", "900")),
+    )
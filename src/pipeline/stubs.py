@@ -0,0 +1,143 @@
+import asyncio
+import json
+import os
+import time
+from pathlib import Path
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+from src.models import register_model, register_provider
+from src.ocr import split_doc_pages
+
+
+STUB_INVOICE = {
+    "invoice_id": "INV-0001",
+    "purchase_order_number": "PO-0001",
+    "invoice_date": "2025-01-01",
+    "invoice_due_date": "2025-01-31",
+    "invoice_total": 110.0,
+    "invoice_total_currency": "USD",
+    "invoice_vat_amount": 10.0,
+    "invoice_vat_rate": 0.1,
+    "buyer_name": "Buyer Name",
+    "buyer_address": {"street": "123 Main St", "city": "Anytown", "state": "CA", "postcode": "12345", "country": "US"},
+    "buyer_details": {"name": "Buyer Name", "email": "buyer@example.com", "phone": "+11234567890"},
+    "buyer_contact_name": "Buyer Contact Name",
+    "seller_name": "Seller Name",
+    "seller_address": {"street": "456 High St", "city": "Othertown", "state": "NY", "postcode": "54321", "country": "US"},
+    "seller_details": {"name": "Seller Name", "email": "seller@example.com", "phone": "+10987654321"},
+    "seller_contact_name": "Seller Contact Name",
+    "items": [
+        {
+            "cost_center": "1000",
+            "description": "Consulting services",
+            "quantity": 1.0,
+            "unit_price": 100.0,
+            "subtotal_price": 100.0,
+            "total_price": 110.0,
+            "vat_rate": 0.1,
+            "vat_amount": 10.0,
+            "currency": "USD",
+        }
+    ],
+    "metadata": {"language": ["en"], "confidence_score": 0.95},
+}
+
+STUB_MARKDOWN = """# INVOICE
+
+Invoice Number: INV-0001
+Invoice Date: 2025-01-01
+
+<table>
+<tr><th>Description</th><th>Qty</th><th>Unit Price</th><th>Total</th></tr>
+<tr><td>Consulting services</td><td>1</td><td>100.00</td><td>110.00</td></tr>
+</table>
+"""
+
+
+class StubChatModel(BaseChatModel):
+    """
+    Offline chat model returning a canned invoice JSON after a fixed delay.
+
+    Defaults can be set with the `STUB_LLM_LATENCY` (seconds) and `STUB_LLM_OUTPUT_TOKENS`
+    environment variables. Input tokens are approximated as four characters per token.
+    """
+
+    latency: float = float(os.getenv("STUB_LLM_LATENCY", "0.5"))
+    output_tokens: int = int(os.getenv("STUB_LLM_OUTPUT_TOKENS", "800"))
+    response: str = json.dumps(STUB_INVOICE, indent=2)
+    # Accepted like the real providers' setting; the stub never fails
+    max_retries: int = 0
+
+    @property
+    def _llm_type(self) -> str:
+        return "stub"
+
+    def _build_result(self, messages) -> ChatResult:
+        prompt_chars = sum(len(str(message.content)) for message in messages)
+        input_tokens = max(prompt_chars // 4, 1)
+        message = AIMessage(
+            content=f"```json\n{self.response}\n```",
+            usage_metadata={
+                "input_tokens": input_tokens,
+                "output_tokens": self.output_tokens,
+                "total_tokens": input_tokens + self.output_tokens,
+            },
+        )
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        time.sleep(self.latency)
+        return self._build_result(messages)
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        await asyncio.sleep(self.latency)
+        return self._build_result(messages)
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        # Spread the latency over the chunks and report usage on the last one, like the real providers
+        message = self._build_result(messages).generations[0].message
+        pieces = [message.content[i : i + 32] for i in range(0, len(message.content), 32)]
+        for i, piece in enumerate(pieces):
+            time.sleep(self.latency / len(pieces))
+            usage_metadata = message.usage_metadata if i == len(pieces) - 1 else None
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=piece, usage_metadata=usage_metadata))
+            if run_manager:
+                run_manager.on_llm_new_token(piece, chunk=chunk)
+            yield chunk
+
+
+def _build_stub(params: dict):
+    return StubChatModel(**params)
+
+
+def register_stub_models(**params) -> None:
+    """
+    Register the offline `stub` provider and a `stub` model built from `params`.
+
+    Called by the `--stub` code paths; further stub models can then be added with
+    `register_model(model, "stub", ...)`.
+    """
+    register_provider("stub", _build_stub)
+    register_model("stub", "stub", **params)
+
+
+def stub_ocr(pdf_url: str = None, pdf_path: str = None, latency: float = 0.2, filename: str = None, **kwargs) -> dict:
+    """
+    Offline stand-in for `parse_pdf_azure`.
+
+    Markdown files are returned as-is so recorded OCR output can be replayed; any other file gets a
+    canned single-page invoice.
+    """
+    time.sleep(latency)
+    source = Path(pdf_path or pdf_url or filename or "document.pdf")
+    if source.suffix.lower() == ".md" and source.exists():
+        doc_content = source.read_text(encoding="utf-8")
+    else:
+        doc_content = f"{STUB_MARKDOWN}\nSource: {source.name}\n"
+
+    doc_pages = split_doc_pages(doc_content, source_url=pdf_url)
+
+    return {"doc_slug": source.stem, "doc_pages": doc_pages, "doc_content": doc_content, "cache_hit": False}
@@ -0,0 +1,14 @@
+from .markdown_compaction import compact_doc_pages, compact_markdown, compact_pdf_output, is_table_row, table_to_rows
+from .page_triage import page_features, score_page, triage_pages, triage_pdf_output
+
+__all__ = [
+    "compact_doc_pages",
+    "compact_markdown",
+    "compact_pdf_output",
+    "is_table_row",
+    "page_features",
+    "score_page",
+    "table_to_rows",
+    "triage_pages",
+    "triage_pdf_output",
+]
@@ -0,0 +1,153 @@
+import re
+from collections import Counter
+from html.parser import HTMLParser
+
+TABLE_PATTERN = re.compile(r"<table>.*?</table>", re.DOTALL | re.IGNORECASE)
+PAGE_NUMBER_PATTERN = re.compile(r"<!--\s*PageNumber=.*?-->")
+INLINE_WHITESPACE_PATTERN = re.compile(r"[ \u00a0]+")
+BLANK_LINES_PATTERN = re.compile(r"\n{3,}")
+
+
+class _TableParser(HTMLParser):
+    """Collect the caption and rows of cell text from a single HTML table."""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.caption: list[str] = []
+        self.rows: list[list[str]] = []
+        self._cell: list[str] | None = None
+        self._colspan = 1
+        self._in_caption = False
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "tr":
+            self.rows.append([])
+        elif tag in ("td", "th"):
+            self._cell = []
+            self._colspan = int(dict(attrs).get("colspan") or 1)
+        elif tag == "caption":
+            self._in_caption = True
+
+    def handle_endtag(self, tag):
+        if tag in ("td", "th") and self._cell is not None:
+            if not self.rows:
+                self.rows.append([])
+            text = " ".join("".join(self._cell).split())
+            # Spanned columns become empty cells so values stay under their headers
+            self.rows[-1].extend([text] + [""] * (self._colspan - 1))
+            self._cell = None
+        elif tag == "caption":
+            self._in_caption = False
+
+    def handle_data(self, data):
+        if self._cell is not None:
+            self._cell.append(data)
+        elif self._in_caption:
+            self.caption.append(data)
+
+
+def table_to_rows(table_html: str, table_format: str = "pipe") -> str:
+    """
+    Convert an HTML table into compact text rows.
+
+    Args:
+        table_html: A single `<table>...</table>` block.
+        table_format: `pipe` for `| a | b |` rows or `tsv` for tab separated rows.
+
+    Returns:
+        The table caption (if any) followed by one line per row.
+    """
+    parser = _TableParser()
+    parser.feed(table_html)
+    parser.close()
+
+    lines = []
+    caption = " ".join("".join(parser.caption).split())
+    if caption:
+        lines.append(caption)
+
+    for row in parser.rows:
+        if not any(row):
+            continue
+        if table_format == "tsv":
+            lines.append("\t".join(cell.replace("\t", " ") for cell in row))
+        else:
+            lines.append("| " + " | ".join(cell.replace("|", "\\|") for cell in row) + " |")
+    return "\n".join(lines)
+
+
+def _collapse_whitespace(text: str) -> str:
+    lines = [INLINE_WHITESPACE_PATTERN.sub(" ", line).strip() for line in text.splitlines()]
+    return BLANK_LINES_PATTERN.sub("\n\n", "\n".join(lines)).strip()
+
+
+def is_table_row(line: str) -> bool:
+    """Whether `line` is a table row written by `table_to_rows`."""
+    return line.startswith("|") or "\t" in line
+
+
+def find_boilerplate_lines(pages: list[str], min_page_ratio: float = 0.5, min_length: int = 3) -> set[str]:
+    """
+    Return lines that repeat on at least `min_page_ratio` of the pages (and on at least two pages).
+
+    Table rows are never treated as boilerplate, so every page keeps its column headings.
+    """
+    if len(pages) < 2:
+        return set()
+
+    page_counts = Counter()
+    for page in pages:
+        page_counts.update({line for line in page.splitlines() if len(line) >= min_length and not is_table_row(line)})
+    min_pages = max(2, int(len(pages) * min_page_ratio + 0.5))
+    return {line for line, count in page_counts.items() if count >= min_pages}
+
+
+def compact_doc_pages(doc_pages: list[dict], table_format: str = "pipe", strip_boilerplate: bool = True) -> list[dict]:
+    """
+    Reduce the token count of OCR pages before they are sent to the LLM.
+
+    HTML tables on pages flagged with `has_table` become compact text rows, whitespace is collapsed,
+    page number markers are removed and lines repeated across most pages (page headers, footers and
+    letterheads) are kept only on the first page they appear on.
+
+    Args:
+        doc_pages: Pages as returned by `parse_pdf_azure`.
+        table_format: `pipe` or `tsv`, see `table_to_rows`.
+        strip_boilerplate: Whether to drop lines repeated across pages.
+
+    Returns:
+        Copies of the pages with compacted `content`.
+    """
+    compacted_pages = []
+    for page in doc_pages:
+        content = PAGE_NUMBER_PATTERN.sub("", page["content"])
+        if page.get("has_table"):
+            content = TABLE_PATTERN.sub(lambda match: "\n" + table_to_rows(match.group(0), table_format) + "\n", content)
+        compacted_pages.append(_collapse_whitespace(content))
+
+    if strip_boilerplate:
+        boilerplate = find_boilerplate_lines(compacted_pages)
+        seen: set[str] = set()
+        for i, content in enumerate(compacted_pages):
+            kept_lines = []
+            for line in content.splitlines():
+                if line in boilerplate:
+                    if line in seen:
+                        continue
+                    seen.add(line)
+                kept_lines.append(line)
+            compacted_pages[i] = _collapse_whitespace("\n".join(kept_lines))
+
+    return [page | {"content": content} for page, content in zip(doc_pages, compacted_pages)]
+
+
+def compact_markdown(doc_pages: list[dict], table_format: str = "pipe", strip_boilerplate: bool = True) -> str:
+    """Return the compacted document content with pages joined by page break markers."""
+    return compact_pdf_output({"doc_pages": doc_pages}, table_format, strip_boilerplate)["doc_content"]
+
+
+def compact_pdf_output(pdf_output: dict, table_format: str = "pipe", strip_boilerplate: bool = True) -> dict:
+    """Return a copy of a `parse_pdf_azure` result with compacted `doc_pages` and `doc_content`."""
+    doc_pages = compact_doc_pages(pdf_output["doc_pages"], table_format=table_format, strip_boilerplate=strip_boilerplate)
+    doc_content = "\n<!-- PageBreak -->\n".join(page["content"] for page in doc_pages)
+    return pdf_output | {"doc_pages": doc_pages, "doc_content": doc_content}
@@ -0,0 +1,105 @@
+import math
+import re
+
+TAG_PATTERN = re.compile(r"<[^>]+>")
+# Terms that name an invoice and its header fields
+HEADER_TERMS_PATTERN = re.compile(
+    r"\b(?:invoice|facture|rechnung|factura|fattura|bill(?:ed)? to|sold to|due date|date d'échéance|échéance|"
+    r"purchase order|bon de commande|po number|n° de commande)\b",
+    re.IGNORECASE,
+)
+# Terms of line item tables and totals
+ITEM_TERMS_PATTERN = re.compile(
+    r"\b(?:sub-?total|total(?: ht| ttc| due| amount)?|amount(?: due)?|montant|vat|tva|iva|mwst|tax|qty|quantity|qté|"
+    r"quantité|unit price|prix unitaire|p\.u|désignation|description)\b",
+    re.IGNORECASE,
+)
+# Terms of pages bundled with invoices that carry no invoice fields
+OTHER_TERMS_PATTERN = re.compile(
+    r"\b(?:terms and conditions|conditions générales|general terms|governing law|liabilit(?:y|ies)|responsabilité|"
+    r"article \d+|remittance (?:advice|slip)|please (?:detach|return)|à détacher|delivery note|bon de livraison|"
+    r"packing list|liste de colisage|gross weight|poids brut|received by|reçu par|dear|cher client|sincerely|"
+    r"cordialement|unsubscribe|newsletter|what's new|upgrade|privacy)\b",
+    re.IGNORECASE,
+)
+AMOUNT_PATTERN = re.compile(r"(?<![\d.,])\d{1,3}(?:[ ,.  ]?\d{3})*[.,]\d{2}(?![\d.,]?\d)")
+CURRENCY_PATTERN = re.compile(
+    r"[$€£¥]|\b(?:USD|EUR|GBP|CHF|JPY|CAD|AUD|NZD|MAD|AED|SAR|INR|CNY|SGD|HKD|SEK|NOK|DKK|PLN|ZAR|dirhams?)\b"
+)
+
+# Feature weights of the relevance score, a logistic function of the page features
+WEIGHTS = {
+    "bias": -3.0,
+    "header_terms": 1.2,
+    "item_terms": 0.5,
+    "other_terms": -1.5,
+    "amount_density": 2.5,
+    "currency_density": 1.0,
+    "numeric_density": 2.0,
+    "has_table": 0.8,
+}
+
+
+def page_features(page: dict) -> dict:
+    """
+    Cheap text features of one page of `parse_pdf_azure` output.
+
+    Term counts are capped so a long page cannot outweigh the others on a single feature, and the
+    amount and currency counts are scaled to 0-1 at 8 decimal amounts and 4 currency marks.
+    """
+    text = TAG_PATTERN.sub(" ", page["content"])
+    words = text.split()
+    return {
+        "header_terms": min(len(HEADER_TERMS_PATTERN.findall(text)), 3),
+        "item_terms": min(len(ITEM_TERMS_PATTERN.findall(text)), 6),
+        "other_terms": min(len(OTHER_TERMS_PATTERN.findall(text)), 4),
+        "amount_density": min(len(AMOUNT_PATTERN.findall(text)), 8) / 8,
+        "currency_density": min(len(CURRENCY_PATTERN.findall(text)), 4) / 4,
+        "numeric_density": sum(any(char.isdigit() for char in word) for word in words) / len(words) if words else 0.0,
+        "has_table": float(bool(page.get("has_table"))),
+    }
+
+
+def score_page(page: dict) -> float:
+    """Relevance of a page to invoice header and line item extraction, from 0 to 1."""
+    features = page_features(page)
+    z = WEIGHTS["bias"] + sum(WEIGHTS[name] * value for name, value in features.items())
+    return 1 / (1 + math.exp(-z))
+
+
+def triage_pages(doc_pages: list[dict], threshold: float = 0.5, fill_gaps: bool = True) -> list[dict]:
+    """
+    Keep the pages of `doc_pages` relevant to invoice extraction.
+
+    Pages scoring at least `threshold` are kept. With `fill_gaps`, a page between two kept pages is
+    kept too, since it is most likely a sparse continuation of the same table. When no page
+    reaches `threshold`, the highest scoring page is kept, so a document is never emptied.
+
+    Returns:
+        Copies of the kept pages, each with its `relevance` score.
+    """
+    scores = [score_page(page) for page in doc_pages]
+    keep = [score >= threshold for score in scores]
+    if fill_gaps:
+        kept_indexes = [i for i, kept in enumerate(keep) if kept]
+        if kept_indexes:
+            for i in range(kept_indexes[0], kept_indexes[-1] + 1):
+                keep[i] = keep[i] or (keep[i - 1] and any(keep[i + 1 :]))
+    if doc_pages and not any(keep):
+        keep[scores.index(max(scores))] = True
+    return [page | {"relevance": round(score, 4)} for page, score, kept in zip(doc_pages, scores, keep) if kept]
+
+
+def triage_pdf_output(pdf_output: dict, threshold: float = 0.5, fill_gaps: bool = True) -> dict:
+    """
+    Return a copy of a `parse_pdf_azure` result with only its relevant `doc_pages` and `doc_content`.
+
+    The numbers of the dropped pages are listed under `dropped_pages` and the page count of the
+    whole document under `total_pages`, since the kept pages keep their original numbers.
+    """
+    doc_pages = triage_pages(pdf_output["doc_pages"], threshold=threshold, fill_gaps=fill_gaps)
+    kept = {page["page"] for page in doc_pages}
+    dropped_pages = [page["page"] for page in pdf_output["doc_pages"] if page["page"] not in kept]
+    doc_content = "\n<!-- PageBreak -->\n".join(page["content"] for page in doc_pages)
+    total_pages = pdf_output.get("total_pages", len(pdf_output["doc_pages"]))
+    return pdf_output | {"doc_pages": doc_pages, "doc_content": doc_content, "dropped_pages": dropped_pages, "total_pages": total_pages}
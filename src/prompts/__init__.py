@@ -1,3 +1,5 @@
 from .process_invoice_prompt import process_invoice_prompt
+from .process_invoice_fields_prompt import process_invoice_fields_prompt
+from .process_invoice_items_prompt import process_invoice_items_prompt
 
-__all__ = ["process_invoice_prompt"]
+__all__ = ["process_invoice_fields_prompt", "process_invoice_items_prompt", "process_invoice_prompt"]
@@ -2,21 +2,30 @@ from langchain_core.prompts import ChatPromptTemplate, HumanMessagePromptTemplat
 from langchain_core.messages import SystemMessage
 
 
-def generate_prompt(system_prompt: str, human_prompt: str):
+def generate_prompt(system_prompt: str, human_prompt: str, document_prompt: str | None = None, cache_breakpoint: bool = False):
     """
     Generate a base prompt for the LLM.
 
+    The human message is laid out for provider prefix caching: `human_prompt` holds the static
+    instructions and `document_prompt` everything that varies per call, in a separate text block
+    after it, so every call shares the same prefix up to the document.
+
     Args:
         system_prompt: The system prompt for the LLM.
         human_prompt: The human prompt for the LLM.
+        document_prompt: The per-call part of the human prompt, such as the invoice details.
+        cache_breakpoint: Mark the end of `human_prompt` with an Anthropic `cache_control` breakpoint.
     """
+    static_block = {"type": "text", "text": human_prompt}
+    if cache_breakpoint:
+        static_block["cache_control"] = {"type": "ephemeral"}
+    template = [static_block]
+    if document_prompt is not None:
+        template.append({"type": "text", "text": document_prompt})
+
     prompt_messages = [
         SystemMessage(content=system_prompt),
-        HumanMessagePromptTemplate.from_template(
-            template=[
-                {"type": "text", "text": human_prompt},
-            ]
-        ),
+        HumanMessagePromptTemplate.from_template(template=template),
     ]
 
     prompt_template = ChatPromptTemplate(messages=prompt_messages)
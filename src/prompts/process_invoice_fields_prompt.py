@@ -0,0 +1,94 @@
+from functools import lru_cache
+
+from src.prompts.base_prompt import generate_prompt
+
+FIELD_FORMATS = {
+    "invoice_id": '"invoice_id": <string>, # this is the invoice number',
+    "purchase_order_number": '"purchase_order_number": <string>, # this is the purchase order number',
+    "invoice_date": '"invoice_date": <string>, # this is the invoice date',
+    "invoice_due_date": '"invoice_due_date": <string>, # this is the invoice due date',
+    "invoice_total": '"invoice_total": <float>, # this is the total price after VAT',
+    "invoice_total_currency": '"invoice_total_currency": <string>, # this is the currency of the invoice',
+    "invoice_vat_amount": '"invoice_vat_amount": <float>, # this is the amount of VAT',
+    "invoice_vat_rate": '"invoice_vat_rate": <float>, # in decimal format i.e. 0.10 for 10%',
+    "buyer_name": '"buyer_name": <string>,',
+    "buyer_address": (
+        '"buyer_address": {{"street": <string>, "city": <string>, "state": <string>, "postcode": <string>, '
+        '"country": <string>}}, # country in 2 character ISO code'
+    ),
+    "buyer_details": '"buyer_details": {{"name": <string>, "email": <string>, "phone": <string>}},',
+    "buyer_contact_name": '"buyer_contact_name": <string>,',
+    "seller_name": '"seller_name": <string>, # this is the company name of the seller / supplier',
+    "seller_address": (
+        '"seller_address": {{"street": <string>, "city": <string>, "state": <string>, "postcode": <string>, '
+        '"country": <string>}}, # country in 2 character ISO code'
+    ),
+    "seller_details": '"seller_details": {{"name": <string>, "email": <string>, "phone": <string>}},',
+    "seller_contact_name": '"seller_contact_name": <string>,',
+    "items": (
+        '"items": [{{"cost_center": <string>, "description": <string>, "quantity": <float>, "unit_price": <float>, '
+        '"subtotal_price": <float>, "total_price": <float>, "vat_rate": <float>, "vat_amount": <float>, '
+        '"currency": <string>}}], # subtotal_price is before VAT, total_price is after VAT'
+    ),
+    "metadata": (
+        '"metadata": {{"language": <list of strings>, "confidence_score": <float>}}, '
+        "# language in 2 character ISO code, confidence_score of the extraction from 0 to 1"
+    ),
+}
+
+
+def process_invoice_fields_prompt(fields: list[str], cache_breakpoint: bool = False):
+    """
+    Build a prompt that extracts only `fields` of `ProcessInvoiceResult`.
+
+    Used when most fields are already known (for example from Azure's prebuilt invoice model), so the
+    model only has to produce the missing ones. Prompts are compiled once per field list.
+    """
+    return _process_invoice_fields_prompt(tuple(fields), cache_breakpoint)
+
+
+@lru_cache(maxsize=256)
+def _process_invoice_fields_prompt(fields: tuple[str, ...], cache_breakpoint: bool):
+    unknown_fields = [field for field in fields if field not in FIELD_FORMATS]
+    if unknown_fields:
+        raise ValueError(f"Unknown invoice fields: {unknown_fields}")
+
+    output_format = "\n        ".join(FIELD_FORMATS[field] for field in fields)
+
+    system_prompt = """
+    You are a professional invoice processing specialist.
+    """
+    human_prompt = f"""
+    <role>
+    You are a professional invoice processing specialist.
+    </role>
+
+    <context>
+    - You will be provided with a B2B invoice originally in PDF format but parsed into a markdown format in the invoice_details section.
+    - The other invoice fields have already been extracted; only extract the fields in output_format.
+    </context>
+
+    <instructions>
+    1. Identify the language the invoice is in. If the invoice is not in English, translate it into English.
+    2. Extract the data points from the invoice based on the output_format provided.
+    3. If the data points are not found, return None for that data point.
+    4. If the data points are not clear or value confidence level is less than 0.8, return None for that data point.
+    5. Only return the JSON output format, no other text or comments.
+    </instructions>
+
+    <output_format>
+    Provide JSON in this exact structure:
+    {{{{
+        {output_format}
+    }}}}
+    </output_format>
+    """
+    document_prompt = """
+    <invoice_details format="markdown">
+    {invoice_details}
+    </invoice_details>
+    """
+
+    prompt = generate_prompt(system_prompt, human_prompt, document_prompt, cache_breakpoint)
+
+    return prompt
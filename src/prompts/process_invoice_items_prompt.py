@@ -0,0 +1,65 @@
+from functools import lru_cache
+
+from src.prompts.base_prompt import generate_prompt
+
+
+@lru_cache(maxsize=None)
+def process_invoice_items_prompt(cache_breakpoint: bool = False):
+    """
+    Build the line item prompt for one page group; compiled once per `cache_breakpoint` and shared.
+
+    The page range goes after the instructions, so every page group of every invoice shares them
+    as a cacheable prefix.
+    """
+    system_prompt = """
+    You are a professional invoice processing specialist.
+    """
+    human_prompt = """
+    <role>
+    You are a professional invoice processing specialist.
+    </role>
+
+    <context>
+    - You will be provided with some pages of a B2B invoice originally in PDF format but parsed into a markdown format in the invoice_details section. The page_range section says which pages.
+    - Other pages of the invoice are processed separately, so only extract what appears on these pages.
+    </context>
+
+    <instructions>
+    1. Identify the language the invoice is in. If the invoice is not in English, translate the descriptions into English.
+    2. Extract every line item that appears on these pages based on the output_format provided.
+    3. Do not extract subtotal, tax or grand total rows as line items.
+    4. If the data points are not found, return None for that data point.
+    5. If the pages contain no line items, return an empty items list.
+    6. Only return the JSON output format, no other text or comments.
+    </instructions>
+
+    <output_format>
+    Provide JSON in this exact structure:
+    {{
+        "items": [
+            {{
+                "cost_center": <string>, # this refers to the cost center which the item is charged to
+                "description": <string>, # translate to english where possible
+                "quantity": <float>,
+                "unit_price": <float>,
+                "subtotal_price": <float>, # this is the price before VAT
+                "total_price": <float>, # this is the price after VAT
+                "vat_rate": <float>,
+                "vat_amount": <float>,
+                "currency": <string>,
+            }}
+        ]
+    }}
+    </output_format>
+    """
+    document_prompt = """
+    <page_range>{page_range}</page_range>
+
+    <invoice_details format="markdown">
+    {invoice_details}
+    </invoice_details>
+    """
+
+    prompt = generate_prompt(system_prompt, human_prompt, document_prompt, cache_breakpoint)
+
+    return prompt
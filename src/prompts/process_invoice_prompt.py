@@ -1,7 +1,16 @@
+from functools import lru_cache
+
 from src.prompts.base_prompt import generate_prompt
 
 
-def process_invoice_prompt():
+@lru_cache(maxsize=None)
+def process_invoice_prompt(cache_breakpoint: bool = False):
+    """
+    Build the full invoice extraction prompt; compiled once per `cache_breakpoint` and shared.
+
+    Args:
+        cache_breakpoint: Mark the static instructions with an Anthropic `cache_control` breakpoint.
+    """
     system_prompt = """
     You are a professional invoice processing specialist.
     """
@@ -139,12 +148,13 @@ def process_invoice_prompt():
         }}
     }}
     </example>
-
+    """
+    document_prompt = """
     <invoice_details format="markdown">
     {invoice_details}
     </invoice_details>
     """
 
-    prompt = generate_prompt(system_prompt, human_prompt)
+    prompt = generate_prompt(system_prompt, human_prompt, document_prompt, cache_breakpoint)
 
     return prompt
@@ -0,0 +1,3 @@
+from .ingestion import SERVICE_KEY, IngestionService, create_app
+
+__all__ = ["IngestionService", "SERVICE_KEY", "create_app"]
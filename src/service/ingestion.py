@@ -0,0 +1,296 @@
+import asyncio
+import hmac
+import inspect
+import json
+import os
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from itertools import islice
+from typing import Callable
+
+from aiohttp import web
+from dotenv import load_dotenv
+
+from src.chains import extract_invoice
+from src.ocr import close_ocr_scheduler, parse_pdf_azure
+from src.pipeline.job_queue import InvoiceJob, InvoiceJobQueue
+
+load_dotenv()
+
+
+def _dumps(value) -> str:
+    return json.dumps(value, ensure_ascii=False, default=str)
+
+
+def _job_status(job: InvoiceJob) -> dict:
+    return {
+        "job_id": job.job_id,
+        "filename": job.filename,
+        "status": job.status,
+        "submitted_at": job.submitted_at,
+        "started_at": job.started_at,
+        "finished_at": job.finished_at,
+        "seconds": round(job.seconds, 3) if job.seconds is not None else None,
+        "error": job.error,
+        "status_url": f"/invoices/{job.job_id}",
+        "result_url": f"/invoices/{job.job_id}/result",
+    }
+
+
+class IngestionService:
+    """
+    HTTP front end to OCR and extraction, with a bounded in-process work queue.
+
+    Submitted PDFs become jobs keyed by the SHA-256 of their bytes (submitting a document again
+    returns its existing job unless it failed) and wait in a queue of `queue_size` jobs that
+    `workers` tasks drain. When the queue is full, submissions are answered with 429 and a
+    `Retry-After` header instead of buffering without limit. Documents up to `sync_max_bytes` can
+    be submitted with `?sync=true`, which waits up to `sync_timeout` seconds for the result.
+
+    Endpoints:
+        POST /invoices: PDF as the raw body (`?filename=` optional) or a multipart `file` field.
+        GET /invoices/{job_id}: Job status.
+        GET /invoices/{job_id}/result: 200 with the result, 202 while running, 422 if it failed.
+        GET /health: Queue depth and jobs per status.
+
+    Args:
+        workers: Documents processed concurrently (default `INVOICE_SERVICE_WORKERS`, 4).
+        queue_size: Jobs waiting for a worker before 429 (default `INVOICE_SERVICE_QUEUE_SIZE`, 64).
+        model: Model passed to `extract_fn`.
+        ocr_fn: Callable with the `parse_pdf_azure` signature, given the PDF as `pdf_bytes`.
+            Coroutine functions such as `aparse_pdf_azure` are awaited on the event loop.
+        extract_fn: Callable with the `extract_invoice` signature.
+        sync_max_bytes: Largest document accepted in synchronous mode (default
+            `INVOICE_SERVICE_SYNC_MAX_BYTES`, 2 MB).
+        sync_timeout: Seconds a synchronous request waits before answering 202 instead.
+        max_jobs: Finished jobs kept for status and result requests; the oldest are dropped first.
+    """
+
+    def __init__(
+        self,
+        workers: int | None = None,
+        queue_size: int | None = None,
+        model: str = "azure-gpt-4.1",
+        ocr_fn: Callable = parse_pdf_azure,
+        extract_fn: Callable = extract_invoice,
+        sync_max_bytes: int | None = None,
+        sync_timeout: float = 60.0,
+        max_jobs: int = 10_000,
+    ):
+        self.workers = workers or int(os.getenv("INVOICE_SERVICE_WORKERS", "4"))
+        self.queue_size = queue_size or int(os.getenv("INVOICE_SERVICE_QUEUE_SIZE", "64"))
+        self.model = model
+        self.ocr_fn = ocr_fn
+        self.extract_fn = extract_fn
+        self.sync_max_bytes = sync_max_bytes or int(os.getenv("INVOICE_SERVICE_SYNC_MAX_BYTES", str(2 * 1024 * 1024)))
+        self.sync_timeout = sync_timeout
+        self.max_jobs = max_jobs
+        self.stats = {"submitted": 0, "deduplicated": 0, "rejected": 0, "completed": 0, "failed": 0}
+        self._async_ocr = inspect.iscoroutinefunction(ocr_fn)
+        self._jobs: OrderedDict[str, InvoiceJob] = OrderedDict()
+        self._finished: dict[str, asyncio.Event] = {}
+        self._queue: asyncio.Queue | None = None
+        self._tasks: list[asyncio.Task] = []
+        self._executor: ThreadPoolExecutor | None = None
+
+    async def start(self, app: web.Application | None = None) -> None:
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        self._executor = ThreadPoolExecutor(max_workers=self.workers * 2, thread_name_prefix="invoice-service")
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self, app: web.Application | None = None) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        if self._async_ocr:
+            await close_ocr_scheduler()
+
+    def submit(self, pdf_bytes: bytes, filename: str) -> tuple[InvoiceJob, bool]:
+        """
+        Queue a document and return its job and whether it was newly queued.
+
+        Raises:
+            asyncio.QueueFull: When the queue has no room for a new job.
+        """
+        job_id = InvoiceJobQueue.make_job_id(pdf_bytes)
+        job = self._jobs.get(job_id)
+        if job is not None and job.status != "error":
+            self.stats["deduplicated"] += 1
+            return job, False
+
+        job = InvoiceJob(job_id, filename, pdf_bytes)
+        try:
+            self._queue.put_nowait(job)
+        except asyncio.QueueFull:
+            self.stats["rejected"] += 1
+            raise
+        self._jobs[job_id] = job
+        self._jobs.move_to_end(job_id)
+        self._finished[job_id] = asyncio.Event()
+        self.stats["submitted"] += 1
+        self._evict()
+        return job, True
+
+    def get(self, job_id: str) -> InvoiceJob | None:
+        return self._jobs.get(job_id)
+
+    async def wait(self, job: InvoiceJob, timeout: float) -> bool:
+        """Wait until `job` finishes or `timeout` passes; return whether it finished."""
+        finished = self._finished.get(job.job_id)
+        if finished is not None:
+            try:
+                await asyncio.wait_for(finished.wait(), timeout)
+            except asyncio.TimeoutError:
+                return False
+        return job.finished
+
+    def health(self) -> dict:
+        statuses: dict[str, int] = {}
+        for job in self._jobs.values():
+            statuses[job.status] = statuses.get(job.status, 0) + 1
+        return {
+            "workers": self.workers,
+            "queue_depth": self._queue.qsize(),
+            "queue_size": self.queue_size,
+            "jobs": statuses,
+            **self.stats,
+        }
+
+    def _evict(self) -> None:
+        excess = len(self._jobs) - self.max_jobs
+        if excess <= 0:
+            return
+        # Jobs are in submission order, so the first finished ones are the oldest
+        finished = (job_id for job_id, job in self._jobs.items() if job.finished)
+        for job_id in list(islice(finished, excess)):
+            del self._jobs[job_id]
+
+    async def _worker(self) -> None:
+        while True:
+            job = await self._queue.get()
+            try:
+                await self._process(job)
+            finally:
+                self._queue.task_done()
+
+    async def _process(self, job: InvoiceJob) -> None:
+        loop = asyncio.get_running_loop()
+        job.started_at = time.time()
+        try:
+            job.status = "ocr"
+            ocr_call = partial(self.ocr_fn, pdf_bytes=job.pdf_bytes, filename=job.filename)
+            pdf_output = await ocr_call() if self._async_ocr else await loop.run_in_executor(self._executor, ocr_call)
+            if not pdf_output:
+                raise ValueError("Unable to parse the PDF")
+
+            job.status = "extracting"
+            invoice_output = await loop.run_in_executor(self._executor, partial(self.extract_fn, pdf_output, model=self.model))
+            job.result = {
+                "pages": len(pdf_output["doc_pages"]),
+                "content": invoice_output["content"],
+                "usage_metadata": invoice_output["usage_metadata"],
+            }
+            job.status = "done"
+            self.stats["completed"] += 1
+        except Exception as exc:
+            job.error = str(exc)
+            job.status = "error"
+            self.stats["failed"] += 1
+        finally:
+            job.finished_at = time.time()
+            job.pdf_bytes = None
+            self._finished.pop(job.job_id).set()
+
+    async def _read_upload(self, request: web.Request) -> tuple[bytes, str]:
+        if request.content_type.startswith("multipart/"):
+            reader = await request.multipart()
+            async for part in reader:
+                if part.name == "file":
+                    return bytes(await part.read()), part.filename or "document.pdf"
+            raise web.HTTPBadRequest(reason="Multipart upload without a 'file' field")
+        return await request.read(), request.query.get("filename", "document.pdf")
+
+    async def handle_submit(self, request: web.Request) -> web.Response:
+        pdf_bytes, filename = await self._read_upload(request)
+        if not pdf_bytes:
+            return web.json_response({"error": "Empty document"}, status=400)
+        sync = request.query.get("sync", "").lower() in ("1", "true", "yes")
+        if sync and len(pdf_bytes) > self.sync_max_bytes:
+            return web.json_response(
+                {"error": f"Documents over {self.sync_max_bytes} bytes must be submitted asynchronously"}, status=413
+            )
+
+        try:
+            job, _ = self.submit(pdf_bytes, filename)
+        except asyncio.QueueFull:
+            return web.json_response({"error": "Queue is full, retry later"}, status=429, headers={"Retry-After": "1"})
+
+        if sync and await self.wait(job, self.sync_timeout):
+            return self._result_response(job)
+        return web.json_response(_job_status(job), status=202, headers={"Location": f"/invoices/{job.job_id}"})
+
+    async def handle_status(self, request: web.Request) -> web.Response:
+        job = self.get(request.match_info["job_id"])
+        if job is None:
+            return web.json_response({"error": "Unknown job"}, status=404)
+        return web.json_response(_job_status(job))
+
+    async def handle_result(self, request: web.Request) -> web.Response:
+        job = self.get(request.match_info["job_id"])
+        if job is None:
+            return web.json_response({"error": "Unknown job"}, status=404)
+        return self._result_response(job)
+
+    async def handle_health(self, request: web.Request) -> web.Response:
+        return web.json_response(self.health())
+
+    def _result_response(self, job: InvoiceJob) -> web.Response:
+        if job.status == "done":
+            return web.json_response({"job_id": job.job_id, "status": job.status, **job.result}, dumps=_dumps)
+        if job.status == "error":
+            return web.json_response(_job_status(job), status=422)
+        return web.json_response(_job_status(job), status=202)
+
+
+SERVICE_KEY = web.AppKey("service", IngestionService)
+
+
+def token_middleware(token: str):
+    """Require `Authorization: Bearer <token>` on every route but `/health`."""
+    expected = f"Bearer {token}".encode()
+
+    @web.middleware
+    async def check_token(request: web.Request, handler):
+        if request.path != "/health" and not hmac.compare_digest(request.headers.get("Authorization", "").encode(), expected):
+            return web.json_response({"error": "Unauthorized"}, status=401, headers={"WWW-Authenticate": "Bearer"})
+        return await handler(request)
+
+    return check_token
+
+
+def create_app(
+    service: IngestionService | None = None, max_upload_mb: float | None = None, token: str | None = None
+) -> web.Application:
+    """
+    Build the aiohttp application; the service's workers start and stop with it.
+
+    With a `token` (default `INVOICE_SERVICE_TOKEN`), requests other than `GET /health` must send it
+    as `Authorization: Bearer <token>` and are answered 401 otherwise.
+    """
+    service = service or IngestionService()
+    max_upload_mb = max_upload_mb or float(os.getenv("INVOICE_SERVICE_MAX_UPLOAD_MB", "50"))
+    token = token or os.getenv("INVOICE_SERVICE_TOKEN")
+    app = web.Application(
+        client_max_size=int(max_upload_mb * 1024 * 1024), middlewares=[token_middleware(token)] if token else []
+    )
+    app[SERVICE_KEY] = service
+    app.on_startup.append(service.start)
+    app.on_cleanup.append(service.stop)
+    app.router.add_post("/invoices", service.handle_submit)
+    app.router.add_get("/invoices/{job_id}", service.handle_status)
+    app.router.add_get("/invoices/{job_id}/result", service.handle_result)
+    app.router.add_get("/health", service.handle_health)
+    return app
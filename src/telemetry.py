@@ -0,0 +1,238 @@
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+# Upper bounds in seconds, from sub-millisecond parsing up to long OCR/LLM calls
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+_enabled = os.getenv("INVOICE_TELEMETRY", "on").lower() not in ("off", "none", "0", "false")
+_current_spans: ContextVar[list | None] = ContextVar("invoice_spans", default=None)
+
+
+class Histogram:
+    """Cumulative-bucket latency histogram in the Prometheus layout."""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, seconds: float) -> None:
+        self.counts[bisect_left(self.buckets, seconds)] += 1
+        self.sum += seconds
+        self.count += 1
+
+    def quantile(self, q: float) -> float | None:
+        """Approximate quantile: the upper bound of the bucket holding it."""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip((*self.buckets, float("inf")), self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float("inf")
+
+
+_histograms: dict[str, Histogram] = {}
+_histograms_lock = threading.Lock()
+# Model -> [output tokens, seconds, calls] of the LLM calls seen by this process
+_output_rates: dict[str, list] = {}
+
+
+class _NoopSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def set(self, **attributes) -> None:
+        pass
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+class _Span:
+    __slots__ = ("name", "attributes", "_start_unix", "_started")
+
+    def __init__(self, name: str, attributes: dict | None):
+        self.name = name
+        self.attributes = attributes
+
+    def __enter__(self):
+        self._start_unix = time.time()
+        self._started = time.perf_counter()
+        return self
+
+    def set(self, **attributes) -> None:
+        """Add attributes known only once the stage has run, such as token counts."""
+        self.attributes = (self.attributes or {}) | attributes
+
+    def __exit__(self, exc_type, exc, tb):
+        record_span(self.name, time.perf_counter() - self._started, self._start_unix, self.attributes, error=exc_type is not None)
+        return False
+
+
+def set_telemetry_enabled(enabled: bool) -> None:
+    """Turn span recording on or off (also set by `INVOICE_TELEMETRY=off`)."""
+    global _enabled
+    _enabled = enabled
+
+
+def telemetry_enabled() -> bool:
+    return _enabled
+
+
+def span(name: str, **attributes):
+    """
+    Time a pipeline stage: `with span("ocr_poll"): ...`.
+
+    The duration goes into the stage's histogram and, inside `collect_spans`, onto the collected
+    list. When telemetry is disabled a shared no-op context manager is returned.
+    """
+    if not _enabled:
+        return _NOOP_SPAN
+    return _Span(name, attributes or None)
+
+
+def record_span(name: str, seconds: float, start_unix: float | None = None, attributes: dict | None = None, error: bool = False) -> None:
+    """Record a stage duration measured by the caller, such as an LLM time to first token."""
+    if not _enabled:
+        return
+    with _histograms_lock:
+        histogram = _histograms.get(name)
+        if histogram is None:
+            histogram = _histograms[name] = Histogram()
+        histogram.observe(seconds)
+
+    spans = _current_spans.get()
+    if spans is not None:
+        entry = {"name": name, "start": round(start_unix if start_unix is not None else time.time() - seconds, 6), "seconds": round(seconds, 6)}
+        if attributes:
+            entry["attributes"] = attributes
+        if error:
+            entry["error"] = True
+        spans.append(entry)
+
+
+@contextmanager
+def collect_spans():
+    """Collect the spans recorded in this context (and passed to nested collectors) into a list."""
+    spans: list[dict] = []
+    token = _current_spans.set(spans)
+    try:
+        yield spans
+    finally:
+        _current_spans.reset(token)
+        parent = _current_spans.get()
+        if parent is not None:
+            parent.extend(spans)
+
+
+def call_with_spans(fn, *args, **kwargs) -> tuple[object, list[dict]]:
+    """Call `fn` and return its result with the spans it recorded; for work handed to executor threads."""
+    with collect_spans() as spans:
+        return fn(*args, **kwargs), spans
+
+
+async def acall_with_spans(fn, *args, **kwargs) -> tuple[object, list[dict]]:
+    """Async variant of `call_with_spans`."""
+    with collect_spans() as spans:
+        return await fn(*args, **kwargs), spans
+
+
+def record_output_rate(model: str, output_tokens: int | None, seconds: float) -> None:
+    """Record the output tokens and duration of an `llm_total` call to measure `model`'s throughput."""
+    if not _enabled or not output_tokens or seconds <= 0:
+        return
+    with _histograms_lock:
+        rate = _output_rates.setdefault(model, [0, 0.0, 0])
+        rate[0] += output_tokens
+        rate[1] += seconds
+        rate[2] += 1
+
+
+def measured_output_rate(model: str, min_calls: int = 5) -> float | None:
+    """
+    Output tokens per second of `model` over the calls recorded so far, or None before `min_calls`.
+
+    The call durations include time to first token, so this underestimates generation speed.
+    """
+    with _histograms_lock:
+        tokens, seconds, calls = _output_rates.get(model, (0, 0.0, 0))
+    return tokens / seconds if calls >= min_calls else None
+
+
+def get_stage_stats() -> dict:
+    """Count, total, mean and approximate p50/p95/p99 seconds per stage."""
+    with _histograms_lock:
+        histograms = dict(_histograms)
+    return {
+        name: {
+            "count": histogram.count,
+            "sum_seconds": round(histogram.sum, 6),
+            "mean_seconds": round(histogram.sum / histogram.count, 6) if histogram.count else None,
+            "p50_seconds": histogram.quantile(0.5),
+            "p95_seconds": histogram.quantile(0.95),
+            "p99_seconds": histogram.quantile(0.99),
+        }
+        for name, histogram in sorted(histograms.items())
+    }
+
+
+def render_prometheus(metric: str = "invoice_stage_duration_seconds") -> str:
+    """Render the stage histograms in the Prometheus text exposition format."""
+    with _histograms_lock:
+        histograms = sorted(_histograms.items())
+    lines = [
+        f"# HELP {metric} Duration of invoice pipeline stages in seconds.",
+        f"# TYPE {metric} histogram",
+    ]
+    for name, histogram in histograms:
+        cumulative = 0
+        for bound, count in zip((*histogram.buckets, float("inf")), histogram.counts):
+            cumulative += count
+            le = "+Inf" if bound == float("inf") else repr(bound)
+            lines.append(f'{metric}_bucket{{stage="{name}",le="{le}"}} {cumulative}')
+        lines.append(f'{metric}_sum{{stage="{name}"}} {histogram.sum}')
+        lines.append(f'{metric}_count{{stage="{name}"}} {histogram.count}')
+    return "\n".join(lines) + "\n"
+
+
+def reset_stage_stats() -> None:
+    with _histograms_lock:
+        _histograms.clear()
+        _output_rates.clear()
+
+
+def export_otel_spans(spans: list[dict], parent_name: str = "invoice", attributes: dict | None = None, tracer=None) -> None:
+    """
+    Emit collected spans as OpenTelemetry spans under one parent span.
+
+    Uses the globally configured tracer provider unless `tracer` is given. Requires the
+    `opentelemetry-api` package.
+    """
+    if not spans:
+        return
+    from opentelemetry import trace
+
+    tracer = tracer or trace.get_tracer("invoice-processing")
+    start_ns = int(min(entry["start"] for entry in spans) * 1e9)
+    end_ns = int(max(entry["start"] + entry["seconds"] for entry in spans) * 1e9)
+    parent = tracer.start_span(parent_name, start_time=start_ns, attributes=attributes)
+    context = trace.set_span_in_context(parent)
+    for entry in spans:
+        child = tracer.start_span(
+            entry["name"], context=context, start_time=int(entry["start"] * 1e9), attributes=entry.get("attributes")
+        )
+        if entry.get("error"):
+            child.set_status(trace.Status(trace.StatusCode.ERROR))
+        child.end(end_time=int((entry["start"] + entry["seconds"]) * 1e9))
+    parent.end(end_time=end_ns)
@@ -1,15 +1,130 @@
-import requests
+import io
+import os
 import tempfile
+from functools import lru_cache
 from pathlib import Path
+from typing import BinaryIO, Union
 
+from src.telemetry import span
+
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+DOWNLOAD_TIMEOUT = float(os.getenv("PDF_DOWNLOAD_TIMEOUT", "60"))
+
+DocumentSource = Union[bytes, bytearray, memoryview, BinaryIO]
+
+
+@lru_cache(maxsize=1)
+def _get_http_session():
+    import requests
+    from requests.adapters import HTTPAdapter
+
+    # Shared across downloads so connections to the same host are kept alive and reused
+    pool_size = int(os.getenv("PDF_DOWNLOAD_POOL_SIZE", "16"))
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def _iter_download(url: str):
+    with _get_http_session().get(url, stream=True, timeout=DOWNLOAD_TIMEOUT) as response:
+        response.raise_for_status()
+        yield from response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE)
 
-def download_pdf(url: str) -> Path:
-    """Download PDF from URL to temporary file."""
-    response = requests.get(url)
-    response.raise_for_status()
 
-    temp_file = tempfile.NamedTemporaryFile(delete=False, suffix=".pdf")
-    temp_file.write(response.content)
-    temp_file.close()
+def fetch_pdf(url: str) -> bytearray:
+    """Download a PDF into memory, streamed in chunks through the shared HTTP session."""
+    content = bytearray()
+    with span("download_pdf"):
+        for chunk in _iter_download(url):
+            content += chunk
+    return content
+
+
+def download_pdf(url: str) -> Path:
+    """Download PDF from URL to temporary file, streamed in chunks so the response is never held whole."""
+    with span("download_pdf"):
+        with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as temp_file:
+            try:
+                for chunk in _iter_download(url):
+                    temp_file.write(chunk)
+            except BaseException:
+                temp_file.close()
+                Path(temp_file.name).unlink(missing_ok=True)
+                raise
 
     return Path(temp_file.name)
+
+
+def read_document(source: DocumentSource) -> bytes | bytearray | memoryview:
+    """
+    Return the content of an in-memory document without copying it where possible.
+
+    Bytes, bytearrays and memoryviews are returned as-is; binary file-like objects are read from
+    their current position (an unread `BytesIO` shares its buffer instead).
+    """
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return source
+    if isinstance(source, io.BytesIO) and source.tell() == 0:
+        return source.getvalue()
+    return source.read()
+
+
+@lru_cache(maxsize=1)
+def _get_token_encoding():
+    try:
+        import tiktoken
+
+        return tiktoken.get_encoding("o200k_base")
+    except Exception:
+        return None
+
+
+def count_tokens(text: str) -> int:
+    """Count tokens locally with tiktoken, falling back to ~4 characters per token if unavailable."""
+    encoding = _get_token_encoding()
+    if encoding is None:
+        return len(text) // 4
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def prompt_cache_tokens(usage_metadata: dict) -> tuple[int, int]:
+    """
+    Input tokens read from and written to the provider's prompt cache, from LangChain usage metadata.
+
+    Both are already included in `input_tokens`. Anthropic reports writes per cache lifetime.
+    """
+    details = usage_metadata.get("input_token_details") or {}
+    cache_read = details.get("cache_read") or 0
+    cache_write = sum(details.get(key) or 0 for key in ("cache_creation", "ephemeral_5m_input_tokens", "ephemeral_1h_input_tokens"))
+    return cache_read, cache_write
+
+
+def flatten_invoice_output(invoice_content: dict) -> list[dict]:
+    """Flatten nested invoice output for CSV export."""
+
+    def _flatten_dict(data: dict, parent_key: str = "", sep: str = "_") -> dict:
+        flat: dict[str, object] = {}
+        for key, value in data.items():
+            new_key = f"{parent_key}{sep}{key}" if parent_key else key
+            if isinstance(value, dict):
+                flat.update(_flatten_dict(value, new_key, sep=sep))
+            else:
+                flat[new_key] = value
+        return flat
+
+    base_keys = {k: v for k, v in invoice_content.items() if k != "items"}
+    base_flat = _flatten_dict(base_keys)
+    items = invoice_content.get("items") or []
+
+    if not items:
+        return [base_flat] if base_flat else []
+
+    flattened_rows: list[dict] = []
+    for item in items:
+        item_flat = _flatten_dict(item or {}, parent_key="item")
+        row = base_flat | item_flat
+        flattened_rows.append(row)
+
+    return flattened_rows
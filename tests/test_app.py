@@ -0,0 +1,31 @@
+import pytest
+
+pytest.importorskip("streamlit")
+from streamlit.testing.v1 import AppTest  # noqa: E402
+
+
+def _render_running_job():
+    import streamlit as st
+
+    import app
+    from src.pipeline import InvoiceJob
+
+    job = InvoiceJob("a" * 64, "invoice.pdf", b"")
+    job.status = "extracting"
+    job.partial.update({"invoice_id": "INV-9", "seller_name": "ACME"})
+    job.partial_items.append({"description": "Widget", "quantity": 2, "total_price": 5.0})
+    app.get_job_queue()._jobs[job.job_id] = job
+    st.session_state.job_ids = {job.job_id}
+    app.render_job_status([job.job_id], True)
+
+
+def test_running_job_renders_streamed_fields_and_items():
+    at = AppTest.from_function(_render_running_job, default_timeout=60)
+    at.session_state["authenticated"] = True
+    at.run()
+
+    assert not at.exception
+    fields = {text_input.label: text_input.value for text_input in at.text_input}
+    assert fields["Invoice ID"] == "INV-9"
+    assert fields["Seller Name"] == "ACME"
+    assert list(at.dataframe[-1].value["Description"]) == ["Widget"]
@@ -0,0 +1,36 @@
+import asyncio
+
+from benchmarks.fake_di_server import FakeDocumentIntelligence, start_server
+from src.ocr import AsyncOcrScheduler
+
+
+def count_acquires(bucket) -> list[int]:
+    acquired = [0]
+    acquire = bucket.acquire
+
+    async def counting_acquire():
+        acquired[0] += 1
+        await acquire()
+
+    bucket.acquire = counting_acquire
+    return acquired
+
+
+async def analyze_documents(documents: int) -> tuple[dict, int, int]:
+    fake = FakeDocumentIntelligence(tps=0, poll_tps=0, processing_seconds=0.2)
+    runner, endpoint = await start_server(fake)
+    try:
+        async with AsyncOcrScheduler(endpoint=endpoint, key="fake-key", tps=100, poll_tps=100, polling_interval=0.05) as scheduler:
+            submissions = count_acquires(scheduler.bucket)
+            polls = count_acquires(scheduler.poll_bucket)
+            await asyncio.gather(*(scheduler.analyze("prebuilt-layout", pdf_bytes=b"%%PDF-1.7 %d" % i) for i in range(documents)))
+    finally:
+        await runner.cleanup()
+    return fake.stats, submissions[0], polls[0]
+
+
+def test_polls_do_not_take_submission_tokens():
+    server_stats, submissions, polls = asyncio.run(analyze_documents(3))
+
+    assert submissions == server_stats["submissions"] == 3
+    assert polls == server_stats["polls"] >= 3
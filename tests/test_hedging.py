@@ -0,0 +1,134 @@
+import asyncio
+import importlib
+
+import pytest
+
+from src.chains import hedging
+from src.chains.hedging import HEDGE_MIN_SAMPLES, LatencyTracker, hedge_delay, race
+from src.models import register_model
+from src.pipeline import register_stub_models
+from src.prompts import process_invoice_prompt
+
+# `src.chains` re-exports the function of the same name, which shadows the module attribute
+process_invoice_chain = importlib.import_module("src.chains.process_invoice_chain")
+
+
+@pytest.fixture(autouse=True)
+def latencies(monkeypatch):
+    tracker = LatencyTracker()
+    monkeypatch.setattr(hedging, "_latencies", tracker)
+    return tracker
+
+
+def _call(seconds: float, output=None, error: Exception | None = None, events: list | None = None, name: str = ""):
+    async def call():
+        try:
+            await asyncio.sleep(seconds)
+        except asyncio.CancelledError:
+            if events is not None:
+                events.append(f"{name} cancelled")
+            raise
+        if error is not None:
+            raise error
+        return output
+
+    return call
+
+
+def test_hedge_delay_is_the_observed_percentile(latencies, monkeypatch):
+    monkeypatch.setenv("HEDGE_DEFAULT_DELAY", "7")
+    for i in range(HEDGE_MIN_SAMPLES - 1):
+        latencies.record("primary", i / 10)
+    assert hedge_delay("primary") == 7.0
+
+    for i in range(HEDGE_MIN_SAMPLES - 1, 100):
+        latencies.record("primary", i / 10)
+    assert hedge_delay("primary", percentile=0.95) == pytest.approx(9.5)
+
+
+def test_fast_primary_is_not_hedged():
+    secondary_calls = []
+
+    async def secondary():
+        secondary_calls.append(1)
+        return "secondary"
+
+    result = asyncio.run(race("primary", _call(0.01, "primary"), "secondary", secondary, delay=0.5))
+    assert result == {"winner": "primary", "output": "primary", "hedged": False, "loser_output": None}
+    assert not secondary_calls
+
+
+def test_hedge_fires_after_the_delay_and_the_loser_is_cancelled():
+    events = []
+    primary = _call(5.0, "primary", events=events, name="primary")
+    secondary = _call(0.01, "secondary", events=events, name="secondary")
+
+    result = asyncio.run(race("primary", primary, "secondary", secondary, delay=0.05))
+
+    assert result["winner"] == "secondary"
+    assert result["output"] == "secondary"
+    assert result["hedged"] is True
+    assert events == ["primary cancelled"]
+
+
+def test_primary_can_still_win_after_hedging():
+    events = []
+    primary = _call(0.1, "primary", events=events, name="primary")
+    secondary = _call(5.0, "secondary", events=events, name="secondary")
+
+    result = asyncio.run(race("primary", primary, "secondary", secondary, delay=0.05))
+
+    assert (result["winner"], result["hedged"]) == ("primary", True)
+    assert events == ["secondary cancelled"]
+
+
+def test_failed_primary_falls_back_to_the_secondary():
+    primary = _call(0.0, error=ValueError("invalid"))
+    result = asyncio.run(race("primary", primary, "secondary", _call(0.01, "secondary"), delay=0.05))
+    assert result["winner"] == "secondary"
+
+
+def test_both_failing_raises():
+    with pytest.raises(ValueError):
+        asyncio.run(race("primary", _call(0.0, error=ValueError("a")), "secondary", _call(0.0, error=ValueError("b")), delay=0.01))
+
+
+def test_cancelled_primary_is_recorded_as_censored_at_the_delay(latencies):
+    primary = _call(5.0, "primary")
+    asyncio.run(race("primary", primary, "secondary", _call(0.0, "secondary"), delay=0.05))
+
+    samples = list(latencies._samples["primary"])
+    assert len(samples) == 1
+    assert samples[0] >= 0.05
+
+
+def test_failed_primary_is_censored_but_failed_secondary_is_not(latencies):
+    primary = _call(0.0, error=ValueError("invalid"))
+    secondary = _call(0.0, error=ValueError("invalid"))
+    with pytest.raises(ValueError):
+        asyncio.run(race("primary", primary, "secondary", secondary, delay=0.2))
+
+    assert list(latencies._samples["primary"]) == [0.2]
+    assert not latencies._samples["secondary"]
+
+
+def test_hedged_calls_cap_max_tokens_at_each_models_output_limit(monkeypatch):
+    register_stub_models()
+    register_model("test-hedge-primary", "stub", latency=0.2, max_output_tokens=32_768)
+    register_model("test-hedge-secondary", "stub", latency=0.0, max_output_tokens=8_192)
+    monkeypatch.setenv("HEDGE_DEFAULT_DELAY", "0")
+
+    requested = {}
+    ainvoke_llm = process_invoice_chain.ainvoke_llm
+
+    async def recording_ainvoke_llm(prompt_template, inputs, model, scheduler=None, max_tokens=None):
+        requested[model] = max_tokens
+        return await ainvoke_llm(prompt_template, inputs, model, scheduler, max_tokens)
+
+    monkeypatch.setattr(process_invoice_chain, "ainvoke_llm", recording_ainvoke_llm)
+    output = process_invoice_chain.hedged_invoice_output(
+        process_invoice_prompt(), {"invoice_details": "invoice"}, "test-hedge-primary", "test-hedge-secondary", max_tokens=20_000
+    )
+
+    assert output["usage_metadata"]["hedged"]
+    assert requested == {"test-hedge-primary": 20_000, "test-hedge-secondary": 8_192}
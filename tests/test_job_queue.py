@@ -0,0 +1,30 @@
+from src.pipeline import InvoiceJob, InvoiceJobQueue
+
+
+def _failing_ocr(**kwargs):
+    raise ValueError("unreadable")
+
+
+def test_finished_jobs_beyond_the_limit_are_evicted_oldest_first():
+    queue = InvoiceJobQueue(max_workers=1, ocr_fn=_failing_ocr, max_finished_jobs=2)
+    for i in range(4):
+        job = queue.submit(bytes([i]), f"{i}.pdf")
+        while not job.finished:
+            pass
+    queue.submit(b"last", "last.pdf")
+    queue.shutdown()
+
+    assert [job.filename for job in queue.jobs()][:2] == ["2.pdf", "3.pdf"]
+    assert queue.get(InvoiceJobQueue.make_job_id(bytes([0]))) is None
+
+
+def test_eviction_tolerates_a_job_without_finished_at():
+    queue = InvoiceJobQueue(max_workers=1, ocr_fn=_failing_ocr, max_finished_jobs=1)
+    for job_id, finished_at in (("finishing", None), ("finished", 1.0)):
+        job = queue._jobs[job_id] = InvoiceJob(job_id, f"{job_id}.pdf", b"")
+        job.status, job.finished_at = "done", finished_at
+
+    queue.submit(b"new", "new.pdf")
+    queue.shutdown()
+    assert queue.get("finishing") is None
+    assert queue.get("finished") is not None
@@ -0,0 +1,90 @@
+import threading
+import time
+
+import pytest
+
+from src.pipeline.job_store import JobStore
+
+
+@pytest.fixture
+def documents(tmp_path):
+    paths = []
+    for i in range(3):
+        path = tmp_path / f"invoice-{i}.pdf"
+        path.write_bytes(f"invoice {i}".encode())
+        paths.append(path)
+    return paths
+
+
+def _store(tmp_path, lease_seconds=900.0) -> JobStore:
+    return JobStore(tmp_path / "jobs.sqlite3", lease_seconds=lease_seconds)
+
+
+def test_expired_lease_is_requeued_and_claimed_again(tmp_path, documents):
+    store = _store(tmp_path, lease_seconds=0.05)
+    job_id = store.add(documents[0])
+    assert store.claim(worker="other-host:1")["job_id"] == job_id
+    assert store.claim(worker="other-host:2") is None
+
+    time.sleep(0.1)
+    assert store.requeue() == 1
+    assert store.get(job_id)["status"] == "pending"
+    job = store.claim(worker="other-host:2")
+    assert job["job_id"] == job_id
+    assert job["attempts"] == 2
+
+
+def test_expired_lease_can_be_claimed_without_requeue(tmp_path, documents):
+    store = _store(tmp_path, lease_seconds=0.05)
+    job_id = store.add(documents[0])
+    store.claim(worker="other-host:1")
+    time.sleep(0.1)
+    assert store.claim(worker="other-host:2")["job_id"] == job_id
+
+
+def test_concurrent_claims_never_lease_a_job_twice(tmp_path, documents):
+    store = _store(tmp_path)
+    store.add_many(documents)
+    # A second connection to the same database, as another process would have
+    other = _store(tmp_path)
+
+    claimed = []
+    barrier = threading.Barrier(8)
+
+    def worker(job_store, name):
+        barrier.wait()
+        while (job := job_store.claim(worker=f"other-host:{name}")) is not None:
+            claimed.append(job["job_id"])
+
+    threads = [threading.Thread(target=worker, args=(store if i % 2 else other, i)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(claimed) == sorted(JobStore.make_job_id(path) for path in documents)
+
+
+def test_failed_jobs_are_retried_up_to_max_attempts(tmp_path, documents):
+    store = _store(tmp_path)
+    job_id = store.add(documents[0])
+    for _ in range(2):
+        store.claim(worker="other-host:1")
+        store.fail(job_id, "llm", "boom")
+        store.requeue(max_attempts=2)
+
+    assert store.get(job_id)["status"] == "failed"
+    assert store.claim(worker="other-host:1") is None
+
+
+def test_claim_is_scoped_to_the_batch(tmp_path, documents):
+    store = _store(tmp_path)
+    unrelated = store.add(documents[0])
+    job_ids = store.add_many(documents[1:])
+    batch_id = JobStore.make_batch_id(job_ids)
+    store.set_batch(job_ids, batch_id)
+
+    claimed = {store.claim(batch_id=batch_id)["job_id"], store.claim(batch_id=batch_id)["job_id"]}
+    assert claimed == set(job_ids)
+    assert store.claim(batch_id=batch_id) is None
+    assert store.get(unrelated)["status"] == "pending"
@@ -0,0 +1,52 @@
+import pytest
+
+from src.parsers import (
+    decode_partial_json_object,
+    extract_json_text,
+    loads_partial,
+    parse_partial_process_invoice_json,
+)
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        '```json{"a": 1}```',
+        '```{"a": 1}```',
+        '```json\n{"a": 1}\n```',
+        '```\n{"a": 1}\n```',
+        'Here is the invoice:\n```json\n{"a": 1}\n```',
+        'Here is the invoice: {"a": 1}',
+    ],
+)
+def test_fenced_and_prefixed_json(text):
+    assert decode_partial_json_object(text) == ({"a": 1}, False)
+
+
+def test_fence_without_newline_keeps_array():
+    assert extract_json_text('```[1, 2]```') == "[1, 2]"
+
+
+def test_truncated_scalar_is_flagged():
+    assert decode_partial_json_object('{"total": 12') == ({}, True)
+
+
+def test_truncated_items_keep_complete_rows():
+    text = '```json\n{"invoice_id": "a", "items": [{"description": "x", "quantity": 1}, {"description": "y", "quan'
+    content, truncated = decode_partial_json_object(text)
+    assert truncated
+    assert content["invoice_id"] == "a"
+    assert content["items"][0] == {"description": "x", "quantity": 1}
+
+
+def test_tolerated_syntax_is_not_truncation():
+    assert loads_partial('{"a": 1, // note\n "b": [1, 2,],}') == ({"a": 1, "b": [1, 2]}, False)
+
+
+def test_parse_flags_truncated_invoice():
+    content, truncated = parse_partial_process_invoice_json('{"invoice_id": "a", "total_amount": 12', as_dict=True)
+    assert truncated
+    assert content["invoice_id"] == "a"
+
+    content, truncated = parse_partial_process_invoice_json('{"invoice_id": "a"}', as_dict=True)
+    assert not truncated
@@ -0,0 +1,117 @@
+import pytest
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.prompts import ChatPromptTemplate
+
+from src import llm_scheduler
+from src.llm_scheduler import DeploymentBudget, LlmScheduler
+
+PROMPT = ChatPromptTemplate.from_messages([("human", "{invoice_details}")])
+
+
+class RateLimitError(Exception):
+    def __init__(self, retry_after: str | None = None):
+        super().__init__("429 Too Many Requests")
+        self.status_code = 429
+        self.response = type("Response", (), {"headers": {"retry-after": retry_after} if retry_after else {}})()
+
+
+class ScriptedModel:
+    """Raises or returns the next scripted outcome on each call."""
+
+    def __init__(self, outcomes):
+        self.outcomes = list(outcomes)
+        self.calls = 0
+
+    def invoke(self, messages, **kwargs):
+        self.calls += 1
+        outcome = self.outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+
+@pytest.fixture
+def deployments(monkeypatch):
+    models = {}
+    monkeypatch.setattr(llm_scheduler, "load_llm_models", lambda model, max_retries=None: models[model])
+    monkeypatch.setattr(llm_scheduler, "MODEL_CONFIGS", {})
+    return models
+
+
+def test_429_blocks_the_deployment_and_retries_after_backoff(deployments, monkeypatch):
+    response = AIMessage(content="{}", usage_metadata={"input_tokens": 10, "output_tokens": 5, "total_tokens": 15})
+    deployments["primary"] = ScriptedModel([RateLimitError(retry_after="0.2"), response])
+    sleeps = []
+    monkeypatch.setattr(llm_scheduler.time, "sleep", lambda seconds: sleeps.append(seconds))
+
+    scheduler = LlmScheduler(backoff_base=0.0)
+    result, deployment, _ = scheduler.invoke(PROMPT, {"invoice_details": "invoice"}, "primary")
+
+    assert (result, deployment) == (response, "primary")
+    assert deployments["primary"].calls == 2
+    # The retry waited out the Retry-After delay before calling again
+    assert sleeps and sum(sleeps) >= 0.15
+    stats = scheduler.stats()["primary"]
+    assert stats["throttled"] == 1
+    # The failed attempt's reservation is released and the successful one settled to actual usage
+    assert stats["tokens_last_minute"] == 15
+
+
+def test_429_is_raised_after_max_retries(deployments, monkeypatch):
+    deployments["primary"] = ScriptedModel([RateLimitError()] * 3)
+    monkeypatch.setattr(llm_scheduler.time, "sleep", lambda seconds: None)
+
+    with pytest.raises(RateLimitError):
+        LlmScheduler(max_retries=2, backoff_base=0.0).invoke(PROMPT, {"invoice_details": "invoice"}, "primary")
+    assert deployments["primary"].calls == 3
+
+
+def test_other_errors_are_not_retried(deployments):
+    deployments["primary"] = ScriptedModel([ValueError("bad request")])
+    with pytest.raises(ValueError):
+        LlmScheduler().invoke(PROMPT, {"invoice_details": "invoice"}, "primary")
+    assert deployments["primary"].calls == 1
+
+
+def test_tpm_budget_waits_for_the_window():
+    budget = DeploymentBudget("primary", tpm=1000)
+    wait, entry = budget.try_reserve(600)
+    assert (wait, entry is not None) == (0.0, True)
+
+    wait, second = budget.try_reserve(600)
+    assert second is None
+    assert 59 < wait <= 60
+
+    # Settling to the actual usage frees the rest of the reservation
+    budget.settle(entry, 300)
+    wait, second = budget.try_reserve(600)
+    assert (wait, second is not None) == (0.0, True)
+    assert budget.stats()["tokens_last_minute"] == 900
+
+
+def test_rpm_budget_counts_requests():
+    budget = DeploymentBudget("primary", rpm=2)
+    assert budget.try_reserve(1)[1] is not None
+    assert budget.try_reserve(1)[1] is not None
+    assert budget.try_reserve(1)[1] is None
+
+
+def test_reservation_uses_the_per_call_max_tokens(deployments):
+    scheduler = LlmScheduler(output_tokens_estimate=2000)
+    prompt_tokens = scheduler.estimate_tokens("primary", "invoice") - 2000
+    assert scheduler.estimate_tokens("primary", "invoice", max_tokens=20_000) == prompt_tokens + 20_000
+
+
+def test_saturated_deployment_spills_over_to_its_fallback(deployments, monkeypatch):
+    monkeypatch.setenv("LLM_TPM_PRIMARY", "100")
+    monkeypatch.setenv("LLM_FALLBACKS_PRIMARY", "secondary")
+    deployments["primary"] = FakeListChatModel(responses=["{}"])
+    deployments["secondary"] = FakeListChatModel(responses=["{}"])
+
+    scheduler = LlmScheduler(output_tokens_estimate=50)
+    _, first, _ = scheduler.invoke(PROMPT, {"invoice_details": "invoice"}, "primary")
+    _, second, _ = scheduler.invoke(PROMPT, {"invoice_details": "invoice"}, "primary")
+
+    assert (first, second) == ("primary", "secondary")
+    assert scheduler.stats()["primary"]["spillovers"] == 1
@@ -0,0 +1,23 @@
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+FIXTURE = ROOT / "benchmarks" / "fixtures" / "markdown" / "office_supplies_invoice.md"
+
+
+@pytest.mark.parametrize("mode", ["single", "pages", "hybrid", "cascade"])
+def test_stub_run_in_every_mode(mode, tmp_path):
+    output = tmp_path / "results.jsonl"
+    command = [sys.executable, "main.py", str(FIXTURE), "--stub", "--stub-ocr-latency", "0", "--mode", mode, "-o", str(output)]
+    env = os.environ | {"STUB_LLM_LATENCY": "0", "RESULT_CACHE_BACKEND": "none", "INVOICE_TELEMETRY": "off"}
+    completed = subprocess.run(command, cwd=ROOT, env=env, capture_output=True, text=True, timeout=120)
+
+    assert completed.returncode == 0, completed.stderr
+    records = [json.loads(line) for line in output.read_text(encoding="utf-8").splitlines()]
+    assert [record["status"] for record in records] == ["ok"]
+    assert records[0]["content"]["invoice_id"]
@@ -0,0 +1,68 @@
+import json
+
+import pytest
+
+from src.chains.model_cascade import escalation_reasons, process_invoice_cascade, reconcile_totals
+from src.models import register_model
+from src.pipeline import register_stub_models
+from src.pipeline.stubs import STUB_INVOICE
+
+MISMATCHED = STUB_INVOICE | {"invoice_total": 150.0}
+
+
+@pytest.fixture(scope="module")
+def cascade_models():
+    register_stub_models()
+    register_model("test-cascade-cheap", "stub", latency=0.0, response=json.dumps(MISMATCHED), input_cost_per_m=0.4, output_cost_per_m=1.6)
+    register_model("test-cascade-strong", "stub", latency=0.0, input_cost_per_m=2.0, output_cost_per_m=8.0)
+    return ["test-cascade-cheap", "test-cascade-strong"]
+
+
+def test_reconciled_invoice_has_no_issues():
+    assert reconcile_totals(STUB_INVOICE) == []
+    assert escalation_reasons(STUB_INVOICE) == []
+
+
+def test_totals_mismatch_is_reported():
+    issues = reconcile_totals(MISMATCHED)
+    assert "line totals 110.00 != invoice total 150.00" in issues
+    assert "subtotal 100.00 + VAT 10.00 != invoice total 150.00" in issues
+
+
+def test_line_amount_mismatch_is_reported():
+    item = STUB_INVOICE["items"][0] | {"quantity": 3.0}
+    assert reconcile_totals(STUB_INVOICE | {"items": [item]}) == ["item 0: 3 x 100.00 != 100.00"]
+
+
+def test_differences_within_tolerance_are_accepted():
+    assert reconcile_totals(STUB_INVOICE | {"invoice_total": 110.5}, tolerance=0.01) == []
+
+
+def test_low_confidence_escalates():
+    content = STUB_INVOICE | {"metadata": {"language": ["en"], "confidence_score": 0.5}}
+    assert escalation_reasons(content, min_confidence=0.8) == ["confidence 0.5 below 0.8"]
+
+
+def test_cascade_escalates_on_totals_mismatch(cascade_models):
+    result = process_invoice_cascade("invoice", models=cascade_models, use_cache=False)
+
+    usage_metadata = result["usage_metadata"]
+    assert result["content"]["invoice_total"] == 110.0
+    assert usage_metadata["model"] == "test-cascade-strong"
+    assert usage_metadata["escalations"] == 1
+    cheap, strong = usage_metadata["cascade"]
+    assert cheap["model"] == "test-cascade-cheap"
+    assert any("line totals" in reason for reason in cheap["reasons"])
+    assert strong["reasons"] == []
+    assert usage_metadata["llm_cost_usd"] == pytest.approx(cheap["llm_cost_usd"] + strong["llm_cost_usd"])
+
+
+def test_cascade_stops_at_the_first_trusted_result(cascade_models):
+    result = process_invoice_cascade("invoice", models=cascade_models[1:], use_cache=False)
+    assert result["usage_metadata"]["escalations"] == 0
+
+
+def test_cascade_returns_the_last_result_when_no_model_is_trusted(cascade_models):
+    result = process_invoice_cascade("invoice", models=[cascade_models[0]] * 2, use_cache=False)
+    assert result["usage_metadata"]["escalations"] == 1
+    assert result["content"]["invoice_total"] == 150.0
@@ -0,0 +1,70 @@
+import json
+from pathlib import Path
+
+import pytest
+
+from src.chains.process_invoice_pages_chain import continues_table, process_invoice_pages_chain
+from src.models import register_model
+from src.ocr import split_doc_pages
+from src.pipeline import register_stub_models
+from src.pipeline.stubs import STUB_INVOICE, StubChatModel
+from src.preprocessing import compact_pdf_output, triage_pdf_output
+
+FIXTURE = Path(__file__).parent.parent / "benchmarks" / "fixtures" / "markdown" / "freight_invoice_multi_page.md"
+
+
+def load_pages(compact: str | None = None) -> list[dict]:
+    doc_content = FIXTURE.read_text()
+    pdf_output = {"doc_pages": split_doc_pages(doc_content), "doc_content": doc_content}
+    if compact:
+        pdf_output = compact_pdf_output(pdf_output, table_format=compact)
+    return pdf_output["doc_pages"]
+
+
+@pytest.mark.parametrize("compact", [None, "pipe", "tsv"])
+def test_continued_tables_are_detected(compact):
+    pages = load_pages(compact)
+    assert all(continues_table(previous, page) for previous, page in zip(pages, pages[1:]))
+
+
+@pytest.mark.parametrize("compact", [None, "pipe"])
+def test_page_ending_with_text_is_not_continued(compact):
+    previous, page = load_pages(compact)[:2]
+    previous = previous | {"content": previous["content"] + "\nThank you for your business."}
+    assert not continues_table(previous, page)
+
+
+@pytest.mark.parametrize("compact", [None, "pipe"])
+def test_pages_mode_drops_the_row_split_by_a_page_break(compact):
+    register_stub_models()
+    # Every page group "extracts" the same boundary row, as when a row is split by the page break
+    item = STUB_INVOICE["items"][0]
+    register_model("test-pages-item", "stub", latency=0.0, response=json.dumps(STUB_INVOICE | {"items": [item]}))
+
+    result = process_invoice_pages_chain(load_pages(compact), model="test-pages-item", pages_per_chunk=2)
+
+    assert result["usage_metadata"]["llm_calls"] == 4
+    assert result["content"]["items"] == [item]
+
+
+def test_page_ranges_count_the_pages_dropped_by_triage(monkeypatch):
+    register_stub_models()
+    register_model("test-pages-ranges", "stub", latency=0.0)
+    prompts = []
+    generate = StubChatModel._generate
+
+    def recording_generate(self, messages, *args, **kwargs):
+        prompts.append("".join(str(message.content) for message in messages))
+        return generate(self, messages, *args, **kwargs)
+
+    monkeypatch.setattr(StubChatModel, "_generate", recording_generate)
+    cover = {"page": 1, "content": "Dear customer, please find enclosed our invoice. Kind regards."}
+    terms = {"page": 7, "content": "Terms and conditions\nPayment is due within 30 days. Late payments incur interest."}
+    pdf_output = {"doc_pages": [cover, *({**page, "page": page["page"] + 1} for page in load_pages()), terms]}
+    triaged = triage_pdf_output(pdf_output)
+    assert triaged["dropped_pages"] == [1, 7]
+
+    process_invoice_pages_chain(triaged["doc_pages"], model="test-pages-ranges", pages_per_chunk=2, total_pages=triaged["total_pages"])
+
+    page_ranges = sorted(prompt.split("<page_range>")[1].split("</page_range>")[0] for prompt in prompts if "<page_range>" in prompt)
+    assert page_ranges == ["pages 2-3 of 7", "pages 4-5 of 7", "pages 6-6 of 7"]
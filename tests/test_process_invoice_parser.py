@@ -0,0 +1,14 @@
+from src.parsers import parse_process_invoice_results
+
+
+def test_batch_validation_keeps_payload_positions():
+    results = parse_process_invoice_results(['{"invoice_id": "a"}', '{"invoice_id": "b"},{"invoice_id": "c"}'], as_dict=True)
+    assert len(results) == 2
+    assert results[0]["invoice_id"] == "a"
+    assert isinstance(results[1], ValueError)
+
+
+def test_batch_validation_of_empty_text():
+    results = parse_process_invoice_results(['{"invoice_id": "a"}', ""], as_dict=True)
+    assert results[0]["invoice_id"] == "a"
+    assert isinstance(results[1], ValueError)
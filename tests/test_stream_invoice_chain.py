@@ -0,0 +1,33 @@
+import asyncio
+
+import pytest
+from langchain_core.runnables import RunnableGenerator
+
+from src.chains import stream_invoice_chain
+
+
+def _empty_stream(chunks):
+    yield from ()
+
+
+async def _aempty_stream(chunks):
+    for _ in ():
+        yield
+
+
+@pytest.fixture
+def empty_llm(monkeypatch):
+    monkeypatch.setattr(stream_invoice_chain, "load_llm_models", lambda model: RunnableGenerator(_empty_stream, _aempty_stream))
+
+
+def test_empty_stream_raises(empty_llm):
+    with pytest.raises(ValueError, match="empty LLM response"):
+        list(stream_invoice_chain.stream_process_invoice_chain("invoice", use_cache=False))
+
+
+def test_empty_astream_raises(empty_llm):
+    async def consume():
+        return [event async for event in stream_invoice_chain.astream_process_invoice_chain("invoice", use_cache=False)]
+
+    with pytest.raises(ValueError, match="empty LLM response"):
+        asyncio.run(consume())